@@ -2,6 +2,7 @@ import streamlit as st
 import requests
 from PIL import Image
 import io
+import base64
 
 st.set_page_config(page_title="Object Detection Dashboard", layout="wide")
 
@@ -21,9 +22,37 @@ if page == "Detect":
     uploaded = st.file_uploader("Upload image", type=["jpg", "jpeg", "png"])
     confidence = st.slider("Confidence", 0.0, 1.0, 0.25, 0.05)
 
-    if uploaded and st.button("Run detection"):
+    as_job = st.checkbox("Run as background job (for large images)")
+
+    if uploaded and as_job and st.button("Submit job"):
         response = requests.post(
-            f"{API_URL}/detect",
+            f"{API_URL}/jobs",
+            files={"files": (uploaded.name, uploaded.getvalue(), uploaded.type)},
+            params={"confidence": confidence},
+            timeout=30
+        )
+
+        if response.status_code == 202:
+            job = response.json()
+            with st.spinner(f"Waiting for job {job['job_id']}"):
+                # long-poll until the job finishes instead of holding one long request open
+                while job["status"] in ("queued", "running"):
+                    job = requests.get(
+                        f"{API_URL}/jobs/{job['job_id']}", params={"wait": 20}, timeout=30
+                    ).json()
+
+            if job["status"] == "done":
+                results = requests.get(f"{API_URL}{job['results_url']}", timeout=30).json()
+                st.success(f"Job {job['job_id']} done")
+                st.json(results)
+            else:
+                st.error(job)
+        else:
+            st.error(response.text)
+
+    if uploaded and not as_job and st.button("Run detection"):
+        response = requests.post(
+            f"{API_URL}/detect/combined",
             files={"file": (uploaded.name, uploaded.getvalue(), uploaded.type)},
             params={"confidence": confidence},
             timeout=30
@@ -31,19 +60,12 @@ if page == "Detect":
 
         if response.status_code == 200:
             data = response.json()
+            annotated = base64.b64decode(data.pop("annotated_image"))
             st.success(f"Detected {data['total_objects']} objects")
             st.json(data)
 
-            img_response = requests.post(
-                f"{API_URL}/detect/annotated",
-                files={"file": (uploaded.name, uploaded.getvalue(), uploaded.type)},
-                params={"confidence": confidence},
-                timeout=30
-            )
-
-            if img_response.status_code == 200:
-                image = Image.open(io.BytesIO(img_response.content))
-                st.image(image, use_container_width=True)
+            image = Image.open(io.BytesIO(annotated))
+            st.image(image, use_container_width=True)
         else:
             st.error(response.text)
 
@@ -1,19 +1,98 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Depends
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Depends, Header, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from datetime import datetime
+from pathlib import Path
+from typing import List
+import asyncio
+from contextlib import asynccontextmanager
+import base64
+import json
 import logging
 import io
+import os
+import psutil
+import tempfile
+import threading
+import time
+import uuid
 from src.init_db import init_database
 
-from src.detector import ObjectDetector
-from src.schemas import DetectionResponse, HealthResponse
-from src.database import get_db, DetectionLog, ModelMetrics
+from src.backends import MODEL_IMGSZ, WARMUP_RUNS
+from src.batching import BatchScheduler, SchedulerBusy
+from src.cache import CACHE_BASE_CONFIDENCE, cache_key, create_result_cache, filter_detections
+from src.detector import ObjectDetector, decode_image, detections_to_columns
+from src.registry import (
+    DEFAULT_MODEL,
+    MODEL_MEMORY_BUDGET_MB,
+    MODELS,
+    LoadedModel,
+    ModelRegistry,
+    UnknownModel,
+    parse_model_specs,
+)
+from src.schemas import AnnotatedDetectionResponse, DetectionResponse, HealthResponse
+from src.metrics import MetricsMiddleware, metrics, record_stages, stage
+from src.database import get_db, DetectionLog, DetectionRollup, ModelMetrics, SessionLocal
+from src.export import EXPORT_FORMATS, MEDIA_TYPES, export_row, export_stream, keyset_page
+from src.jobs import (
+    FINAL_STATUSES,
+    JOB_MAX_IMAGES,
+    JOB_UPLOAD_MAX_BYTES,
+    JOB_POLL_INTERVAL_MS,
+    JobRunner,
+    cancel_job,
+    get_job,
+    job_files,
+    job_results,
+    original_filename,
+    queue_stats,
+    submit_job,
+)
+from src.preprocess import (
+    IMAGE_MAX_BYTES,
+    REDUCED_DECODE,
+    UPLOAD_CHUNK_SIZE,
+    ImageTooLarge,
+    check_image,
+    decode_reduced,
+    load_image,
+    reduction_factor,
+    rescale_result,
+)
+from src.render import (
+    ANNOTATED_FORMAT,
+    ANNOTATED_MAX_SIZE,
+    ANNOTATED_QUALITY,
+    OUTPUT_FORMATS,
+    OutputEncoding,
+)
+from src.partitions import PartitionMaintainer, find_archived_detection
+from src.profiles import PROFILES, InferenceProfile, UnknownProfile, class_ids, get_profile
+from src.rollups import rollup_summary
+from src.search import REGION_MODES, object_summary, search_objects
+from src.startup import StartupReport
+from src.tiling import TILE_OVERLAP
+from src.uploads import ARCHIVE_MAX_BYTES, BATCH_UPLOAD_MAX_IMAGES, expand_uploads, is_archive, iter_uploads
+from src.video import VIDEO_MAX_BYTES, VIDEO_UPLOAD_CHUNK_SIZE, iter_batches, iter_frames, open_video
+from src.workers import INFERENCE_PROCESSES, create_scheduler
+from src.writer import DetectionWriter, persist_detections
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+RESULTS_DIR = Path(os.getenv("RESULTS_DIR", "results"))
+# keep annotated images in RESULTS_DIR for /detection/{id}/image, pruned with DETECTION_RETENTION_DAYS
+SAVE_ANNOTATED_IMAGES = os.getenv("SAVE_ANNOTATED_IMAGES", "0") == "1"
+VIDEO_SUBMIT_TIMEOUT = float(os.getenv("VIDEO_SUBMIT_TIMEOUT", "30"))
+# how long a job waits for room in the inference queue before it is retried later
+JOB_SUBMIT_TIMEOUT = float(os.getenv("JOB_SUBMIT_TIMEOUT", "60"))
+# waits of JOB_SUBMIT_TIMEOUT per image before it is recorded as failed and the job moves on
+JOB_SUBMIT_ATTEMPTS = int(os.getenv("JOB_SUBMIT_ATTEMPTS", "5"))
+JOB_WAIT_MAX_SECONDS = 60
+
 app = FastAPI(
     title="Object Detection API",
     description="object detection using YOLOv8",
@@ -29,26 +108,219 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
-detector: ObjectDetector | None = None
+writer: DetectionWriter | None = None
+job_runner: JobRunner | None = None
+partition_maintainer: PartitionMaintainer | None = None
+result_cache = create_result_cache()
+process = psutil.Process()
+startup = StartupReport()
 
 
-from src.init_db import init_database
+def load_detector(model_path: str) -> ObjectDetector:
+    # with worker processes the model is warmed up in each worker once it has started,
+    # the API process itself never runs inference
+    detector = ObjectDetector(model_path, warmup_runs=0 if INFERENCE_PROCESSES else WARMUP_RUNS)
+    # exports and quantization take seconds to minutes, so they happen here rather
+    # than on the scheduler thread in front of every queued request
+    for name, error in detector.prepare_profiles(PROFILES.values()).items():
+        logger.warning(f"profile {name} of {model_path} could not be prepared, it will be retried on first use: {error}")
+    return detector
 
-@app.on_event("startup")
-async def startup_event():
-    global detector
 
+def start_scheduler(detector: ObjectDetector) -> BatchScheduler:
+    return create_scheduler(detector, INFERENCE_PROCESSES, warmup_runs=WARMUP_RUNS)
+
+
+def register_model_metrics(model: LoadedModel):
+    """gives a model its model_metrics row when it is loaded, refreshing the metadata of an existing one
+
+    the detection count of an existing row is kept.
+    """
+    db = SessionLocal()
+    try:
+        metadata = {
+            "model_version": model.detector.model_version() or "unknown",
+            "total_classes": model.detector.get_class_count(),
+            "last_updated": datetime.utcnow(),
+            "notes": f"loaded from {model.path}",
+        }
+        row = db.query(ModelMetrics).filter_by(model_name=model.name).first()
+        if row is None:
+            db.add(ModelMetrics(model_name=model.name, total_detections=0, **metadata))
+        else:
+            for key, value in metadata.items():
+                setattr(row, key, value)
+        db.commit()
+    finally:
+        db.close()
+
+
+registry = ModelRegistry(
+    parse_model_specs(MODELS),
+    DEFAULT_MODEL,
+    detector_factory=load_detector,
+    scheduler_factory=start_scheduler,
+    memory_budget_bytes=int(MODEL_MEMORY_BUDGET_MB * 2**20),
+    on_load=register_model_metrics,
+)
+
+
+def resolve_model_name(model: str | None) -> str:
+    try:
+        return registry.resolve(model)
+    except UnknownModel as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+async def load_model(model: str | None, acquire: bool = False) -> LoadedModel:
+    """the requested model, loaded off the event loop the first time it is used"""
+    name = resolve_model_name(model)
+    try:
+        return await run_in_threadpool(registry.acquire if acquire else registry.get, name)
+    except Exception as e:
+        logger.exception(f"loading model {name} failed: {e}")
+        raise HTTPException(status_code=503, detail=f"model {name} could not be loaded")
+
+
+@asynccontextmanager
+async def use_model(model: str | None):
+    """holds the model for the duration of a request so it is not evicted mid-inference"""
+    loaded = await load_model(model, acquire=True)
+    try:
+        yield loaded
+    finally:
+        registry.release(loaded)
+
+
+def get_writer() -> DetectionWriter:
+    global writer
+    if writer is None:
+        writer = DetectionWriter()
+    return writer
+
+
+metrics.register_value(
+    "inference_queue_depth",
+    "requests waiting for the inference schedulers of all loaded models",
+    lambda: sum(m.scheduler.queue_depth() for m in registry.loaded().values()),
+)
+metrics.register_value(
+    "process_resident_memory_bytes", "resident set size of the API process", lambda: process.memory_info().rss
+)
+metrics.register_value(
+    "model_parameter_bytes",
+    "memory held by the weights of all loaded models",
+    lambda: sum(m.detector.parameter_bytes() or 0 for m in registry.loaded().values()),
+)
+metrics.register_value("models_loaded", "models currently loaded", lambda: len(registry.loaded()))
+metrics.register_value(
+    "model_registry_memory_bytes", "measured memory of the loaded models", lambda: registry.memory_used()
+)
+metrics.register_value(
+    "model_evictions_total", "models unloaded to stay within the memory budget", lambda: registry.evictions,
+    kind="counter",
+)
+metrics.register_value("result_cache_entries", "entries in the result cache", lambda: result_cache.stats()["entries"])
+metrics.register_value(
+    "result_cache_hits_total", "result cache hits", lambda: result_cache.stats()["hits"], kind="counter"
+)
+metrics.register_value(
+    "result_cache_misses_total", "result cache misses", lambda: result_cache.stats()["misses"], kind="counter"
+)
+metrics.register_value(
+    "startup_duration_seconds",
+    "seconds from process start until the service was ready",
+    lambda: startup.ready_after,
+)
+metrics.register_value(
+    "detection_log_pending",
+    "detections waiting to be written to the database",
+    lambda: writer.pending() if writer else None,
+)
+metrics.register_value(
+    "detection_log_rows_written_total",
+    "detections written to the database by the write-behind logger",
+    lambda: writer.stats()["rows_written"] if writer else None,
+    kind="counter",
+)
+metrics.register_value(
+    "detection_log_rows_failed_total",
+    "detections the write-behind logger could not write",
+    lambda: writer.stats()["rows_failed"] if writer else None,
+    kind="counter",
+)
+
+
+def warm_up():
+    """brings the service to ready: database, default model, detection writer
+
+    runs in a background thread so the process is live (and /livez answers)
+    while the model is still loading. each step is timed into the startup report.
+    """
     try:
-        logger.info("initializing database...")
-        init_database()
-        logger.info("database initialized")
+        with startup.phase("database"):
+            try:
+                logger.info("initializing database...")
+                init_database()
+                logger.info("database initialized")
+            except Exception as e:
+                logger.exception(f"database init failed: {e}")
+
+        # only the default model is loaded up front, the others on their first request
+        logger.info(f"loading default model {registry.default_model}...")
+        with startup.phase("model"):
+            default = registry.get()
+        for name, seconds in getattr(default.detector, "load_timings", {}).items():
+            startup.record(f"model_{name}", seconds)
+        logger.info(
+            f"model {default.name} loaded, batch scheduler started (max_batch_size={default.scheduler.max_batch_size}, "
+            f"max_wait_ms={default.scheduler.max_wait_ms}, inference_processes={INFERENCE_PROCESSES})"
+        )
+
+        with startup.phase("writer"):
+            get_writer()
+        logger.info(
+            f"detection writer started (flush_size={writer.flush_size}, "
+            f"flush_interval_ms={writer.flush_interval_ms})"
+        )
+
+        global job_runner
+        with startup.phase("jobs"):
+            job_runner = JobRunner(run_job)
+        logger.info(f"job runner started (workers={job_runner.stats()['workers']})")
+
+        global partition_maintainer
+        partition_maintainer = PartitionMaintainer(file_dirs=[RESULTS_DIR])
+
+        # worker processes load and warm up their own copy of the model in the background
+        with startup.phase("workers"):
+            if not default.scheduler.wait_ready():
+                raise RuntimeError("inference workers stopped before they were warmed up")
+        startup.mark_ready()
     except Exception as e:
-        logger.exception(f"database init failed: {e}")
+        startup.mark_failed(str(e))
 
-    logger.info("loading YOLO model...")
-    detector = ObjectDetector()
-    logger.info("model loaded")
+
+@app.on_event("startup")
+async def startup_event():
+    # interpreter start plus module imports, up to the point the app starts serving
+    startup.record("imports", startup.since_process_start())
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if job_runner is not None:
+        # an unfinished job is picked up again once its lease expires
+        await run_in_threadpool(job_runner.stop)
+    if partition_maintainer is not None:
+        await run_in_threadpool(partition_maintainer.stop)
+    registry.stop()
+    if writer is not None:
+        # drain pending rows before the process exits
+        await run_in_threadpool(writer.stop)
 
 
 @app.get("/")
@@ -58,162 +330,941 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "health": "/health",
+            "livez": "/livez",
+            "readyz": "/readyz",
+            "models": "/models",
             "classes": "/classes",
             "detect": "/detect",
             "detect_annotated": "/detect/annotated",
+            "detect_combined": "/detect/combined",
+            "detect_batch": "/detect/batch",
+            "detect_video": "/detect/video",
+            "detect_stream": "/ws/detect",
+            "profiles": "/profiles",
+            "jobs": "/jobs",
             "stats": "/stats",
+            "stats_timeseries": "/stats/timeseries",
+            "batching": "/stats/batching",
+            "metrics": "/metrics",
+            "cache": "/stats/cache",
+            "startup": "/stats/startup",
+            "job_queue": "/stats/jobs",
+            "partitions": "/stats/partitions",
             "history": "/history",
+            "history_export": "/history/export",
+            "search": "/detections/search",
             "docs": "/docs",
         },
     }
 
 
 @app.get("/health", response_model=HealthResponse)
-async def health_check():
+async def health_check(model: str | None = Query(None, description="model to report on, defaults to DEFAULT_MODEL")):
+    """healthy once the default model is loaded and warmed, other models are reported without loading them"""
+    name = resolve_model_name(model)
+    loaded = registry.peek(name)
+    default = registry.peek()
     return HealthResponse(
-        status="healthy" if detector else "unhealthy",
-        model_loaded=detector is not None,
-        model_classes=detector.get_class_count() if detector else 0,
+        status="healthy" if default and default.scheduler.ready() else "unhealthy",
+        model=name,
+        model_loaded=loaded is not None,
+        model_classes=loaded.detector.get_class_count() if loaded else 0,
+        loaded_models=list(registry.loaded()),
         timestamp=datetime.now(),
     )
 
 
+@app.get("/livez")
+async def liveness():
+    """the process is up and serving, whether or not the model has loaded yet"""
+    return {"status": "alive"}
+
+
+@app.get("/readyz")
+async def readiness():
+    """ready once the default model is loaded and warmed, 503 until then"""
+    summary = startup.summary()
+    if not startup.ready:
+        return JSONResponse(status_code=503, content=summary)
+    return summary
+
+
+@app.get("/models")
+async def get_models():
+    """configured models, the ones currently loaded and the memory budget they share"""
+    return registry.stats()
+
+
 @app.get("/classes")
-async def get_classes():
-    if not detector:
-        raise HTTPException(status_code=503, detail="model not loaded")
+async def get_classes(model: str | None = Query(None)):
+    loaded = await load_model(model)
+    classes = loaded.detector.get_class_names()
+    return {"model": loaded.name, "total_classes": len(classes), "classes": classes}
+
+
+@app.get("/profiles")
+async def get_profiles():
+    """speed/accuracy profiles /detect accepts as profile="""
+    return {"profiles": [profile.summary() for profile in PROFILES.values()]}
+
 
-    classes = detector.get_class_names()
-    return {"total_classes": len(classes), "classes": classes}
+def lookup_cached_result(
+    model: LoadedModel, contents: bytes, filename: str, confidence: float, model_id: str | None = None
+) -> tuple:
+    """hashes the upload and answers from the result cache when possible"""
+    start_time = time.perf_counter()
+    key = cache_key(contents, model_id or model.detector.model_id)
+    entry = result_cache.lookup(key, confidence)
+    if entry is None:
+        return key, None
+
+    detections = filter_detections(entry["detections"], confidence)
+    result = {
+        "detection_id": f"det_{uuid.uuid4().hex[:8]}",
+        "filename": filename,
+        "total_objects": len(detections),
+        "detections": detections,
+        "image_width": entry["image_width"],
+        "image_height": entry["image_height"],
+        "processing_time": round(time.perf_counter() - start_time, 3),
+        "timestamp": datetime.now(),
+        "model": model.name,
+        "cached": True,
+    }
+    return key, result
+
+
+async def infer_image(
+    model: LoadedModel,
+    image,
+    filename: str,
+    confidence: float,
+    annotate: bool = False,
+    tiling: tuple | None = None,
+    encoding: OutputEncoding | None = None,
+    profile: InferenceProfile | None = None,
+) -> tuple:
+    """queues a decoded image on the model's inference scheduler and waits for its result
+
+    tiling is (tile_size, tile_overlap); the tiles are queued as part of the one request
+    """
+    tile_size, tile_overlap = tiling or (0, 0.0)
+    try:
+        future = model.scheduler.submit(
+            image=image,
+            filename=filename,
+            conf_threshold=confidence,
+            annotate=annotate,
+            tile_size=tile_size,
+            tile_overlap=tile_overlap,
+            encoding=encoding,
+            profile=profile,
+        )
+    except SchedulerBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+    try:
+        result, annotated_bytes = await asyncio.wrap_future(future)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"detection failed: {str(e)}")
+
+    timings = result.pop("timings", {})
+    record_stages(timings)
+    if "inference" in timings:
+        metrics.model_inference.observe(model.name, timings["inference"] / 1000)
+    result["model"] = model.name
+    return result, annotated_bytes
+
+
+async def run_detection(
+    model: LoadedModel,
+    contents: bytes,
+    filename: str,
+    confidence: float,
+    annotate: bool = False,
+    tiling: tuple | None = None,
+    encoding: OutputEncoding | None = None,
+    profile: InferenceProfile | None = None,
+) -> tuple:
+    """decodes an upload and queues it on the inference scheduler without blocking the event loop
+
+    the format and pixel count are checked from the header before anything is
+    decoded, and large JPEGs are decoded at reduced scale, down to the
+    profile's input size when one is given. plain detections go through the
+    result cache. on a miss the model runs at the cache's base confidence so
+    later requests at any higher confidence can be answered from the stored
+    boxes.
+    """
+    if profile is not None:
+        try:
+            class_ids(profile, model.detector.model.names)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        image_format, size = check_image(contents)
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    key = None
+    inference_conf = confidence
+    if result_cache.enabled:
+        # tiled and profiled results differ from default whole-image ones, so they are cached separately
+        model_id = model.detector.model_id + (f":tiles{tiling[0]}x{tiling[1]}" if tiling else "")
+        if profile is not None:
+            model_id += f":{profile.name}"
+        with stage("cache"):
+            if annotate:
+                key = await run_in_threadpool(cache_key, contents, model_id)
+            else:
+                key, cached = await run_in_threadpool(
+                    lookup_cached_result, model, contents, filename, confidence, model_id
+                )
+                if cached is not None:
+                    return cached, None
+                inference_conf = min(confidence, CACHE_BASE_CONFIDENCE)
+
+    # tiles want every pixel, and annotated images are drawn at the decoded size, so they
+    # are only decoded at reduced scale when a smaller output size was asked for
+    factor = 1
+    input_size = profile.imgsz if profile is not None else MODEL_IMGSZ
+    if REDUCED_DECODE and image_format == "jpeg" and not tiling:
+        if not annotate:
+            factor = reduction_factor(size, input_size)
+        elif encoding is not None and encoding.max_size > 0:
+            factor = reduction_factor(size, max(input_size, encoding.max_size))
+
+    try:
+        with stage("decode"):
+            image = await run_in_threadpool(decode_reduced, contents, factor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    result, annotated_bytes = await infer_image(
+        model, image, filename, inference_conf, annotate, tiling, encoding, profile
+    )
+    if factor > 1:
+        result = rescale_result(result, size, image.shape)
+
+    if key is not None:
+        entry = {
+            "conf_threshold": inference_conf,
+            "detections": result["detections"],
+            "image_width": result["image_width"],
+            "image_height": result["image_height"],
+        }
+        await run_in_threadpool(result_cache.store, key, entry)
+
+    if inference_conf < confidence:
+        detections = filter_detections(result["detections"], confidence)
+        result = {**result, "detections": detections, "total_objects": len(detections)}
+
+    return result, annotated_bytes
+
+
+async def log_detection(result: dict, confidence: float):
+    """hands a detection to the write-behind logger, writing it inline only when its queue is full"""
+    if get_writer().enqueue(result, confidence):
+        return
+
+    with stage("db"):
+        await run_in_threadpool(write_detections, [result], confidence)
+
+
+def write_detections(results: List[dict], confidence: float) -> int:
+    """synchronous write of many detections in one transaction"""
+    if not results:
+        return 0
+
+    db = SessionLocal()
+    try:
+        persist_detections(db, [(r, confidence) for r in results])
+        db.commit()
+        logger.info(f"logged {len(results)} detections to database")
+        return len(results)
+
+    except Exception as e:
+        logger.error(f"database logging failed: {str(e)}")
+        db.rollback()
+        return 0
+
+    finally:
+        db.close()
+
+
+def log_detections(results: List[dict], confidence: float) -> int:
+    """queues many detections for the write-behind logger, returns how many were accepted"""
+    writer = get_writer()
+    overflow = [r for r in results if not writer.enqueue(r, confidence)]
+    if overflow:
+        write_detections(overflow, confidence)
+    return len(results)
+
+
+def save_annotated_image(detection_id: str, annotated_bytes: bytes, extension: str = ".jpg") -> Path:
+    """stores the annotated image so it can be fetched later by detection id"""
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f"{detection_id}{extension}"
+    path.write_bytes(annotated_bytes)
+    return path
+
+
+def find_annotated_image(detection_id: str) -> tuple | None:
+    """(path, media type) of the stored annotated image, in whichever format it was encoded"""
+    for extension, media_type in OUTPUT_FORMATS.values():
+        path = RESULTS_DIR / f"{Path(detection_id).name}{extension}"
+        if path.is_file():
+            return path, media_type
+    return None
+
+
+async def log_annotated_detection(
+    result: dict, confidence: float, annotated_bytes: bytes, encoding: OutputEncoding
+) -> bool:
+    """logs the detection and, with SAVE_ANNOTATED_IMAGES, stores its image; True once the image is stored"""
+    saved = False
+    if SAVE_ANNOTATED_IMAGES:
+        try:
+            with stage("save_image"):
+                await run_in_threadpool(save_annotated_image, result["detection_id"], annotated_bytes, encoding.extension)
+            saved = True
+        except OSError as e:
+            logger.error(f"saving annotated image failed: {str(e)}")
+    await log_detection(result, confidence)
+    return saved
+
+
+def columnar_response(result: dict) -> JSONResponse:
+    """detections as parallel arrays, serialized without per-detection validation"""
+    content = {
+        **result,
+        "detections": detections_to_columns(result["detections"]),
+        "timestamp": result["timestamp"].isoformat(),
+    }
+    content.setdefault("cached", False)
+    return JSONResponse(content=content)
+
+
+def inference_profile(
+    profile: str | None = Query(None, description="speed/accuracy profile from /profiles, defaults to the model's own settings"),
+) -> InferenceProfile | None:
+    try:
+        return get_profile(profile)
+    except UnknownProfile as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.post("/detect", response_model=DetectionResponse)
 async def detect_objects(
     file: UploadFile = File(...),
     confidence: float = Query(0.25, ge=0.0, le=1.0),
-    db: Session = Depends(get_db),
+    format: str = Query("json", pattern="^(json|columnar)$"),
+    model: str | None = Query(None, description="model name from /models, defaults to DEFAULT_MODEL"),
+    tile_size: int | None = Query(None, ge=64, le=4096, description="detect on overlapping tiles of this size"),
+    tile_overlap: float = Query(TILE_OVERLAP, ge=0.0, le=0.9, description="fraction of a tile shared with its neighbour"),
+    profile: InferenceProfile | None = Depends(inference_profile),
 ):
-    if file.content_type not in {"image/jpeg", "image/png", "image/jpg"}:
-        raise HTTPException(status_code=400, detail="only JPEG and PNG supported")
+    """format=columnar returns detections as {class_id, class_name, confidence, bbox} arrays
 
-    if not detector:
-        raise HTTPException(status_code=503, detail="model not loaded")
+    tile_size runs high-resolution images as overlapping tiles plus the whole image in one batch,
+    so small objects are not lost to downscaling. profile picks a speed/accuracy
+    trade-off from /profiles
+    """
+    tiling = (tile_size, tile_overlap) if tile_size else None
+    with stage("read"):
+        contents = await read_upload(file, IMAGE_MAX_BYTES)
+    async with use_model(model) as loaded:
+        result, _ = await run_detection(loaded, contents, file.filename, confidence, tiling=tiling, profile=profile)
 
-    try:
-        contents = await file.read()
+    await log_detection(result, confidence)
 
-        result = detector.detect_from_file(
-            file_bytes=contents,
-            filename=file.filename,
-            conf_threshold=confidence,
+    if format == "columnar":
+        return columnar_response(result)
+
+    return DetectionResponse(**result)
+
+
+def output_encoding(
+    output_format: str = Query(ANNOTATED_FORMAT, pattern="^(jpeg|webp|png)$", description="annotated image format"),
+    quality: int = Query(ANNOTATED_QUALITY, ge=1, le=100, description="JPEG/WebP quality, PNG compression effort"),
+    max_size: int = Query(ANNOTATED_MAX_SIZE, ge=0, le=16384, description="long side of the annotated image, 0 keeps it"),
+) -> OutputEncoding:
+    return OutputEncoding(output_format, quality, max_size)
+
+
+@app.post("/detect/annotated")
+async def detect_objects_annotated(
+    file: UploadFile = File(...),
+    confidence: float = Query(0.25, ge=0.0, le=1.0),
+    model: str | None = Query(None, description="model name from /models, defaults to DEFAULT_MODEL"),
+    encoding: OutputEncoding = Depends(output_encoding),
+):
+    with stage("read"):
+        contents = await read_upload(file, IMAGE_MAX_BYTES)
+    async with use_model(model) as loaded:
+        meta, annotated_bytes = await run_detection(
+            loaded, contents, file.filename, confidence, annotate=True, encoding=encoding
+        )
+
+    await log_annotated_detection(meta, confidence, annotated_bytes, encoding)
+
+    return StreamingResponse(
+        io.BytesIO(annotated_bytes),
+        media_type=encoding.media_type,
+        headers={
+            "X-Detection-Id": meta["detection_id"],
+            "X-Total-Objects": str(meta["total_objects"]),
+            "X-Processing-Time": str(meta["processing_time"]),
+        },
+    )
+
+
+@app.post("/detect/combined", response_model=AnnotatedDetectionResponse)
+async def detect_objects_combined(
+    file: UploadFile = File(...),
+    confidence: float = Query(0.25, ge=0.0, le=1.0),
+    model: str | None = Query(None, description="model name from /models, defaults to DEFAULT_MODEL"),
+    encoding: OutputEncoding = Depends(output_encoding),
+):
+    """runs inference once and returns detections together with the annotated image"""
+    with stage("read"):
+        contents = await read_upload(file, IMAGE_MAX_BYTES)
+    async with use_model(model) as loaded:
+        result, annotated_bytes = await run_detection(
+            loaded, contents, file.filename, confidence, annotate=True, encoding=encoding
         )
 
+    saved = await log_annotated_detection(result, confidence, annotated_bytes, encoding)
+
+    return AnnotatedDetectionResponse(
+        **result,
+        annotated_image=base64.b64encode(annotated_bytes).decode("ascii"),
+        annotated_image_type=encoding.media_type,
+        annotated_image_url=f"/detection/{result['detection_id']}/image" if saved else None,
+    )
+
+
+@app.post("/detect/batch")
+async def detect_objects_batch(
+    files: List[UploadFile] = File(...),
+    confidence: float = Query(0.25, ge=0.0, le=1.0),
+    model: str | None = Query(None, description="model name from /models, defaults to DEFAULT_MODEL"),
+):
+    """detects objects in many images, or zip/tar archives of images, in one request
+
+    results are streamed back as NDJSON in completion order, one line per image
+    with its index in the upload, followed by a summary line. all detections
+    are handed to the write-behind logger at the end.
+    """
+    # load up front so an unknown or broken model fails the request, not the stream
+    model_name = (await load_model(model)).name
+
+    uploads = []
+    for f in files:
+        max_bytes = ARCHIVE_MAX_BYTES if is_archive(f.filename, f.content_type) else IMAGE_MAX_BYTES
+        uploads.append((f.filename, f.content_type, await read_upload(f, max_bytes)))
+    try:
+        images = await run_in_threadpool(expand_uploads, uploads, BATCH_UPLOAD_MAX_IMAGES)
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not images:
+        raise HTTPException(status_code=400, detail="no images found in upload")
+
+    async def detect_one(loaded: LoadedModel, in_flight, index: int, filename: str, contents: bytes) -> dict:
+        async with in_flight:
+            try:
+                result, _ = await run_detection(loaded, contents, filename, confidence)
+            except HTTPException as e:
+                return {"index": index, "filename": filename, "error": e.detail}
+        return {"index": index, "result": result}
+
+    async def stream_results():
+        succeeded = []
+        async with use_model(model_name) as loaded:
+            # keep a couple of batches in flight so the scheduler can fill them
+            # without one large upload crowding everyone else out of the queue
+            in_flight = asyncio.Semaphore(loaded.scheduler.max_batch_size * 2)
+            tasks = [
+                asyncio.ensure_future(detect_one(loaded, in_flight, i, name, data))
+                for i, (name, data) in enumerate(images)
+            ]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    item = await next_done
+                    if "result" in item:
+                        succeeded.append(item["result"])
+                        item["result"] = DetectionResponse(**item["result"]).model_dump(mode="json")
+                    yield json.dumps(item) + "\n"
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+        logged = await run_in_threadpool(log_detections, succeeded, confidence)
+        summary = {
+            "total_images": len(images),
+            "succeeded": len(succeeded),
+            "failed": len(images) - len(succeeded),
+            "logged": logged,
+        }
+        yield json.dumps({"summary": summary}) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+def run_job(job: dict, progress) -> tuple:
+    """detects a queued job's images for the job runner, returns (results, errors)
+
+    images are read from disk a batch at a time and submitted with a timeout,
+    so a large job waits for room in the inference queue instead of being
+    rejected or crowding out interactive requests. an image that cannot get
+    into the queue after JOB_SUBMIT_ATTEMPTS waits is recorded as an error.
+    errors are keyed by the stored file name.
+    """
+    results, errors = [], {}
+    files = job_files(job["job_id"], expected=job["total_images"])
+    with registry.use(job["model"]) as loaded:
+        batch_size = loaded.scheduler.max_batch_size
+        for start in range(0, len(files), batch_size):
+            submitted = []
+            try:
+                for path in files[start : start + batch_size]:
+                    try:
+                        image, size, factor = load_image(path)
+                    except (OSError, ValueError) as e:
+                        errors[path.name] = str(e)
+                        continue
+
+                    future = None
+                    for _ in range(JOB_SUBMIT_ATTEMPTS):
+                        try:
+                            future = loaded.scheduler.submit(
+                                image=image,
+                                filename=original_filename(path),
+                                conf_threshold=job["confidence_threshold"],
+                                timeout=JOB_SUBMIT_TIMEOUT,
+                            )
+                            break
+                        except SchedulerBusy:
+                            # keeps the lease while waiting, and stops here if the job was cancelled
+                            progress(len(results) + len(errors), len(errors))
+                    if future is None:
+                        errors[path.name] = f"inference queue stayed full for {JOB_SUBMIT_ATTEMPTS * JOB_SUBMIT_TIMEOUT:.0f}s"
+                        continue
+                    submitted.append((path, image.shape, size, factor, future))
+
+                for path, shape, size, factor, future in submitted:
+                    try:
+                        result, _ = future.result()
+                    except Exception as e:
+                        errors[path.name] = f"detection failed: {str(e)}"
+                        continue
+                    record_stages(result.pop("timings", {}))
+                    result["model"] = loaded.name
+                    results.append(rescale_result(result, size, shape) if factor > 1 else result)
+            except BaseException:
+                # the scheduler skips cancelled requests, so an abandoned batch does not run
+                for *_, future in submitted:
+                    future.cancel()
+                raise
+
+            progress(len(results) + len(errors), len(errors))
+
+    return results, errors
+
+
+def job_status(job: dict) -> dict:
+    return {
+        **{k: v for k, v in job.items() if k != "detection_ids"},
+        "status_url": f"/jobs/{job['job_id']}",
+        "results_url": f"/jobs/{job['job_id']}/results",
+    }
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    confidence: float = Query(0.25, ge=0.0, le=1.0),
+    model: str | None = Query(None, description="model name from /models, defaults to DEFAULT_MODEL"),
+    priority: int = Query(0, ge=-100, le=100, description="higher priority jobs run first"),
+    x_client_id: str | None = Header(None, description="client the per-client concurrency limit applies to"),
+):
+    """queues images, or zip/tar archives of images, for detection and returns a job id right away
+
+    poll /jobs/{job_id} (wait=seconds long-polls) for progress and fetch the
+    detections from /jobs/{job_id}/results once it is done
+    """
+    model_name = resolve_model_name(model)
+    client_id = (x_client_id or (request.client.host if request.client else "anonymous"))[:100]
+
+    # uploads are spooled to disk and unpacked into the job directory one image at a time,
+    # so a job is never held in memory as a whole
+    spooled, remaining = [], JOB_UPLOAD_MAX_BYTES
+    try:
+        for f in files:
+            max_bytes = remaining if is_archive(f.filename, f.content_type) else min(remaining, IMAGE_MAX_BYTES)
+            path = await spool_upload(f, max_bytes)
+            spooled.append((f.filename, f.content_type, path))
+            remaining -= os.path.getsize(path)
+
+        images = iter_uploads(spooled, JOB_MAX_IMAGES, JOB_UPLOAD_MAX_BYTES)
         try:
-            detection_log = DetectionLog(
-                detection_id=result["detection_id"],
-                filename=result["filename"],
-                total_objects=result["total_objects"],
-                image_width=result["image_width"],
-                image_height=result["image_height"],
-                processing_time=result["processing_time"],
-                confidence_threshold=confidence,
-                detections=result["detections"],
-                created_at=result["timestamp"],
-            )
-            db.add(detection_log)
-            db.commit()
-
-            metrics = db.query(ModelMetrics).filter_by(model_name="YOLOv8n").first()
-            if metrics:
-                metrics.total_detections += 1
-                metrics.last_updated = datetime.now()
-                db.commit()
-
-            logger.info(f"logged detection {result['detection_id']} to database")
+            job = await run_in_threadpool(submit_job, images, client_id, model_name, confidence, priority)
+        except ImageTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        for _, _, path in spooled:
+            os.unlink(path)
+
+    return JSONResponse(status_code=202, content=job_status(job))
+
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=JOB_WAIT_MAX_SECONDS, description="seconds to wait for the job to finish"),
+):
+    """job progress; with wait, the response is held until the job finishes or wait runs out"""
+    deadline = time.monotonic() + wait
+    while True:
+        job = await run_in_threadpool(get_job, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="job not found")
+        if job["status"] in FINAL_STATUSES or time.monotonic() >= deadline:
+            return job_status(job)
+        await asyncio.sleep(min(JOB_POLL_INTERVAL_MS / 1000, max(0.0, deadline - time.monotonic())))
+
+
+@app.get("/jobs/{job_id}/results")
+def get_job_results(job_id: str, db: Session = Depends(get_db)):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"job is {job['status']}")
+
+    return {**job_status(job), "results": [export_row(log) for log in job_results(db, job)]}
+
+
+@app.delete("/jobs/{job_id}")
+def delete_job(job_id: str):
+    """cancels a job that has not finished yet"""
+    job = cancel_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job_status(job)
+
+
+def frame_result(index: int, timestamp, result: dict) -> dict:
+    return {
+        "frame": index,
+        "timestamp": timestamp,
+        "total_objects": result["total_objects"],
+        "detections": result["detections"],
+        "image_width": result["image_width"],
+        "image_height": result["image_height"],
+        "processing_time": result["processing_time"],
+    }
 
-        except Exception as e:
-            logger.error(f"database logging failed: {str(e)}")
-            db.rollback()
 
-        return DetectionResponse(**result)
+async def read_upload(file: UploadFile, max_bytes: int) -> bytes:
+    """reads an upload in chunks, rejecting it with 413 as soon as it passes max_bytes"""
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"upload larger than {max_bytes} bytes")
+
+    chunks, size = [], 0
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"upload larger than {max_bytes} bytes")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def spool_upload(file: UploadFile, max_bytes: int) -> str:
+    """copies an upload to a temp file in chunks, enforcing a size limit; the caller removes the file"""
+    suffix = Path(file.filename or "").suffix or ".mp4"
+    handle = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+    size = 0
+    try:
+        with handle:
+            while chunk := await file.read(VIDEO_UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"upload larger than {max_bytes} bytes")
+                await run_in_threadpool(handle.write, chunk)
+    except BaseException:
+        os.unlink(handle.name)
+        raise
+    return handle.name
+
+
+def stream_video_detections(model_name: str, capture, video_path: str, stride: int, target_fps, confidence: float):
+    """decodes, batches and detects frames, yielding one NDJSON line per frame
+
+    only one batch of frames is held at a time and submission waits for room
+    in the scheduler queue, so memory stays flat however long the video is.
+    """
+    frames_processed = 0
+    try:
+        with registry.use(model_name) as loaded:
+            frames = iter_frames(capture, stride, target_fps)
+            for batch in iter_batches(frames, loaded.scheduler.max_batch_size):
+                futures = [
+                    loaded.scheduler.submit(
+                        image=frame,
+                        filename=f"frame_{index}",
+                        conf_threshold=confidence,
+                        timeout=VIDEO_SUBMIT_TIMEOUT,
+                    )
+                    for index, _, frame in batch
+                ]
+                for (index, timestamp, _), future in zip(batch, futures):
+                    result, _ = future.result()
+                    record_stages(result.pop("timings", {}))
+                    frames_processed += 1
+                    yield json.dumps(frame_result(index, timestamp, result)) + "\n"
+
+        yield json.dumps({"summary": {"frames_processed": frames_processed}}) + "\n"
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"detection failed: {str(e)}")
+        logger.error(f"video detection failed: {str(e)}")
+        yield json.dumps({"error": f"detection failed: {str(e)}", "frames_processed": frames_processed}) + "\n"
 
+    finally:
+        capture.release()
+        os.unlink(video_path)
 
-@app.post("/detect/annotated")
-async def detect_objects_annotated(
+
+@app.post("/detect/video")
+async def detect_objects_video(
     file: UploadFile = File(...),
     confidence: float = Query(0.25, ge=0.0, le=1.0),
+    stride: int = Query(1, ge=1, le=1000),
+    target_fps: float | None = Query(None, gt=0, le=240),
+    model: str | None = Query(None, description="model name from /models, defaults to DEFAULT_MODEL"),
 ):
-    if file.content_type not in {"image/jpeg", "image/png", "image/jpg"}:
-        raise HTTPException(status_code=400, detail="only JPEG and PNG supported")
+    """detects objects frame by frame in an uploaded video
 
-    if not detector:
-        raise HTTPException(status_code=503, detail="model not loaded")
+    every stride-th frame is kept, thinned further to target_fps if given.
+    per-frame results are streamed back as NDJSON as soon as each batch of
+    frames is done. frames are not written to the detection history.
+    """
+    if file.content_type and not (
+        file.content_type.startswith("video/") or file.content_type == "application/octet-stream"
+    ):
+        raise HTTPException(status_code=400, detail="only video uploads supported")
+
+    model_name = (await load_model(model)).name
 
-    contents = await file.read()
+    video_path = await spool_upload(file, VIDEO_MAX_BYTES)
     try:
-        annotated_bytes, meta = detector.detect_and_annotate(
-            file_bytes=contents,
-            filename=file.filename,
-            conf_threshold=confidence,
-        )
-        return StreamingResponse(
-            io.BytesIO(annotated_bytes),
-            media_type="image/jpeg",
-            headers={
-                "X-Total-Objects": str(meta["total_objects"]),
-                "X-Processing-Time": str(meta["processing_time"]),
-            },
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"detection failed: {str(e)}")
+        capture = await run_in_threadpool(open_video, video_path)
+    except ValueError as e:
+        os.unlink(video_path)
+        raise HTTPException(status_code=400, detail=str(e))
 
+    return StreamingResponse(
+        stream_video_detections(model_name, capture, video_path, stride, target_fps, confidence),
+        media_type="application/x-ndjson",
+    )
 
-@app.get("/stats")
-async def get_statistics(db: Session = Depends(get_db)):
-    total_detections = db.query(DetectionLog).count()
-
-    if total_detections == 0:
-        return {
-            "total_detections": 0,
-            "average_processing_time": 0,
-            "total_objects_detected": 0,
-            "most_common_objects": [],
-        }
 
-    times = db.query(DetectionLog).with_entities(DetectionLog.processing_time).all()
-    avg_processing = sum([t[0] for t in times]) / len(times)
+@app.websocket("/ws/detect")
+async def detect_objects_stream(
+    websocket: WebSocket,
+    confidence: float = Query(0.25, ge=0.0, le=1.0),
+    stride: int = Query(1, ge=1, le=1000),
+    model: str | None = Query(None, description="model name from /models, defaults to DEFAULT_MODEL"),
+):
+    """live detection over a websocket
+
+    clients send encoded JPEG/PNG frames as binary messages and get one JSON
+    message back per processed frame. only the newest pending frame is kept,
+    so a client sending faster than inference sees frames dropped (reported in
+    each reply) instead of an ever growing backlog.
+    """
+    await websocket.accept()
 
-    objects = db.query(DetectionLog).with_entities(DetectionLog.total_objects).all()
-    total_obj_count = sum([o[0] for o in objects])
+    try:
+        loaded = await load_model(model, acquire=True)
+    except HTTPException as e:
+        await websocket.close(code=1008 if e.status_code == 404 else 1013, reason=e.detail)
+        return
+
+    latest: asyncio.Queue = asyncio.Queue(maxsize=1)
+    dropped = 0
 
-    metrics = db.query(ModelMetrics).filter_by(model_name="YOLOv8n").first()
+    async def receive_frames():
+        nonlocal dropped
+        index = 0
+        try:
+            while True:
+                data = await websocket.receive_bytes()
+                if index % stride == 0:
+                    if latest.full():
+                        latest.get_nowait()
+                        dropped += 1
+                    latest.put_nowait((index, data))
+                index += 1
+        except WebSocketDisconnect:
+            return
+
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        while True:
+            next_frame = asyncio.create_task(latest.get())
+            await asyncio.wait({next_frame, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if not next_frame.done():
+                next_frame.cancel()
+                break
+
+            index, data = next_frame.result()
+            try:
+                check_image(data)
+                image = await run_in_threadpool(decode_image, data)
+                result, _ = await infer_image(loaded, image, f"frame_{index}", confidence)
+            except ValueError as e:
+                await websocket.send_json({"frame": index, "error": str(e)})
+                continue
+            except HTTPException as e:
+                await websocket.send_json({"frame": index, "error": e.detail})
+                continue
+
+            await websocket.send_json({**frame_result(index, None, result), "dropped_frames": dropped})
+
+    except WebSocketDisconnect:
+        pass
+
+    finally:
+        receiver.cancel()
+        try:
+            await receiver
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            # a frame that could not be received ends the stream, the client is told why if it is still there
+            logger.warning(f"websocket receive failed: {e}")
+            try:
+                await websocket.send_json({"error": f"receive failed: {e}"})
+                await websocket.close(code=1011)
+            except Exception:
+                pass
+        finally:
+            registry.release(loaded)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus text exposition of stage latencies, queue depth, in-flight requests and memory"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/stats")
+def get_statistics(model: str | None = Query(None), db: Session = Depends(get_db)):
+    """answered from the running totals kept by update_rollups, not by scanning detection_logs"""
+    model_name = resolve_model_name(model)
+    rollup = db.query(DetectionRollup).filter_by(model_name=model_name, granularity="total").first()
+    summary = rollup_summary(rollup)
+
+    if summary["total_detections"] == 0:
+        return summary
+
+    model_metrics = db.query(ModelMetrics).filter_by(model_name=model_name).first()
 
     return {
-        "total_detections": total_detections,
-        "average_processing_time": round(avg_processing, 3),
-        "total_objects_detected": total_obj_count,
+        **summary,
         "model_info": {
-            "name": metrics.model_name if metrics else "YOLOv8n",
-            "total_classes": metrics.total_classes if metrics else 80,
-            "version": metrics.model_version if metrics else "8.0",
+            "name": model_name,
+            "total_classes": model_metrics.total_classes if model_metrics else None,
+            "version": model_metrics.model_version if model_metrics else None,
         },
     }
 
 
+@app.get("/stats/timeseries")
+def get_statistics_timeseries(
+    granularity: str = Query("hour", pattern="^(minute|hour|day)$"),
+    limit: int = Query(24, ge=1, le=1440),
+    model: str | None = Query(None),
+    db: Session = Depends(get_db),
+):
+    model_name = resolve_model_name(model)
+    rollups = (
+        db.query(DetectionRollup)
+        .filter_by(model_name=model_name, granularity=granularity)
+        .order_by(DetectionRollup.bucket_start.desc())
+        .limit(limit)
+        .all()
+    )
+
+    return {
+        "model": model_name,
+        "granularity": granularity,
+        "buckets": [
+            {"bucket_start": r.bucket_start.isoformat(), **rollup_summary(r, top_classes=5)}
+            for r in reversed(rollups)
+        ],
+    }
+
+
+@app.get("/stats/batching")
+async def get_batching_statistics(model: str | None = Query(None)):
+    loaded = registry.peek(resolve_model_name(model))
+    if not loaded:
+        raise HTTPException(status_code=503, detail="model not loaded")
+
+    return {"model": loaded.name, **loaded.scheduler.stats()}
+
+
+@app.get("/stats/cache")
+async def get_cache_statistics():
+    return result_cache.stats()
+
+
+@app.get("/stats/jobs")
+def get_job_statistics():
+    return {
+        "jobs": queue_stats(),
+        "runner": job_runner.stats() if job_runner else None,
+    }
+
+
+@app.get("/stats/partitions")
+def get_partition_statistics():
+    if partition_maintainer is None:
+        raise HTTPException(status_code=503, detail="partition maintenance not started")
+    return partition_maintainer.stats()
+
+
+@app.get("/stats/startup")
+async def get_startup_statistics():
+    """per-phase cold start breakdown and the time from process start to ready"""
+    return startup.summary()
+
+
 @app.get("/history")
-async def get_detection_history(
+def get_detection_history(
     limit: int = Query(10, ge=1, le=100),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
     db: Session = Depends(get_db),
 ):
-    detections = (
-        db.query(DetectionLog).order_by(DetectionLog.created_at.desc()).limit(limit).all()
-    )
+    """newest detections first, paged with the returned next_cursor"""
+    try:
+        detections, next_cursor = keyset_page(db.query(DetectionLog), cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     return {
         "total_returned": len(detections),
+        "next_cursor": next_cursor,
         "detections": [
             {
                 "detection_id": d.detection_id,
@@ -227,15 +1278,74 @@ async def get_detection_history(
     }
 
 
+@app.get("/history/export")
+def export_detection_history(
+    format: str = Query("ndjson", pattern=f"^({'|'.join(EXPORT_FORMATS)})$"),
+    since: datetime | None = None,
+    until: datetime | None = None,
+):
+    """streams every detection log in the time window, oldest first, as NDJSON, CSV or Parquet"""
+    suffix = "jsonl" if format == "ndjson" else format
+    return StreamingResponse(
+        export_stream(format, since, until),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="detections.{suffix}"'},
+    )
+
+
+def parse_region(region: str) -> tuple:
+    try:
+        x1, y1, x2, y2 = (float(v) for v in region.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="region must be x1,y1,x2,y2")
+    if x2 <= x1 or y2 <= y1:
+        raise HTTPException(status_code=400, detail="region must have x2 > x1 and y2 > y1")
+    return x1, y1, x2, y2
+
+
+@app.get("/detections/search")
+def search_detected_objects(
+    class_name: List[str] = Query(None),
+    class_id: List[int] = Query(None),
+    min_confidence: float | None = Query(None, ge=0.0, le=1.0),
+    max_confidence: float | None = Query(None, ge=0.0, le=1.0),
+    since: datetime | None = None,
+    until: datetime | None = None,
+    region: str | None = Query(None, description="x1,y1,x2,y2 in pixels"),
+    region_mode: str = Query("intersects", pattern=f"^({'|'.join(REGION_MODES)})$"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+):
+    """individual boxes filtered by class, confidence range, time window and image region, newest first"""
+    objects = search_objects(
+        db,
+        class_ids=class_id,
+        class_names=class_name,
+        min_confidence=min_confidence,
+        max_confidence=max_confidence,
+        since=since,
+        until=until,
+        region=parse_region(region) if region else None,
+        region_mode=region_mode,
+        limit=limit,
+    )
+
+    return {"total_returned": len(objects), "objects": [object_summary(o) for o in objects]}
+
+
 @app.get("/detection/{detection_id}")
-async def get_detection_details(
+def get_detection_details(
     detection_id: str,
     db: Session = Depends(get_db),
 ):
     detection = db.query(DetectionLog).filter_by(detection_id=detection_id).first()
 
     if not detection:
-        raise HTTPException(status_code=404, detail="detection not found")
+        # past the retention window the record only lives in its Parquet archive
+        archived = find_archived_detection(db, detection_id)
+        if archived is None:
+            raise HTTPException(status_code=404, detail="detection not found")
+        return archived
 
     return {
         "detection_id": detection.detection_id,
@@ -247,4 +1357,14 @@ async def get_detection_details(
         "confidence_threshold": detection.confidence_threshold,
         "detections": detection.detections,
         "created_at": detection.created_at.isoformat(),
-    }
\ No newline at end of file
+    }
+
+
+@app.get("/detection/{detection_id}/image")
+def get_detection_image(detection_id: str):
+    found = find_annotated_image(detection_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="annotated image not found")
+
+    path, media_type = found
+    return FileResponse(path, media_type=media_type)
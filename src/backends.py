@@ -0,0 +1,100 @@
+import logging
+import os
+import shutil
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "torch")
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "models")
+MODEL_IMGSZ = int(os.getenv("MODEL_IMGSZ", "640"))
+INTRA_OP_THREADS = int(os.getenv("INTRA_OP_THREADS", "0"))
+INTER_OP_THREADS = int(os.getenv("INTER_OP_THREADS", "0"))
+WARMUP_RUNS = int(os.getenv("WARMUP_RUNS", "2"))
+
+# backend name -> (ultralytics export format, suffix of the exported artifact)
+EXPORT_FORMATS = {
+    "onnx": ("onnx", ".onnx"),
+    "openvino": ("openvino", "_openvino_model"),
+    "torchscript": ("torchscript", ".torchscript"),
+}
+BACKENDS = ["torch", *EXPORT_FORMATS]
+
+
+def configure_threads(intra_op_threads: int = INTRA_OP_THREADS, inter_op_threads: int = INTER_OP_THREADS):
+    """caps the CPU thread pools, 0 leaves the library default in place
+
+    onnxruntime and openvino size their pools from OMP_NUM_THREADS when the
+    session is created, torch is configured directly.
+    """
+    if intra_op_threads > 0:
+        os.environ.setdefault("OMP_NUM_THREADS", str(intra_op_threads))
+
+    import torch
+
+    if intra_op_threads > 0:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads > 0:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError:
+            # can only be set once, before any inter-op parallel work has started
+            logger.warning("inter-op thread count already fixed, ignoring INTER_OP_THREADS")
+
+
+def resolve_model(
+    model_path: str,
+    backend: str = MODEL_BACKEND,
+    cache_dir: str = MODEL_CACHE_DIR,
+    imgsz: int = MODEL_IMGSZ,
+) -> str:
+    """returns weights ultralytics can load for the backend
+
+    non-torch backends are exported once into cache_dir and reused by every
+    later start, keyed by the source weights name and input size.
+    """
+    if backend == "torch":
+        return model_path
+
+    if backend not in EXPORT_FORMATS:
+        raise ValueError(f"unknown model backend {backend!r}, expected one of {BACKENDS}")
+
+    export_format, suffix = EXPORT_FORMATS[backend]
+    target = Path(cache_dir) / f"{Path(model_path).stem}_{imgsz}{suffix}"
+    if target.exists():
+        return str(target)
+
+    from ultralytics import YOLO
+
+    logger.info(f"exporting {model_path} to {backend}, this only happens once")
+    # dynamic axes let onnx and openvino take whatever batch size the scheduler forms
+    dynamic = backend in {"onnx", "openvino"}
+    exported = YOLO(model_path).export(format=export_format, imgsz=imgsz, dynamic=dynamic)
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    shutil.move(str(exported), str(target))
+    logger.info(f"cached {backend} model at {target}")
+    return str(target)
+
+
+def resolve_quantized(model_path: str, cache_dir: str = MODEL_CACHE_DIR, imgsz: int = MODEL_IMGSZ) -> str:
+    """an INT8 ONNX model with dynamically quantized weights, made once from the ONNX export
+
+    weights are stored as 8-bit and activations are quantized on the fly, so
+    no calibration images are needed. it runs on ONNX Runtime's CPU provider.
+    """
+    target = Path(cache_dir) / f"{Path(model_path).stem}_{imgsz}_int8.onnx"
+    if target.exists():
+        return str(target)
+
+    source = resolve_model(model_path, "onnx", cache_dir, imgsz)
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    logger.info(f"quantizing {source} to int8, this only happens once")
+    partial = target.with_name(target.stem + "_partial.onnx")
+    # ConvInteger kernels take unsigned 8-bit weights
+    quantize_dynamic(source, str(partial), weight_type=QuantType.QUInt8)
+    partial.replace(target)
+    logger.info(f"cached int8 model at {target}")
+    return str(target)
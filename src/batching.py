@@ -0,0 +1,204 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "10"))
+BATCH_QUEUE_SIZE = int(os.getenv("BATCH_QUEUE_SIZE", "64"))
+
+
+class SchedulerBusy(Exception):
+    """raised when the request queue is full and new work is rejected"""
+
+
+class BatchScheduler:
+    """collects concurrent detection requests into micro-batches
+
+    a single worker thread owns the model. it blocks for the first request,
+    then keeps collecting until the batch is full or max_wait_ms has passed
+    since that first request, and runs the whole batch in one forward pass.
+    the queue is bounded so overload is rejected up front instead of piling
+    up behind the model.
+    """
+
+    def __init__(
+        self,
+        detector,
+        max_batch_size: int = BATCH_MAX_SIZE,
+        max_wait_ms: float = BATCH_MAX_WAIT_MS,
+        max_queue_size: int = BATCH_QUEUE_SIZE,
+    ):
+        self.detector = detector
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self.max_queue_size = max(1, max_queue_size)
+
+        self._queue: queue.Queue = queue.Queue(maxsize=self.max_queue_size)
+        self._batch_sizes: Counter = Counter()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="batch-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(
+        self,
+        image,
+        filename: str,
+        conf_threshold: float = 0.25,
+        annotate: bool = False,
+        timeout: Optional[float] = None,
+        tile_size: int = 0,
+        tile_overlap: float = 0.0,
+        encoding=None,
+        profile=None,
+    ) -> Future:
+        """queues one request, rejecting it when the queue is full
+
+        with a timeout the caller waits up to that many seconds for room
+        instead, which gives streaming producers natural backpressure.
+        """
+        if self._stopped.is_set():
+            raise RuntimeError("batch scheduler is stopped")
+
+        future: Future = Future()
+        request = {
+            "image": image,
+            "filename": filename,
+            "conf_threshold": conf_threshold,
+            "annotate": annotate,
+            "tile_size": tile_size,
+            "tile_overlap": tile_overlap,
+            "encoding": encoding,
+            "profile": profile,
+            "enqueued_at": time.perf_counter(),
+        }
+        try:
+            if timeout is None:
+                self._queue.put_nowait((request, future))
+            else:
+                self._queue.put((request, future), timeout=timeout)
+        except queue.Full:
+            raise SchedulerBusy(f"inference queue is full ({self.max_queue_size} pending)")
+        return future
+
+    def stop(self, timeout: float = 5.0):
+        self._stopped.set()
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            # worker is not waiting on an empty queue, it will see the stop flag
+            pass
+        self._thread.join(timeout)
+
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(RuntimeError("batch scheduler is stopped"))
+
+    def ready(self) -> bool:
+        """whether the model behind the scheduler is warmed up, the in-process detector is before it starts"""
+        return True
+
+    def wait_ready(self, timeout: Optional[float] = None, interval: float = 0.05) -> bool:
+        """blocks until ready(), False if the scheduler stops or the timeout passes first"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.ready():
+            if self._stopped.is_set() or (deadline is not None and time.monotonic() >= deadline):
+                return False
+            time.sleep(interval)
+        return True
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            sizes = dict(self._batch_sizes)
+
+        total_batches = sum(sizes.values())
+        total_requests = sum(size * count for size, count in sizes.items())
+
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "max_queue_size": self.max_queue_size,
+            "queue_depth": self.queue_depth(),
+            "total_batches": total_batches,
+            "total_requests": total_requests,
+            "average_batch_size": round(total_requests / total_batches, 3) if total_batches else 0,
+            "batch_size_counts": {str(size): sizes[size] for size in sorted(sizes)},
+        }
+
+    def _collect(self) -> List[Tuple[Dict, Future]]:
+        first = self._queue.get()
+        if first is None:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                break
+            batch.append(item)
+
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._collect()
+
+            # drop requests whose caller already gave up
+            batch = [(request, future) for request, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            with self._lock:
+                self._batch_sizes[len(batch)] += 1
+
+            self._process(batch, time.perf_counter())
+
+    def _process(self, batch: List[Tuple[Dict, Future]], started: float):
+        try:
+            outputs = self.detector.detect_batch([request for request, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+
+            # one bad upload should not fail its neighbours, retry them one by one
+            logger.warning(f"batch of {len(batch)} failed, retrying individually: {e}")
+            for request, future in batch:
+                self._process_single(request, future, started)
+            return
+
+        for (request, future), output in zip(batch, outputs):
+            self._resolve(request, future, output, started)
+
+    def _process_single(self, request: Dict, future: Future, started: float):
+        try:
+            output: Optional[Tuple] = self.detector.detect_batch([request])[0]
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            self._resolve(request, future, output, started)
+
+    def _resolve(self, request: Dict, future: Future, output: Tuple, started: float):
+        timings = output[0].setdefault("timings", {})
+        timings["queue_wait"] = (started - request["enqueued_at"]) * 1000
+        future.set_result(output)
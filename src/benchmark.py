@@ -0,0 +1,335 @@
+"""offline benchmark for the detection hot path and the HTTP endpoints
+
+runs against synthetic images so results are reproducible without a dataset:
+
+    python -m src.benchmark --output results/benchmark.json
+    python -m src.benchmark --baseline results/baseline.json --tolerance 0.15
+
+stage timings cover decode, preprocess, inference, postprocess (as reported
+by ultralytics), box extraction, annotation + JPEG encode and DB logging, per
+image size and object density. the endpoint section measures /detect latency
+percentiles and throughput at each concurrency level, against --url or an
+in-process uvicorn server. the exit code is 1 when a baseline comparison
+finds a regression.
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+DEFAULT_SIZES = ["640x480", "1280x720", "1920x1080", "3840x2160"]
+DEFAULT_DENSITIES = [5, 50, 300]
+DEFAULT_CONCURRENCY = [1, 4, 16]
+
+# metrics where a larger number is better, everything else is a latency
+HIGHER_IS_BETTER = {"throughput_rps"}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    return {
+        "mean_ms": round(statistics.fmean(samples_ms), 3) if samples_ms else 0.0,
+        "p50_ms": round(percentile(samples_ms, 50), 3),
+        "p95_ms": round(percentile(samples_ms, 95), 3),
+        "p99_ms": round(percentile(samples_ms, 99), 3),
+        "samples": len(samples_ms),
+    }
+
+
+def time_ms(fn: Callable, repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def synthetic_image(width: int, height: int, density: int, seed: int = 0) -> np.ndarray:
+    """noisy background with `density` filled shapes, deterministic per seed"""
+    rng = np.random.default_rng(seed)
+    image = rng.integers(0, 255, size=(height, width, 3), dtype=np.uint8)
+    image = cv2.GaussianBlur(image, (0, 0), 3)
+    for _ in range(density):
+        x1, y1 = int(rng.integers(0, width - 8)), int(rng.integers(0, height - 8))
+        x2 = min(width - 1, x1 + int(rng.integers(8, max(9, width // 8))))
+        y2 = min(height - 1, y1 + int(rng.integers(8, max(9, height // 8))))
+        color = tuple(int(c) for c in rng.integers(0, 255, size=3))
+        cv2.rectangle(image, (x1, y1), (x2, y2), color, -1)
+    return image
+
+
+def synthetic_boxes(width: int, height: int, density: int, num_classes: int, seed: int = 0) -> np.ndarray:
+    """n x 6 array of x1, y1, x2, y2, conf, cls, the layout of Boxes.data"""
+    rng = np.random.default_rng(seed)
+    x1 = rng.uniform(0, width * 0.9, density)
+    y1 = rng.uniform(0, height * 0.9, density)
+    x2 = np.minimum(width, x1 + rng.uniform(8, width * 0.1, density))
+    y2 = np.minimum(height, y1 + rng.uniform(8, height * 0.1, density))
+    conf = rng.uniform(0.25, 1.0, density)
+    cls = rng.integers(0, num_classes, density)
+    return np.stack([x1, y1, x2, y2, conf, cls], axis=1).astype(np.float32)
+
+
+def parse_size(size: str) -> tuple:
+    width, height = size.lower().split("x")
+    return int(width), int(height)
+
+
+def bench_stages(detector, sizes: List[str], densities: List[int], repeat: int, database_url: str) -> Dict:
+    import torch
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from ultralytics.engine.results import Results
+
+    from src.database import Base
+    from src.detector import box_array, decode_image, extract_detections
+    from src.writer import persist_detections
+
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    report = {}
+    for size in sizes:
+        width, height = parse_size(size)
+        for density in densities:
+            image = synthetic_image(width, height, density)
+            _, encoded = cv2.imencode(".jpg", image)
+            file_bytes = encoded.tobytes()
+
+            decode = time_ms(lambda: decode_image(file_bytes), repeat)
+
+            speeds = {"preprocess": [], "inference": [], "postprocess": []}
+            for _ in range(repeat):
+                result = detector.model(image, verbose=False)[0]
+                for stage in speeds:
+                    speeds[stage].append(result.speed[stage])
+
+            # a synthetic result with exactly `density` boxes, so extraction and
+            # drawing cost scales with the requested density whatever the model sees
+            boxes = torch.from_numpy(synthetic_boxes(width, height, density, len(detector.model.names)))
+            crowded = Results(orig_img=image, path="", names=detector.model.names, boxes=boxes)
+
+            extract = time_ms(lambda: extract_detections(crowded), repeat)
+            data = box_array(crowded)
+            # drawing is in place, so every run gets a fresh copy of the decoded image
+            annotate = time_ms(lambda: detector.renderer.render(image.copy(), data), repeat)
+
+            detection = {
+                "filename": "benchmark.jpg",
+                "total_objects": density,
+                "detections": extract_detections(crowded),
+                "image_width": width,
+                "image_height": height,
+                "processing_time": 0.0,
+            }
+
+            def log_once():
+                # the cost of one write-behind flush holding a single detection
+                db = Session()
+                try:
+                    entry = {**detection, "detection_id": f"bench_{time.perf_counter_ns()}", "timestamp": datetime.now()}
+                    persist_detections(db, [(entry, 0.25)])
+                    db.commit()
+                finally:
+                    db.close()
+
+            db_logging = time_ms(log_once, repeat)
+
+            case = report[f"{size}/d{density}"] = {
+                "decode": summarize(decode),
+                "preprocess": summarize(speeds["preprocess"]),
+                "inference": summarize(speeds["inference"]),
+                "postprocess": summarize(speeds["postprocess"]),
+                "extract": summarize(extract),
+                "annotate_encode": summarize(annotate),
+                "db_logging": summarize(db_logging),
+            }
+            print(f"stages {size} density={density}: inference p50 {case['inference']['p50_ms']}ms")
+
+    engine.dispose()
+    return report
+
+
+def start_local_server() -> tuple:
+    """runs the app in uvicorn on a free port, returns (base_url, server)"""
+    import uvicorn
+
+    from src.api import app
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}", server
+
+
+def endpoint_payload(file_bytes: bytes, index: int) -> bytes:
+    """the upload of one /detect request, one trailing index per request so the result cache does not answer for the model"""
+    return file_bytes + index.to_bytes(4, "little")
+
+
+def bench_endpoint(base_url: str, sizes: List[str], concurrency_levels: List[int], requests_per_level: int) -> Dict:
+    import httpx
+
+    report = {}
+    with httpx.Client(base_url=base_url, timeout=120) as client:
+        for size in sizes:
+            width, height = parse_size(size)
+            _, encoded = cv2.imencode(".jpg", synthetic_image(width, height, 20))
+            file_bytes = encoded.tobytes()
+
+            def post(i: int):
+                payload = endpoint_payload(file_bytes, i)
+                start = time.perf_counter()
+                response = client.post("/detect", files={"file": ("bench.jpg", payload, "image/jpeg")})
+                return (time.perf_counter() - start) * 1000, response.status_code
+
+            # the warm-up index lies past the measured range, so its result is not cached for them
+            post(requests_per_level)
+            for concurrency in concurrency_levels:
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                    outcomes = list(pool.map(post, range(requests_per_level)))
+                wall = time.perf_counter() - start
+
+                latencies = [ms for ms, status in outcomes if status == 200]
+                case = report[f"{size}/c{concurrency}"] = {
+                    **summarize(latencies),
+                    "throughput_rps": round(len(latencies) / wall, 3) if wall else 0.0,
+                    "errors": sum(1 for _, status in outcomes if status != 200),
+                }
+                print(f"/detect {size} concurrency={concurrency}: p50 {case['p50_ms']}ms, {case['throughput_rps']} req/s")
+
+    return report
+
+
+def flatten(report: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in report.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """lists every latency or throughput that got worse than the baseline by more than tolerance"""
+    baseline_flat = flatten({k: baseline.get(k, {}) for k in ("stages", "endpoints")})
+    regressions = []
+
+    for name, value in flatten({k: current.get(k, {}) for k in ("stages", "endpoints")}).items():
+        base = baseline_flat.get(name)
+        metric = name.rsplit(".", 1)[-1]
+        if not base:
+            continue
+
+        if metric in HIGHER_IS_BETTER:
+            worse = value < base * (1 - tolerance)
+        elif metric.endswith("_ms"):
+            worse = value > base * (1 + tolerance)
+        else:
+            continue
+
+        if worse:
+            regressions.append(f"{name}: {base} -> {value}")
+
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="benchmark the detection hot path and /detect")
+    parser.add_argument("--sizes", default=",".join(DEFAULT_SIZES))
+    parser.add_argument("--densities", default=",".join(str(d) for d in DEFAULT_DENSITIES))
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--concurrency", default=",".join(str(c) for c in DEFAULT_CONCURRENCY))
+    parser.add_argument("--requests", type=int, default=50, help="requests per concurrency level")
+    parser.add_argument("--url", help="benchmark a running server instead of an in-process one")
+    parser.add_argument("--database-url", default="sqlite://", help="database used for the db_logging stage")
+    parser.add_argument("--skip-stages", action="store_true")
+    parser.add_argument("--skip-endpoints", action="store_true")
+    parser.add_argument("--output", default="results/benchmark.json")
+    parser.add_argument("--baseline", help="earlier output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed slowdown, 0.15 = 15%%")
+    args = parser.parse_args(argv)
+
+    sizes = [s for s in args.sizes.split(",") if s]
+    densities = [int(d) for d in args.densities.split(",") if d]
+    concurrency = [int(c) for c in args.concurrency.split(",") if c]
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        }
+    }
+
+    if not args.skip_stages:
+        from src.detector import ObjectDetector
+
+        detector = ObjectDetector(warmup_runs=2)
+        report["meta"].update({"model": detector.model_id, "backend": detector.backend})
+        report["stages"] = bench_stages(detector, sizes, densities, args.repeat, args.database_url)
+
+    if not args.skip_endpoints:
+        server = None
+        base_url = args.url
+        if not base_url:
+            base_url, server = start_local_server()
+        try:
+            report["endpoints"] = bench_endpoint(base_url, sizes, concurrency, args.requests)
+        finally:
+            if server is not None:
+                server.should_exit = True
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"saved benchmark: {output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressions beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"no regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
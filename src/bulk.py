@@ -0,0 +1,372 @@
+"""bulk detection over image directories or file lists, for offline backfills
+
+    python -m src.bulk images/ --output results/detections.ndjson
+    python -m src.bulk --file-list paths.txt --output results/detections.parquet --batch-size 16
+
+images are read and decoded by a thread pool ahead of the model and run
+through it in batches. results go to a single NDJSON or Parquet file with
+one row per image and its detections as class_id, class_name, confidence and
+bbox list columns. a manifest next to the output records every finished
+batch, so a run that is interrupted and started again with the same output
+skips the images it already wrote. throughput is printed as images/sec while
+the run goes and in the final summary.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from src.detector import detections_to_columns
+from src.preprocess import load_image, rescale_result
+from src.render import OUTPUT_FORMATS, OutputEncoding
+from src.uploads import IMAGE_EXTENSIONS
+from src.workers import detect_with_retry
+
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "8"))
+# decode threads, and how many decoded images may wait in front of the model
+BULK_DECODE_WORKERS = int(os.getenv("BULK_DECODE_WORKERS", str(min(8, os.cpu_count() or 1))))
+BULK_PREFETCH = int(os.getenv("BULK_PREFETCH", "32"))
+
+ROW_COLUMNS = (
+    "path",
+    "filename",
+    "total_objects",
+    "image_width",
+    "image_height",
+    "processing_time",
+    "class_id",
+    "class_name",
+    "confidence",
+    "bbox",
+    "error",
+)
+
+
+def list_images(paths: Iterable[str], file_list: Optional[str] = None) -> List[Path]:
+    """image files under the given directories and files, plus those named in file_list, without duplicates"""
+    candidates: List[Path] = []
+    for entry in paths:
+        path = Path(entry)
+        if path.is_dir():
+            candidates.extend(sorted(p for p in path.rglob("*") if p.is_file()))
+        else:
+            candidates.append(path)
+    if file_list:
+        lines = Path(file_list).read_text().splitlines()
+        candidates.extend(Path(line.strip()) for line in lines if line.strip())
+
+    images, seen = [], set()
+    for path in candidates:
+        key = str(path.resolve())
+        if path.suffix.lower() in IMAGE_EXTENSIONS and not path.name.startswith(".") and key not in seen:
+            seen.add(key)
+            images.append(path)
+    return images
+
+
+def prefetch(paths: List[Path], load, workers: int = BULK_DECODE_WORKERS, depth: int = BULK_PREFETCH) -> Iterator:
+    """yields (path, loaded, error) in input order while up to depth later images decode in the background"""
+    with ThreadPoolExecutor(max(1, workers), thread_name_prefix="bulk-decode") as pool:
+        remaining = iter(paths)
+        pending = deque()
+        for path in remaining:
+            pending.append((path, pool.submit(load, path)))
+            if len(pending) >= max(1, depth):
+                break
+
+        while pending:
+            path, future = pending.popleft()
+            following = next(remaining, None)
+            if following is not None:
+                pending.append((following, pool.submit(load, following)))
+            try:
+                yield path, future.result(), None
+            except Exception as e:
+                yield path, None, str(e)
+
+
+def result_row(path: Path, result: Optional[Dict] = None, error: Optional[str] = None) -> Dict:
+    columns = detections_to_columns(result["detections"] if result else [])
+    return {
+        "path": str(path),
+        "filename": path.name,
+        "total_objects": result["total_objects"] if result else 0,
+        "image_width": result["image_width"] if result else None,
+        "image_height": result["image_height"] if result else None,
+        "processing_time": result["processing_time"] if result else None,
+        **columns,
+        "error": error,
+    }
+
+
+class Manifest:
+    """append-only record of finished batches, one JSON line per batch
+
+    each line lists the images of the batch and where its rows went: the
+    NDJSON byte offset after the batch, or the Parquet part file it wrote.
+    a batch is only recorded after its rows are on disk, so the manifest
+    never claims more than the output holds.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.done: Set[str] = set()
+        self.offset = 0
+        self.parts: List[str] = []
+        self.batches = 0
+
+        if not path.exists():
+            return
+        lines = path.read_text().splitlines()
+        for count, line in enumerate(lines):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # a line cut short by the interruption, dropped so later batches append cleanly
+                path.write_text("".join(kept + "\n" for kept in lines[:count]))
+                break
+            self.done.update(entry["images"])
+            self.offset = entry.get("offset", self.offset)
+            if "part" in entry:
+                self.parts.append(entry["part"])
+            self.batches += 1
+
+    def record(self, images: List[str], **location):
+        with open(self.path, "a") as handle:
+            handle.write(json.dumps({"images": images, **location}) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+        self.done.update(images)
+        self.parts.extend([location["part"]] if "part" in location else [])
+        self.offset = location.get("offset", self.offset)
+        self.batches += 1
+
+
+class NdjsonSink:
+    """appends rows to one NDJSON file, cut back to the last recorded batch when resuming"""
+
+    def __init__(self, output: Path, manifest: Manifest):
+        self.manifest = manifest
+        self.handle = open(output, "a+b")
+        # anything after the last recorded offset belongs to a batch the manifest never saw
+        self.handle.truncate(manifest.offset)
+        self.handle.seek(manifest.offset)
+
+    def write(self, rows: List[Dict], keys: List[str]):
+        self.handle.write("".join(json.dumps(row) + "\n" for row in rows).encode())
+        self.handle.flush()
+        os.fsync(self.handle.fileno())
+        self.manifest.record(keys, offset=self.handle.tell())
+
+    def close(self):
+        self.handle.close()
+
+
+class ParquetSink:
+    """writes each batch as a part file and merges the recorded parts into the output at the end
+
+    the parts stay next to the output so a later run can add to it; remove
+    the parts directory together with the manifest once a backfill is final.
+    """
+
+    def __init__(self, output: Path, manifest: Manifest):
+        import polars as pl
+
+        self.output = output
+        self.manifest = manifest
+        self.parts_dir = output.with_name(output.name + ".parts")
+        self.parts_dir.mkdir(parents=True, exist_ok=True)
+        self.schema = {
+            "path": pl.String,
+            "filename": pl.String,
+            "total_objects": pl.Int64,
+            "image_width": pl.Int64,
+            "image_height": pl.Int64,
+            "processing_time": pl.Float64,
+            "class_id": pl.List(pl.Int64),
+            "class_name": pl.List(pl.String),
+            "confidence": pl.List(pl.Float64),
+            "bbox": pl.List(pl.List(pl.Float64)),
+            "error": pl.String,
+        }
+        # parts left by a batch that never made it into the manifest
+        recorded = set(manifest.parts)
+        for part in self.parts_dir.glob("*.parquet"):
+            if part.name not in recorded:
+                part.unlink()
+
+    def write(self, rows: List[Dict], keys: List[str]):
+        import polars as pl
+
+        frame = pl.DataFrame({c: [row[c] for row in rows] for c in ROW_COLUMNS}, schema=self.schema)
+        name = f"part_{self.manifest.batches:06d}.parquet"
+        frame.write_parquet(self.parts_dir / name)
+        self.manifest.record(keys, part=name)
+
+    def close(self):
+        import polars as pl
+
+        partial = self.output.with_name(self.output.name + ".tmp")
+        if self.manifest.parts:
+            pl.scan_parquet([str(self.parts_dir / p) for p in self.manifest.parts]).sink_parquet(partial)
+        else:
+            pl.DataFrame(schema=self.schema).write_parquet(partial)
+        os.replace(partial, self.output)
+
+
+def output_format(output: Path) -> str:
+    return "parquet" if output.suffix.lower() == ".parquet" else "ndjson"
+
+
+def run_bulk(
+    detector,
+    images: List[Path],
+    output: Path,
+    batch_size: int = BULK_BATCH_SIZE,
+    conf_threshold: float = 0.25,
+    decode_workers: int = BULK_DECODE_WORKERS,
+    prefetch_depth: int = BULK_PREFETCH,
+    annotate_dir: Optional[Path] = None,
+    encoding: Optional[OutputEncoding] = None,
+    report_every: float = 10.0,
+    log=print,
+) -> Dict:
+    """detects every image not yet in the output's manifest and returns the run summary"""
+    output.parent.mkdir(parents=True, exist_ok=True)
+    manifest = Manifest(output.with_name(output.name + ".manifest"))
+    todo = [path for path in images if str(path.resolve()) not in manifest.done]
+    skipped = len(images) - len(todo)
+    if skipped:
+        log(f"resuming: {skipped} of {len(images)} images already done")
+
+    if annotate_dir is not None:
+        annotate_dir.mkdir(parents=True, exist_ok=True)
+        encoding = encoding or OutputEncoding()
+    sink = ParquetSink(output, manifest) if output_format(output) == "parquet" else NdjsonSink(output, manifest)
+
+    def load(path: Path):
+        # annotated images are drawn at the decoded size, so they are decoded in full
+        return load_image(path, reduce=annotate_dir is None)
+
+    processed = failed = 0
+    start = last_report = time.perf_counter()
+
+    def flush(batch: List[Tuple[Path, Optional[tuple], Optional[str]]]):
+        nonlocal processed, failed
+        loaded = [(path, item) for path, item, error in batch if error is None]
+        requests = [
+            {
+                "image": image,
+                "filename": path.name,
+                "conf_threshold": conf_threshold,
+                "annotate": annotate_dir is not None,
+                "encoding": encoding,
+            }
+            for path, (image, _, _) in loaded
+        ]
+        outcomes = iter(detect_with_retry(detector, requests) if requests else [])
+
+        rows = []
+        for path, item, error in batch:
+            if error is None:
+                status, payload = next(outcomes)
+                if status == "ok":
+                    result, annotated_bytes = payload
+                    _, size, factor = item
+                    if factor > 1:
+                        result = rescale_result(result, size, item[0].shape)
+                    if annotated_bytes is not None:
+                        (annotate_dir / f"{path.stem}{encoding.extension}").write_bytes(annotated_bytes)
+                    rows.append(result_row(path, result))
+                    continue
+                error = payload
+            failed += 1
+            rows.append(result_row(path, error=error))
+
+        sink.write(rows, [str(path.resolve()) for path, _, _ in batch])
+        processed += len(batch)
+
+    try:
+        batch = []
+        for entry in prefetch(todo, load, decode_workers, prefetch_depth):
+            batch.append(entry)
+            if len(batch) >= max(1, batch_size):
+                flush(batch)
+                batch = []
+
+            now = time.perf_counter()
+            if now - last_report >= report_every:
+                last_report = now
+                log(f"{processed}/{len(todo)} images, {processed / (now - start):.1f} images/sec")
+        if batch:
+            flush(batch)
+    finally:
+        sink.close()
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        "images": len(images),
+        "skipped": skipped,
+        "processed": processed,
+        "failed": failed,
+        "elapsed_seconds": round(elapsed, 3),
+        "images_per_sec": round(processed / elapsed, 3) if elapsed > 0 else 0.0,
+        "output": str(output),
+    }
+    log(
+        f"done: {processed} images in {summary['elapsed_seconds']}s, "
+        f"{summary['images_per_sec']} images/sec, {failed} failed"
+    )
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="detect objects in many images and write one columnar output")
+    parser.add_argument("paths", nargs="*", help="image files or directories, searched recursively")
+    parser.add_argument("--file-list", help="text file with one image path per line")
+    parser.add_argument("--output", default="results/detections.ndjson", help=".ndjson or .parquet")
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--confidence", type=float, default=0.25)
+    parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE)
+    parser.add_argument("--decode-workers", type=int, default=BULK_DECODE_WORKERS)
+    parser.add_argument("--prefetch", type=int, default=BULK_PREFETCH, help="decoded images kept ahead of the model")
+    parser.add_argument("--annotate-dir", help="also write annotated images here")
+    parser.add_argument("--annotate-format", default="jpeg", choices=sorted(OUTPUT_FORMATS))
+    parser.add_argument("--report-every", type=float, default=10.0, help="seconds between progress lines")
+    parser.add_argument("--summary", help="write the run summary as JSON to this file")
+    args = parser.parse_args(argv)
+
+    images = list_images(args.paths, args.file_list)
+    if not images:
+        print("no .jpg or .png images found")
+        return 1
+
+    from src.detector import ObjectDetector
+
+    detector = ObjectDetector(args.model, warmup_runs=1)
+    summary = run_bulk(
+        detector,
+        images,
+        Path(args.output),
+        batch_size=args.batch_size,
+        conf_threshold=args.confidence,
+        decode_workers=args.decode_workers,
+        prefetch_depth=args.prefetch,
+        annotate_dir=Path(args.annotate_dir) if args.annotate_dir else None,
+        encoding=OutputEncoding(format=args.annotate_format),
+        report_every=args.report_every,
+    )
+
+    if args.summary:
+        Path(args.summary).write_text(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+CACHE_BASE_CONFIDENCE = float(os.getenv("CACHE_BASE_CONFIDENCE", "0.1"))
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", "cache/results.sqlite3")
+CACHE_SQLITE_MAX_ENTRIES = int(os.getenv("CACHE_SQLITE_MAX_ENTRIES", "100000"))
+
+
+def cache_key(file_bytes: bytes, model_id: str) -> str:
+    """content hash of the upload, scoped to the model that produced the result"""
+    digest = hashlib.blake2b(memoryview(file_bytes), digest_size=20)
+    digest.update(model_id.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def filter_detections(detections: List[Dict], conf_threshold: float) -> List[Dict]:
+    return [d for d in detections if d["confidence"] >= conf_threshold]
+
+
+class SQLiteCacheBackend:
+    """shared second tier, lets every worker on a host reuse each other's results"""
+
+    def __init__(self, path: str = CACHE_SQLITE_PATH, max_entries: int = CACHE_SQLITE_MAX_ENTRIES):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, entry TEXT, accessed_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_results_accessed_at ON results (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT entry FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def set(self, key: str, entry: Dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, entry, accessed_at) VALUES (?, ?, ?)",
+                (key, json.dumps(entry), time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM results WHERE key IN "
+                "(SELECT key FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ResultCache:
+    """size-bounded LRU of detection results keyed by image content and model
+
+    entries hold every detection at or above the confidence they were computed
+    with, so a lookup at a higher confidence is answered by filtering. a lookup
+    below the stored confidence is a miss.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, backend: Optional[SQLiteCacheBackend] = None):
+        self.max_entries = max_entries
+        self.backend = backend
+
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def lookup(self, key: str, conf_threshold: float) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is None and self.backend is not None:
+            entry = self.backend.get(key)
+            if entry is not None:
+                self._remember(key, entry)
+
+        with self._lock:
+            if entry is None or entry["conf_threshold"] > conf_threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        return entry
+
+    def store(self, key: str, entry: Dict):
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None and existing["conf_threshold"] <= entry["conf_threshold"]:
+                return
+
+        self._remember(key, entry)
+        if self.backend is not None:
+            self.backend.set(key, entry)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "backend": "sqlite" if self.backend is not None else "memory",
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0,
+            }
+
+    def _remember(self, key: str, entry: Dict):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+
+def create_result_cache() -> ResultCache:
+    backend = None
+    if CACHE_BACKEND == "sqlite" and CACHE_MAX_ENTRIES > 0:
+        backend = SQLiteCacheBackend(CACHE_SQLITE_PATH)
+    return ResultCache(CACHE_MAX_ENTRIES, backend)
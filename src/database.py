@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, JSON, Text
+from sqlalchemy import create_engine, inspect, text, Column, Integer, String, Float, DateTime, JSON, Text, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -30,15 +30,18 @@ class DetectionLog(Base):
     __tablename__ = "detection_logs"
     
     id = Column(Integer, primary_key=True, index=True)
-    detection_id = Column(String(50), unique=True, index=True)
+    # not unique: on postgres the table is range partitioned by created_at, and a unique
+    # index there would have to include it. ids are random, collisions are not expected
+    detection_id = Column(String(50), index=True)
     filename = Column(String(255))
     total_objects = Column(Integer)
     image_width = Column(Integer)
     image_height = Column(Integer)
     processing_time = Column(Float)
     confidence_threshold = Column(Float)
+    model_name = Column(String(50), nullable=True)  # null for rows logged before the model registry
     detections = Column(JSON)  # Store full detections as JSON
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     
     def __repr__(self):
         return f"<DetectionLog(id={self.id}, objects={self.total_objects})>"
@@ -62,9 +65,136 @@ class ModelMetrics(Base):
         return f"<ModelMetrics(model={self.model_name})>"
 
 
+class DetectionRollup(Base):
+    """Running detection aggregates per model and time bucket"""
+    
+    __tablename__ = "detection_rollups"
+    __table_args__ = (UniqueConstraint("model_name", "granularity", "bucket_start"),)
+    
+    id = Column(Integer, primary_key=True)
+    model_name = Column(String(50))
+    granularity = Column(String(10))  # total, minute, hour or day
+    bucket_start = Column(DateTime)
+    detection_count = Column(Integer, default=0)
+    total_objects = Column(Integer, default=0)
+    processing_time_sum = Column(Float, default=0.0)
+    processing_time_max = Column(Float, default=0.0)
+    latency_histogram = Column(JSON)  # counts per rollups.LATENCY_BOUNDS bucket
+    class_counts = Column(JSON)  # class name -> objects detected
+    
+    def __repr__(self):
+        return f"<DetectionRollup({self.granularity} {self.bucket_start}, count={self.detection_count})>"
+
+
+class DetectedObject(Base):
+    """One row per detected box, for per-class and spatial queries"""
+    
+    __tablename__ = "detected_objects"
+    __table_args__ = (
+        Index("ix_detected_objects_class_time", "class_id", "created_at"),
+        Index("ix_detected_objects_class_confidence", "class_id", "confidence"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    detection_id = Column(String(50), index=True)  # detection_logs.detection_id
+    class_id = Column(Integer)
+    class_name = Column(String(50))
+    confidence = Column(Float, index=True)
+    x1 = Column(Float)
+    y1 = Column(Float)
+    x2 = Column(Float)
+    y2 = Column(Float)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f"<DetectedObject({self.class_name} {self.confidence:.2f}, detection={self.detection_id})>"
+
+
+class DetectionJob(Base):
+    """Detection work submitted through /jobs, drained by the job runners"""
+    
+    __tablename__ = "detection_jobs"
+    __table_args__ = (
+        Index("ix_detection_jobs_queue", "status", "priority", "created_at"),
+        Index("ix_detection_jobs_client_status", "client_id", "status"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    job_id = Column(String(50), unique=True, index=True)
+    client_id = Column(String(100))
+    status = Column(String(20))  # queued, running, done, failed or cancelled
+    priority = Column(Integer, default=0)  # higher runs first
+    model_name = Column(String(50), nullable=True)
+    confidence_threshold = Column(Float)
+    total_images = Column(Integer, default=0)
+    processed_images = Column(Integer, default=0)
+    failed_images = Column(Integer, default=0)
+    attempts = Column(Integer, default=0)
+    detection_ids = Column(JSON)  # detection_logs.detection_id of every result
+    errors = Column(JSON)  # filename -> error for images that failed
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)  # a running job past this is requeued
+    
+    def __repr__(self):
+        return f"<DetectionJob({self.job_id} {self.status}, client={self.client_id})>"
+
+
+class DetectionArchive(Base):
+    """An expired partition of detection history moved to a Parquet file"""
+    
+    __tablename__ = "detection_archives"
+    
+    id = Column(Integer, primary_key=True)
+    period_start = Column(DateTime)
+    period_end = Column(DateTime)
+    path = Column(String(500))
+    row_count = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<DetectionArchive({self.period_start} - {self.period_end}, rows={self.row_count})>"
+
+
+class ArchivedDetection(Base):
+    """Which archive an expired detection_id was moved to"""
+    
+    __tablename__ = "archived_detections"
+    
+    id = Column(Integer, primary_key=True)
+    detection_id = Column(String(50), index=True)
+    archive_id = Column(Integer)  # detection_archives.id
+    
+    def __repr__(self):
+        return f"<ArchivedDetection({self.detection_id}, archive={self.archive_id})>"
+
+
+def ensure_columns():
+    """Add nullable columns that were added to a model after its table was created"""
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            with engine.begin() as connection:
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            print(f"Added column {table.name}.{column.name}")
+
+
 def create_tables():
     """Create all database tables"""
     Base.metadata.create_all(bind=engine)
+    ensure_columns()
+    # create_all skips existing tables, so indexes added later are created here
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
     print("Database tables created successfully")
 
 
@@ -1,35 +1,180 @@
-from ultralytics import YOLO
-import cv2
-from typing import Dict, List
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+import threading
 import uuid
+from pathlib import Path
 import time
 from datetime import datetime
-from pathlib import Path
+
+from src.backends import MODEL_BACKEND, MODEL_IMGSZ, WARMUP_RUNS, configure_threads, resolve_model, resolve_quantized
+from src.profiles import InferenceProfile, class_ids
+from src.render import AnnotationRenderer, OutputEncoding
+from src.tiling import TILE_NMS_IOU, fit_tile_size, merge_tile_detections, tile_offsets, tile_views
+
+
+def decode_image(file_bytes: bytes) -> np.ndarray:
+    """decodes an encoded upload straight from memory into a BGR array"""
+    import cv2
+
+    buffer = np.frombuffer(memoryview(file_bytes), dtype=np.uint8)
+    image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("could not decode image")
+    return image
+
+
+def extract_detections(result, conf_threshold: float = 0.0) -> List[Dict]:
+    """converts a result's boxes to detection dicts
+
+    boxes.data holds x1, y1, x2, y2, (track id,) conf, cls per row, so it is
+    moved to the host once and sliced as whole columns instead of touching
+    every box tensor individually.
+    """
+    return detections_from_array(box_array(result), result.names, conf_threshold)
+
+
+def box_array(result) -> np.ndarray:
+    """(x1, y1, x2, y2, conf, cls) rows, dropping the track id column when present"""
+    data = result.boxes.data.cpu().numpy()
+    return np.concatenate([data[:, :4], data[:, -2:]], axis=1)
+
+
+def detections_from_array(data: np.ndarray, names: Dict[int, str], conf_threshold: float = 0.0) -> List[Dict]:
+    if conf_threshold > 0:
+        data = data[data[:, 4] >= conf_threshold]
+
+    class_ids = data[:, 5].astype(int).tolist()
+    confidences = data[:, 4].tolist()
+    bboxes = data[:, :4].tolist()
+
+    return [
+        {
+            "class_id": class_id,
+            "class_name": names[class_id],
+            "confidence": confidence,
+            "bbox": bbox,
+        }
+        for class_id, confidence, bbox in zip(class_ids, confidences, bboxes)
+    ]
+
+
+def detections_to_array(detections: List[Dict]) -> np.ndarray:
+    """detection dicts back to (x1, y1, x2, y2, conf, cls) rows"""
+    if not detections:
+        return np.empty((0, 6), dtype=np.float32)
+    return np.array([[*d["bbox"], d["confidence"], d["class_id"]] for d in detections], dtype=np.float32)
+
+
+def detections_to_columns(detections: List[Dict]) -> Dict[str, list]:
+    """parallel arrays for the compact response format"""
+    return {
+        "class_id": [d["class_id"] for d in detections],
+        "class_name": [d["class_name"] for d in detections],
+        "confidence": [d["confidence"] for d in detections],
+        "bbox": [d["bbox"] for d in detections],
+    }
 
 
 class ObjectDetector:
     """runs YOLOv8 object detection on images and uploaded files"""
 
-    def __init__(self, model_path: str = "yolov8n.pt"):
-        print(f"loading model: {model_path}")
-        self.model = YOLO(model_path)
+    def __init__(
+        self,
+        model_path: str = "yolov8n.pt",
+        backend: str = MODEL_BACKEND,
+        warmup_runs: int = 0,
+    ):
+        print(f"loading model: {model_path} ({backend})")
+        # seconds spent per loading step, reported in the startup breakdown
+        self.load_timings: Dict[str, float] = {}
+
+        start = time.perf_counter()
+        # the ultralytics/torch stack is only imported once a model is actually needed
+        from ultralytics import YOLO
+
+        configure_threads()
+        self.load_timings["import"] = time.perf_counter() - start
+
+        self.model_path = model_path
+        self.backend = backend
+        self.model_id = model_path if backend == "torch" else f"{model_path}:{backend}"
+
+        start = time.perf_counter()
+        self.model = YOLO(resolve_model(model_path, backend), task="detect")
+        self.load_timings["load"] = time.perf_counter() - start
+        self.renderer = AnnotationRenderer(self.model.names)
+        # models of profiles that need their own weights, keyed by input size and format
+        self._profile_models: Dict[str, object] = {}
+        self._profile_lock = threading.Lock()
+
+        if warmup_runs:
+            start = time.perf_counter()
+            self.warmup(warmup_runs)
+            self.load_timings["warmup"] = time.perf_counter() - start
         print("model ready")
 
+    def warmup(self, runs: int = WARMUP_RUNS, imgsz: int = MODEL_IMGSZ):
+        """runs throwaway inferences so graph setup is not paid by the first request"""
+        blank = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+        for _ in range(runs):
+            self.model(blank, verbose=False)
+
+    def profile_model(self, profile: Optional[InferenceProfile] = None):
+        """the model a profile runs on, prepared once by prepare_profiles or on first use
+
+        FP32 profiles share the loaded weights unless an exported backend
+        needs a separate export for their input size. INT8 profiles run a
+        dynamically quantized ONNX model, exported and quantized once into
+        MODEL_CACHE_DIR.
+        """
+        if profile is None or (not profile.int8 and (self.backend == "torch" or profile.imgsz == MODEL_IMGSZ)):
+            return self.model
+
+        key = f"{profile.imgsz}:{'int8' if profile.int8 else self.backend}"
+        with self._profile_lock:
+            model = self._profile_models.get(key)
+            if model is None:
+                from ultralytics import YOLO
+
+                if profile.int8:
+                    path = resolve_quantized(self.model_path, imgsz=profile.imgsz)
+                else:
+                    path = resolve_model(self.model_path, self.backend, imgsz=profile.imgsz)
+                model = self._profile_models[key] = YOLO(path, task="detect")
+        return model
+
+    def prepare_profiles(self, profiles) -> Dict[str, str]:
+        """exports, quantizes and loads the weights of every profile ahead of traffic
+
+        each prepared model runs once on a blank image at its input size.
+        returns an error message per profile that could not be prepared; those
+        fall back to being prepared on their first request.
+        """
+        errors = {}
+        for profile in profiles:
+            try:
+                model = self.profile_model(profile)
+                if model is not self.model:
+                    model(np.zeros((profile.imgsz, profile.imgsz, 3), dtype=np.uint8), imgsz=profile.imgsz, verbose=False)
+            except Exception as e:
+                errors[profile.name] = str(e)
+        return errors
+
+    def profile_options(self, profile: Optional[InferenceProfile] = None) -> Dict:
+        """predict arguments for a profile, none for the default settings"""
+        if profile is None:
+            return {}
+        options = {"imgsz": profile.imgsz, "max_det": profile.max_det}
+        classes = class_ids(profile, self.model.names)
+        if classes is not None:
+            options["classes"] = classes
+        return options
+
     def detect_objects(self, image_path: str, conf_threshold: float = 0.25) -> Dict:
         results = self.model(image_path, conf=conf_threshold)
         result = results[0]
 
-        detections = []
-        for box in result.boxes:
-            class_id = int(box.cls[0])
-            detections.append(
-                {
-                    "class_id": class_id,
-                    "class_name": result.names[class_id],
-                    "confidence": float(box.conf[0]),
-                    "bbox": box.xyxy[0].tolist(),
-                }
-            )
+        detections = extract_detections(result)
 
         return {
             "image_path": image_path,
@@ -38,110 +183,176 @@ class ObjectDetector:
             "detections": detections,
         }
 
-    def draw_detections(self, image_path: str, output_path: str, conf_threshold: float = 0.25) -> str:
-        results = self.model(image_path, conf=conf_threshold)
-        annotated = results[0].plot()
-        cv2.imwrite(output_path, annotated)
+    def draw_detections(
+        self,
+        image_path: str,
+        output_path: str,
+        conf_threshold: float = 0.25,
+        detections: Optional[List[Dict]] = None,
+    ) -> str:
+        """writes the annotated image, drawing already computed detections when they are given"""
+        import cv2
+
+        image = cv2.imread(image_path)
+        if image is None:
+            raise ValueError(f"could not read image: {image_path}")
+        if detections is None:
+            data = box_array(self.model(image, conf=conf_threshold)[0])
+        else:
+            data = detections_to_array(detections)
+
+        extension = Path(output_path).suffix.lower().lstrip(".")
+        image_format = {"jpg": "jpeg", "webp": "webp", "png": "png"}.get(extension, "jpeg")
+        Path(output_path).write_bytes(self.renderer.render(image, data, OutputEncoding(format=image_format)))
         return output_path
 
     def detect_from_file(self, file_bytes: bytes, filename: str, conf_threshold: float = 0.25) -> Dict:
-        detection_id = f"det_{uuid.uuid4().hex[:8]}"
-
-        temp_dir = Path("temp")
-        temp_dir.mkdir(exist_ok=True)
-        temp_path = temp_dir / f"{detection_id}_{filename}"
-
-        try:
-            with open(temp_path, "wb") as f:
-                f.write(file_bytes)
-
-            start_time = time.time()
-            results = self.model(str(temp_path), conf=conf_threshold)
-            result = results[0]
-            processing_time = time.time() - start_time
-
-            detections = []
-            for box in result.boxes:
-                class_id = int(box.cls[0])
-                detections.append(
-                    {
-                        "class_id": class_id,
-                        "class_name": result.names[class_id],
-                        "confidence": float(box.conf[0]),
-                        "bbox": [float(x) for x in box.xyxy[0].tolist()],
-                    }
-                )
+        detection_data, _ = self.detect_batch(
+            [{"file_bytes": file_bytes, "filename": filename, "conf_threshold": conf_threshold}]
+        )[0]
+        return detection_data
 
-            img_height, img_width = result.orig_shape
+    def detect_and_annotate(
+        self,
+        file_bytes: bytes,
+        filename: str,
+        conf_threshold: float = 0.25,
+        encoding: Optional[OutputEncoding] = None,
+    ) -> tuple:
+        detection_data, annotated_bytes = self.detect_batch(
+            [
+                {
+                    "file_bytes": file_bytes,
+                    "filename": filename,
+                    "conf_threshold": conf_threshold,
+                    "annotate": True,
+                    "encoding": encoding,
+                }
+            ]
+        )[0]
+        return annotated_bytes, detection_data
 
-            return {
-                "detection_id": detection_id,
-                "filename": filename,
-                "total_objects": len(detections),
-                "detections": detections,
-                "image_width": int(img_width),
-                "image_height": int(img_height),
-                "processing_time": round(processing_time, 3),
-                "timestamp": datetime.now(),
-            }
+    def detect_batch(self, requests: List[Dict]) -> List[Tuple[Dict, Optional[bytes]]]:
+        """runs one forward pass over several uploads
+
+        each request is a dict with either a decoded image or raw file_bytes,
+        plus filename, conf_threshold and an optional annotate flag. a request
+        with tile_size (and tile_overlap) is also cut into overlapping tiles that
+        run in the same pass, their boxes merged back in image coordinates. a
+        request may carry an InferenceProfile; requests of different profiles
+        run as separate passes. each pass runs at the lowest threshold among
+        its requests and every request is filtered back to its own. annotated
+        requests are drawn from the same boxes onto their decoded image, which
+        is modified in place, and encoded as their optional encoding asks. returns (detection_data,
+        annotated_bytes or None) per request, in order.
+        """
+        images = [
+            request["image"] if request.get("image") is not None else decode_image(request["file_bytes"])
+            for request in requests
+        ]
 
-        finally:
-            if temp_path.exists():
-                temp_path.unlink()
-
-    def detect_and_annotate(self, file_bytes: bytes, filename: str, conf_threshold: float = 0.25) -> tuple:
-        detection_id = f"det_{uuid.uuid4().hex[:8]}"
-
-        temp_dir = Path("temp")
-        temp_dir.mkdir(exist_ok=True)
-        temp_path = temp_dir / f"{detection_id}_{filename}"
-
-        try:
-            with open(temp_path, "wb") as f:
-                f.write(file_bytes)
-
-            start_time = time.time()
-            results = self.model(str(temp_path), conf=conf_threshold)
-            result = results[0]
-            processing_time = time.time() - start_time
-
-            annotated_img = result.plot()
-            success, buffer = cv2.imencode(".jpg", annotated_img)
-            if not success:
-                raise RuntimeError("failed to encode annotated image")
-
-            annotated_bytes = buffer.tobytes()
-
-            detections = []
-            for box in result.boxes:
-                class_id = int(box.cls[0])
-                detections.append(
-                    {
-                        "class_id": class_id,
-                        "class_name": result.names[class_id],
-                        "confidence": float(box.conf[0]),
-                        "bbox": [float(x) for x in box.xyxy[0].tolist()],
-                    }
+        # tiled requests add their tiles to the same forward pass, after their full-image entry
+        inputs, spans = [], []
+        for request, image in zip(requests, images):
+            offsets = None
+            if request.get("tile_size"):
+                if request.get("annotate"):
+                    raise ValueError("annotated output is not supported for tiled detection")
+                height, width = image.shape[:2]
+                overlap = request.get("tile_overlap", 0.0)
+                tile_size = fit_tile_size(height, width, request["tile_size"], overlap)
+                offsets = tile_offsets(height, width, tile_size, overlap)
+                if len(offsets) == 1:
+                    offsets = None
+            spans.append((len(inputs), offsets))
+            inputs.append(image)
+            if offsets is not None:
+                inputs.extend(tile_views(image, offsets, tile_size))
+
+        # a profile fixes the input size and weights, so each profile gets its own pass
+        groups: Dict[Optional[InferenceProfile], List[int]] = {}
+        for index, request in enumerate(requests):
+            groups.setdefault(request.get("profile"), []).append(index)
+
+        results: List = [None] * len(inputs)
+        processing_times = [0.0] * len(requests)
+        for profile, members in groups.items():
+            positions = []
+            for index in members:
+                first, offsets = spans[index]
+                positions.extend(range(first, first + 1 + (0 if offsets is None else len(offsets))))
+            start_time = time.perf_counter()
+            group_results = self.profile_model(profile)(
+                [inputs[position] for position in positions],
+                conf=min(requests[index]["conf_threshold"] for index in members),
+                **self.profile_options(profile),
+            )
+            elapsed = time.perf_counter() - start_time
+            for position, result in zip(positions, group_results):
+                results[position] = result
+            # the pass is shared, so each request is charged its own inputs' share of it, tiles included
+            for index in members:
+                _, offsets = spans[index]
+                processing_times[index] = elapsed * (1 + (0 if offsets is None else len(offsets))) / len(positions)
+
+        outputs = []
+        for request, image, (first, offsets), processing_time in zip(requests, images, spans, processing_times):
+            result = results[first]
+            # per image milliseconds, ultralytics already splits batch time evenly
+            timings = {name: float(elapsed) for name, elapsed in (getattr(result, "speed", None) or {}).items()}
+
+            stage_start = time.perf_counter()
+            if offsets is None:
+                data = box_array(result)
+                data = data[data[:, 4] >= request["conf_threshold"]]
+                detections = detections_from_array(data, result.names)
+            else:
+                # the full-image pass keeps objects larger than a tile whole
+                tile_results = results[first : first + len(offsets) + 1]
+                merged = merge_tile_detections(
+                    [box_array(r) for r in tile_results],
+                    np.vstack([np.zeros((1, 2), np.float32), offsets]),
+                    TILE_NMS_IOU,
                 )
+                detections = detections_from_array(merged, result.names, request["conf_threshold"])
+            timings["extract"] = (time.perf_counter() - stage_start) * 1000
+
+            annotated_bytes = None
+            if request.get("annotate"):
+                stage_start = time.perf_counter()
+                annotated_bytes = self.renderer.render(image, data, request.get("encoding"))
+                timings["annotate"] = (time.perf_counter() - stage_start) * 1000
 
             img_height, img_width = result.orig_shape
 
             detection_data = {
-                "detection_id": detection_id,
-                "filename": filename,
+                "detection_id": f"det_{uuid.uuid4().hex[:8]}",
+                "filename": request["filename"],
                 "total_objects": len(detections),
                 "detections": detections,
                 "image_width": int(img_width),
                 "image_height": int(img_height),
                 "processing_time": round(processing_time, 3),
                 "timestamp": datetime.now(),
+                "timings": timings,
             }
+            outputs.append((detection_data, annotated_bytes))
+
+        return outputs
 
-            return annotated_bytes, detection_data
+    def parameter_bytes(self) -> Optional[int]:
+        """size of the weights held in memory, None for exported backends"""
+        module = getattr(self.model, "model", None)
+        if not hasattr(module, "parameters"):
+            return None
+        return sum(p.numel() * p.element_size() for p in module.parameters())
 
-        finally:
-            if temp_path.exists():
-                temp_path.unlink()
+    def model_version(self) -> Optional[str]:
+        """ultralytics version recorded in the checkpoint, None when it is not available"""
+        ckpt = getattr(self.model, "ckpt", None)
+        if isinstance(ckpt, dict) and ckpt.get("version"):
+            return str(ckpt["version"])
+        return None
 
     def get_class_names(self) -> List[str]:
         return list(self.model.names.values())
@@ -0,0 +1,261 @@
+"""offline latency and accuracy evaluation of the inference profiles
+
+runs every profile over a local labelled image set and reports latency
+percentiles and mAP per profile, plus how far each profile's mAP drifts
+from a reference profile:
+
+    python -m src.evaluate data/val/images --labels data/val/labels
+    python -m src.evaluate data/val/images --profiles fast,balanced --max-drift 0.05
+
+labels are YOLO-format text files named after the images, one
+"class cx cy w h" line per object in normalized coordinates. without labels
+the reference profile's own detections are the ground truth, which still
+measures how much a faster profile loses against it. the exit code is 1 when
+a profile drifts more than --max-drift below the reference.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.benchmark import summarize
+from src.bulk import list_images
+from src.detector import detections_to_array
+from src.preprocess import load_image
+from src.profiles import PROFILES, InferenceProfile
+
+# COCO-style IoU thresholds, 0.5 to 0.95 in steps of 0.05
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+EVAL_CONFIDENCE = float(os.getenv("EVAL_CONFIDENCE", "0.001"))
+
+
+def load_labels(path: Path, width: int, height: int) -> np.ndarray:
+    """(cls, x1, y1, x2, y2) rows in pixels from a YOLO label file, empty when it does not exist"""
+    if not path.exists():
+        return np.empty((0, 5), dtype=np.float32)
+    rows = [line.split()[:5] for line in path.read_text().splitlines() if line.strip()]
+    if not rows:
+        return np.empty((0, 5), dtype=np.float32)
+    labels = np.array(rows, dtype=np.float32)
+    cx, cy = labels[:, 1] * width, labels[:, 2] * height
+    w, h = labels[:, 3] * width, labels[:, 4] * height
+    return np.stack([labels[:, 0], cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+
+def box_iou(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """pairwise IoU of two (N, 4) and (M, 4) x1, y1, x2, y2 box arrays"""
+    top_left = np.maximum(first[:, None, :2], second[None, :, :2])
+    bottom_right = np.minimum(first[:, None, 2:], second[None, :, 2:])
+    intersection = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+    area_first = (first[:, 2:] - first[:, :2]).prod(axis=1)
+    area_second = (second[:, 2:] - second[:, :2]).prod(axis=1)
+    return intersection / np.maximum(area_first[:, None] + area_second[None, :] - intersection, 1e-9)
+
+
+def match_predictions(predictions: np.ndarray, labels: np.ndarray, iou_thresholds: np.ndarray = IOU_THRESHOLDS) -> np.ndarray:
+    """(M, T) true-positive flags for one image's predictions at each IoU threshold
+
+    highest confidence predictions claim their best unclaimed same-class label first.
+    """
+    correct = np.zeros((len(predictions), len(iou_thresholds)), dtype=bool)
+    if not len(predictions) or not len(labels):
+        return correct
+
+    order = np.argsort(-predictions[:, 4], kind="stable")
+    iou = box_iou(predictions[order, :4], labels[:, 1:])
+    iou[predictions[order, 5][:, None] != labels[None, :, 0]] = 0
+    for t, threshold in enumerate(iou_thresholds):
+        claimed = np.zeros(len(labels), dtype=bool)
+        for row, index in enumerate(order):
+            candidates = np.where((iou[row] >= threshold) & ~claimed, iou[row], 0)
+            best = int(candidates.argmax())
+            if candidates[best] > 0:
+                claimed[best] = True
+                correct[index, t] = True
+    return correct
+
+
+def average_precision(recall: np.ndarray, precision: np.ndarray) -> float:
+    """area under the precision envelope at every recall step (all-point interpolation)"""
+    recall = np.concatenate([[0.0], recall, [1.0]])
+    precision = np.concatenate([[1.0], precision, [0.0]])
+    precision = np.flip(np.maximum.accumulate(np.flip(precision)))
+    steps = np.where(recall[1:] != recall[:-1])[0]
+    return float(np.sum((recall[steps + 1] - recall[steps]) * precision[steps + 1]))
+
+
+def mean_average_precision(predictions: List[np.ndarray], labels: List[np.ndarray]) -> Dict[str, float]:
+    """mAP@0.5 and mAP@0.5:0.95 over images of (x1, y1, x2, y2, conf, cls) predictions and (cls, x1, y1, x2, y2) labels"""
+    correct = [match_predictions(p, l) for p, l in zip(predictions, labels)]
+    correct = np.concatenate(correct) if correct else np.zeros((0, len(IOU_THRESHOLDS)), dtype=bool)
+    stacked = np.concatenate(predictions) if predictions else np.empty((0, 6), dtype=np.float32)
+    label_classes = np.concatenate([l[:, 0] for l in labels]) if labels else np.empty(0)
+
+    classes = np.unique(label_classes)
+    if not len(classes):
+        return {"map50": 0.0, "map50_95": 0.0, "classes": 0}
+
+    ap = np.zeros((len(classes), len(IOU_THRESHOLDS)))
+    for c, class_id in enumerate(classes):
+        mine = stacked[:, 5] == class_id
+        order = np.argsort(-stacked[mine, 4], kind="stable")
+        hits = correct[mine][order]
+        true_positives = hits.cumsum(axis=0)
+        false_positives = (~hits).cumsum(axis=0)
+        total = int((label_classes == class_id).sum())
+        for t in range(len(IOU_THRESHOLDS)):
+            recall = true_positives[:, t] / total
+            precision = true_positives[:, t] / np.maximum(true_positives[:, t] + false_positives[:, t], 1)
+            ap[c, t] = average_precision(recall, precision)
+
+    return {"map50": round(float(ap[:, 0].mean()), 4), "map50_95": round(float(ap.mean()), 4), "classes": len(classes)}
+
+
+def run_profile(detector, profile: InferenceProfile, paths: List[Path], confidence: float = EVAL_CONFIDENCE) -> tuple:
+    """(predictions, latency samples in ms, (width, height) per image) of one profile
+
+    images are decoded one at a time at full resolution, so label coordinates
+    match and only one image is held in memory. each runs in its own pass,
+    like a lone /detect; decoding is not part of the latency.
+    """
+    # the first pass prepares and warms up the profile's model, it is not timed
+    warmup = load_image(paths[0], reduce=False)[0]
+    detector.detect_batch([{"image": warmup, "filename": "warmup", "conf_threshold": confidence, "profile": profile}])
+    del warmup
+
+    predictions, samples, sizes = [], [], []
+    for path in paths:
+        image = load_image(path, reduce=False)[0]
+        sizes.append((image.shape[1], image.shape[0]))
+        request = {"image": image, "filename": path.name, "conf_threshold": confidence, "profile": profile}
+        start = time.perf_counter()
+        (result, _), = detector.detect_batch([request])
+        samples.append((time.perf_counter() - start) * 1000)
+        predictions.append(detections_to_array(result["detections"]))
+    return predictions, samples, sizes
+
+
+def drift(report: Dict[str, Dict], reference: str) -> Dict[str, Dict[str, float]]:
+    """each profile's mAP minus the reference profile's, negative is a loss"""
+    base = report[reference]["accuracy"]
+    return {
+        name: {metric: round(entry["accuracy"][metric] - base[metric], 4) for metric in ("map50", "map50_95")}
+        for name, entry in report.items()
+    }
+
+
+def regressions(drifts: Dict[str, Dict[str, float]], max_drift: float) -> List[str]:
+    return [
+        f"{name}.{metric}: {value:+.4f}"
+        for name, values in drifts.items()
+        for metric, value in values.items()
+        if value < -max_drift
+    ]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="measure latency and mAP drift of the inference profiles")
+    parser.add_argument("images", help="directory of images")
+    parser.add_argument("--labels", help="directory of YOLO label files, defaults to the reference profile's detections")
+    parser.add_argument("--profiles", default=",".join(PROFILES), help="comma-separated profile names")
+    parser.add_argument("--reference", default="accurate", help="profile the drift is measured against")
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--limit", type=int, default=0, help="evaluate at most this many images")
+    parser.add_argument("--confidence", type=float, default=EVAL_CONFIDENCE)
+    parser.add_argument("--output", default="results/evaluation.json")
+    parser.add_argument("--max-drift", type=float, help="fail when a profile's mAP is this much below the reference")
+    args = parser.parse_args(argv)
+
+    names = [name for name in args.profiles.split(",") if name]
+    if args.reference not in names:
+        names.append(args.reference)
+    unknown = [name for name in names if name not in PROFILES]
+    if unknown:
+        parser.error(f"unknown profiles: {', '.join(unknown)}")
+
+    paths = list_images([args.images])
+    if args.limit:
+        paths = paths[: args.limit]
+    if not paths:
+        parser.error(f"no images found in {args.images}")
+
+    from src.detector import ObjectDetector
+
+    detector = ObjectDetector(args.model)
+    results = {}
+    for name in names:
+        print(f"evaluating {name}: {PROFILES[name].summary()}")
+        results[name] = run_profile(detector, PROFILES[name], paths, args.confidence)
+
+    if args.labels:
+        # every profile decodes the same files, so any run's image sizes will do
+        sizes = results[args.reference][2]
+        labels = [
+            load_labels(Path(args.labels) / f"{path.stem}.txt", width, height)
+            for path, (width, height) in zip(paths, sizes)
+        ]
+    else:
+        # reference detections above the serving default stand in for ground truth
+        labels = [p[p[:, 4] >= 0.25][:, [5, 0, 1, 2, 3]] for p in results[args.reference][0]]
+
+    profiles = {
+        name: {
+            "profile": PROFILES[name].summary(),
+            "latency": summarize(samples),
+            "accuracy": mean_average_precision(predictions, labels),
+        }
+        for name, (predictions, samples, _) in results.items()
+    }
+    drifts = drift(profiles, args.reference)
+    for name, values in drifts.items():
+        profiles[name]["drift"] = values
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "model": detector.model_id,
+            "backend": detector.backend,
+            "images": len(paths),
+            "labels": args.labels or f"{args.reference} detections",
+            "reference": args.reference,
+        },
+        "profiles": profiles,
+    }
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    for name, entry in profiles.items():
+        print(
+            f"{name}: p50 {entry['latency']['p50_ms']} ms, p95 {entry['latency']['p95_ms']} ms, "
+            f"mAP50 {entry['accuracy']['map50']}, mAP50-95 {entry['accuracy']['map50_95']}, "
+            f"drift {entry['drift']['map50_95']:+.4f}"
+        )
+    print(f"saved evaluation: {output}")
+
+    if args.max_drift is not None:
+        failed = regressions(drifts, args.max_drift)
+        if failed:
+            drifting = {name for name, values in drifts.items() if min(values.values()) < -args.max_drift}
+            print(f"{len(drifting)} profiles drift more than {args.max_drift} below {args.reference} on {len(failed)} metrics:")
+            for line in failed:
+                print(f"  {line}")
+            return 1
+        print(f"no profile drifts more than {args.max_drift} below {args.reference}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+import base64
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+
+from src.database import DetectionLog, SessionLocal
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+EXPORT_FORMATS = ("ndjson", "csv", "parquet")
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+EXPORT_COLUMNS = (
+    "detection_id",
+    "filename",
+    "total_objects",
+    "image_width",
+    "image_height",
+    "processing_time",
+    "confidence_threshold",
+    "detections",
+    "created_at",
+)
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """raises ValueError for anything encode_cursor did not produce"""
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+
+def keyset_page(query: Query, cursor: Optional[str], limit: int) -> Tuple[List[DetectionLog], Optional[str]]:
+    """newest-first page of detection logs after cursor, plus the cursor of the next page
+
+    seeks on (created_at, id) instead of OFFSET, so every page costs one index
+    range scan however deep into the history it is.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(
+            or_(
+                DetectionLog.created_at < created_at,
+                and_(DetectionLog.created_at == created_at, DetectionLog.id < row_id),
+            )
+        )
+
+    rows = query.order_by(DetectionLog.created_at.desc(), DetectionLog.id.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
+
+
+def export_row(log: DetectionLog) -> Dict:
+    return {
+        "detection_id": log.detection_id,
+        "filename": log.filename,
+        "total_objects": log.total_objects,
+        "image_width": log.image_width,
+        "image_height": log.image_height,
+        "processing_time": log.processing_time,
+        "confidence_threshold": log.confidence_threshold,
+        "detections": log.detections,
+        "created_at": log.created_at.isoformat() if log.created_at else None,
+    }
+
+
+def iter_export_chunks(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+    session_factory=SessionLocal,
+) -> Iterator[List[Dict]]:
+    """detection logs oldest first, chunk_size rows at a time
+
+    yield_per turns on stream_results, so postgres reads through a server-side
+    cursor and only one chunk is ever held in memory.
+    """
+    db = session_factory()
+    try:
+        query = db.query(DetectionLog)
+        if since is not None:
+            query = query.filter(DetectionLog.created_at >= since)
+        if until is not None:
+            query = query.filter(DetectionLog.created_at < until)
+
+        rows = query.order_by(DetectionLog.created_at, DetectionLog.id).yield_per(chunk_size)
+
+        chunk = []
+        for log in rows:
+            chunk.append(export_row(log))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        db.close()
+
+
+def export_ndjson(chunks: Iterator[List[Dict]]) -> Iterator[str]:
+    for chunk in chunks:
+        yield "".join(json.dumps(row) + "\n" for row in chunk)
+
+
+def export_csv(chunks: Iterator[List[Dict]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for chunk in chunks:
+        for row in chunk:
+            writer.writerow([json.dumps(row[c]) if c == "detections" else row[c] for c in EXPORT_COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_parquet(chunks: Iterator[List[Dict]], read_size: int = 1 << 20) -> Iterator[bytes]:
+    """writes each chunk as a parquet part file, then streams the parts merged into one file
+
+    the merge goes through a polars lazy scan so it runs in the streaming
+    engine rather than collecting every row first.
+    """
+    import polars as pl
+
+    schema = {
+        "detection_id": pl.String,
+        "filename": pl.String,
+        "total_objects": pl.Int64,
+        "image_width": pl.Int64,
+        "image_height": pl.Int64,
+        "processing_time": pl.Float64,
+        "confidence_threshold": pl.Float64,
+        "detections": pl.String,
+        "created_at": pl.Datetime("us"),
+    }
+
+    workdir = Path(tempfile.mkdtemp(prefix="export_"))
+    try:
+        parts = []
+        for index, chunk in enumerate(chunks):
+            frame = pl.DataFrame(
+                {
+                    **{c: [row[c] for row in chunk] for c in EXPORT_COLUMNS if c not in ("detections", "created_at")},
+                    "detections": [json.dumps(row["detections"]) for row in chunk],
+                    "created_at": [
+                        datetime.fromisoformat(row["created_at"]) if row["created_at"] else None for row in chunk
+                    ],
+                },
+                schema=schema,
+            )
+            part = workdir / f"part_{index:06d}.parquet"
+            frame.write_parquet(part)
+            parts.append(part)
+
+        output = workdir / "export.parquet"
+        if parts:
+            pl.scan_parquet([str(p) for p in parts]).sink_parquet(output)
+        else:
+            pl.DataFrame(schema=schema).write_parquet(output)
+
+        with open(output, "rb") as handle:
+            while data := handle.read(read_size):
+                yield data
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def export_stream(format: str, since: Optional[datetime] = None, until: Optional[datetime] = None):
+    chunks = iter_export_chunks(since, until)
+    if format == "ndjson":
+        return export_ndjson(chunks)
+    if format == "csv":
+        return export_csv(chunks)
+    if format == "parquet":
+        return export_parquet(chunks)
+    raise ValueError(f"unknown export format {format!r}")
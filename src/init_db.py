@@ -1,32 +1,31 @@
-from src.database import create_tables, SessionLocal, ModelMetrics
-from datetime import datetime
+from src.database import create_tables, SessionLocal, DetectedObject, DetectionLog, DetectionRollup
+from src.partitions import setup_partitions
+from src.rollups import backfill_rollups
+from src.search import backfill_detected_objects
 
 
 def init_database():
-    """Initialize database with tables and default data"""
+    """Initialize database tables and backfill derived data
+
+    model_metrics rows are not seeded here, each model registers its own
+    version and class count when it is loaded.
+    """
 
     print("Creating database tables...")
     create_tables()
+    print(f"Created {setup_partitions()} detection partitions")
 
     db = SessionLocal()
 
-    existing = db.query(ModelMetrics).filter_by(model_name="YOLOv8n").first()
-
-    if not existing:
-        initial_metrics = ModelMetrics(
-            model_name="YOLOv8n",
-            model_version="8.0",
-            total_classes=80,
-            average_inference_time=0.095,
-            total_detections=0,
-            last_updated=datetime.utcnow(),
-            notes="YOLOv8 Nano model for real-time object detection",
-        )
-        db.add(initial_metrics)
-        db.commit()
-        print("Initial model metrics added")
-    else:
-        print("Model metrics already exist")
+    has_rollups = db.query(DetectionRollup).filter_by(granularity="total").first() is not None
+    if not has_rollups and db.query(DetectionLog.id).first() is not None:
+        print("Backfilling detection rollups...")
+        print(f"Rolled up {backfill_rollups(db)} existing detections")
+
+    has_objects = db.query(DetectedObject.id).first() is not None
+    if not has_objects and db.query(DetectionLog.id).first() is not None:
+        print("Backfilling detected objects...")
+        print(f"Stored {backfill_detected_objects(db)} existing detected objects")
 
     db.close()
     print("Database initialization complete")
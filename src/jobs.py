@@ -0,0 +1,436 @@
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+
+from src.database import DetectionJob, DetectionLog, SessionLocal
+from src.writer import persist_detections
+
+logger = logging.getLogger(__name__)
+
+# uploaded images wait here, one directory per job, until the job has run
+JOBS_DIR = Path(os.getenv("JOBS_DIR", "jobs"))
+# runner threads per API process, 0 leaves the queue to other processes
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+# jobs of one client that may run at the same time, across all runners
+JOBS_PER_CLIENT = int(os.getenv("JOBS_PER_CLIENT", "2"))
+JOB_MAX_IMAGES = int(os.getenv("JOB_MAX_IMAGES", "1000"))
+# bytes one job may upload, spooled to disk and unpacked into JOBS_DIR rather than held in memory
+JOB_UPLOAD_MAX_BYTES = int(os.getenv("JOB_UPLOAD_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+# a running job that has not reported progress for this long is handed to another runner
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_POLL_INTERVAL_MS = float(os.getenv("JOB_POLL_INTERVAL_MS", "500"))
+
+FINAL_STATUSES = ("done", "failed", "cancelled")
+
+
+def job_dict(job: DetectionJob) -> Dict:
+    return {
+        "job_id": job.job_id,
+        "client_id": job.client_id,
+        "status": job.status,
+        "priority": job.priority,
+        "model": job.model_name,
+        "confidence_threshold": job.confidence_threshold,
+        "total_images": job.total_images,
+        "processed_images": job.processed_images,
+        "failed_images": job.failed_images,
+        "attempts": job.attempts,
+        "detection_ids": job.detection_ids or [],
+        "errors": job.errors or {},
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+class JobFilesMissing(Exception):
+    """raised when a job's stored images are no longer where it was queued from"""
+
+
+def job_files(job_id: str, jobs_dir: Path = JOBS_DIR, expected: Optional[int] = None) -> List[Path]:
+    """the job's images in upload order
+
+    raises JobFilesMissing when the job directory is gone, or holds fewer than
+    the expected number of images, e.g. after JOBS_DIR changed or on a runner
+    that does not share it.
+    """
+    directory = jobs_dir / job_id
+    files = sorted(directory.iterdir()) if directory.is_dir() else []
+    if not directory.is_dir() or (expected is not None and len(files) < expected):
+        raise JobFilesMissing(f"{len(files)} of {expected if expected is not None else 'its'} images found in {directory}")
+    return files
+
+
+def original_filename(path: Path) -> str:
+    # stored as <index>_<name> so names that repeat in one upload do not collide
+    return path.name.split("_", 1)[1]
+
+
+def submit_job(
+    images: Iterable[Tuple[str, bytes]],
+    client_id: str,
+    model_name: Optional[str],
+    confidence: float,
+    priority: int = 0,
+    jobs_dir: Path = JOBS_DIR,
+    session_factory=SessionLocal,
+) -> Dict:
+    """stores the images on disk as they come and queues a job for them
+
+    images may be a generator that unpacks an archive; if it raises, or yields
+    nothing, the stored images are removed and no job is queued.
+    """
+    job_id = f"job_{uuid.uuid4().hex[:12]}"
+    directory = jobs_dir / job_id
+    directory.mkdir(parents=True)
+    total = 0
+    try:
+        for filename, data in images:
+            safe_name = re.sub(r"[^A-Za-z0-9._-]", "_", Path(filename or "image").name)
+            (directory / f"{total:05d}_{safe_name}").write_bytes(data)
+            total += 1
+        if not total:
+            raise ValueError("no images found in upload")
+    except Exception:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+    db = session_factory()
+    try:
+        job = DetectionJob(
+            job_id=job_id,
+            client_id=client_id,
+            status="queued",
+            priority=priority,
+            model_name=model_name,
+            confidence_threshold=confidence,
+            total_images=total,
+            processed_images=0,
+            failed_images=0,
+            attempts=0,
+            created_at=datetime.utcnow(),
+        )
+        db.add(job)
+        db.commit()
+        return job_dict(job)
+    except Exception:
+        db.rollback()
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    finally:
+        db.close()
+
+
+def get_job(job_id: str, session_factory=SessionLocal) -> Optional[Dict]:
+    db = session_factory()
+    try:
+        job = db.query(DetectionJob).filter_by(job_id=job_id).first()
+        return job_dict(job) if job else None
+    finally:
+        db.close()
+
+
+def job_results(db, job: Dict) -> List[DetectionLog]:
+    """the detection logs a finished job wrote, in upload order"""
+    ids = job["detection_ids"]
+    if not ids:
+        return []
+    rows = {row.detection_id: row for row in db.query(DetectionLog).filter(DetectionLog.detection_id.in_(ids))}
+    return [rows[i] for i in ids if i in rows]
+
+
+def claim_job(
+    per_client: int = JOBS_PER_CLIENT,
+    lease_seconds: float = JOB_LEASE_SECONDS,
+    session_factory=SessionLocal,
+) -> Optional[Dict]:
+    """marks the next runnable job as running and returns it, None when nothing can run
+
+    jobs go by priority, then age, skipping clients that already have
+    per_client jobs running. the claim is a conditional update on the queued
+    status, so when several processes race for a job only one wins it.
+    """
+    db = session_factory()
+    try:
+        busy = (
+            select(DetectionJob.client_id)
+            .where(DetectionJob.status == "running")
+            .group_by(DetectionJob.client_id)
+            .having(func.count(DetectionJob.id) >= max(1, per_client))
+        )
+        candidates = (
+            db.query(DetectionJob.id)
+            .filter(DetectionJob.status == "queued", DetectionJob.client_id.notin_(busy))
+            .order_by(DetectionJob.priority.desc(), DetectionJob.created_at, DetectionJob.id)
+            .limit(8)
+            .all()
+        )
+
+        now = datetime.utcnow()
+        for (row_id,) in candidates:
+            claimed = db.execute(
+                update(DetectionJob)
+                .where(DetectionJob.id == row_id, DetectionJob.status == "queued")
+                .values(
+                    status="running",
+                    started_at=now,
+                    lease_expires_at=now + timedelta(seconds=lease_seconds),
+                    attempts=DetectionJob.attempts + 1,
+                )
+            ).rowcount
+            db.commit()
+            if claimed:
+                return job_dict(db.query(DetectionJob).filter_by(id=row_id).one())
+        return None
+    finally:
+        db.close()
+
+
+def heartbeat(
+    job_id: str,
+    attempt: int,
+    processed: int,
+    failed: int,
+    lease_seconds: float = JOB_LEASE_SECONDS,
+    session_factory=SessionLocal,
+) -> bool:
+    """records progress and extends the lease, False once the job is no longer running here
+
+    attempt is the job's attempt count from its claim, so a runner whose
+    lease ran out cannot keep a job that was handed to another runner.
+    """
+    db = session_factory()
+    try:
+        updated = db.execute(
+            update(DetectionJob)
+            .where(DetectionJob.job_id == job_id, DetectionJob.status == "running", DetectionJob.attempts == attempt)
+            .values(
+                processed_images=processed,
+                failed_images=failed,
+                lease_expires_at=datetime.utcnow() + timedelta(seconds=lease_seconds),
+            )
+        ).rowcount
+        db.commit()
+        return bool(updated)
+    finally:
+        db.close()
+
+
+def complete_job(
+    job_id: str,
+    attempt: int,
+    results: List[Dict],
+    errors: Dict[str, str],
+    confidence: float,
+    session_factory=SessionLocal,
+) -> bool:
+    """writes the results to the detection history and finishes the job in one transaction"""
+    db = session_factory()
+    try:
+        job = db.query(DetectionJob).filter_by(job_id=job_id, status="running", attempts=attempt).first()
+        if job is None:
+            # cancelled, or handed to another runner after its lease ran out
+            return False
+        if results:
+            persist_detections(db, [(result, confidence) for result in results])
+        job.status = "done"
+        job.processed_images = len(results) + len(errors)
+        job.failed_images = len(errors)
+        job.detection_ids = [result["detection_id"] for result in results]
+        job.errors = errors
+        job.finished_at = datetime.utcnow()
+        job.lease_expires_at = None
+        db.commit()
+        return True
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def fail_job(job_id: str, attempt: int, error: str, max_attempts: int = JOB_MAX_ATTEMPTS, session_factory=SessionLocal) -> str:
+    """requeues a job that raised, or fails it for good after max_attempts; returns its new status"""
+    db = session_factory()
+    try:
+        job = db.query(DetectionJob).filter_by(job_id=job_id, status="running", attempts=attempt).first()
+        if job is None:
+            return "gone"
+        job.error = error
+        job.lease_expires_at = None
+        if job.attempts >= max_attempts:
+            job.status = "failed"
+            job.finished_at = datetime.utcnow()
+        else:
+            job.status = "queued"
+        db.commit()
+        return job.status
+    finally:
+        db.close()
+
+
+def requeue_expired(max_attempts: int = JOB_MAX_ATTEMPTS, session_factory=SessionLocal) -> int:
+    """hands running jobs whose runner stopped reporting back to the queue"""
+    db = session_factory()
+    try:
+        now = datetime.utcnow()
+        expired = DetectionJob.status == "running", DetectionJob.lease_expires_at < now
+        failed = db.execute(
+            update(DetectionJob)
+            .where(*expired, DetectionJob.attempts >= max_attempts)
+            .values(status="failed", finished_at=now, lease_expires_at=None, error="job runner stopped responding")
+        ).rowcount
+        requeued = db.execute(update(DetectionJob).where(*expired).values(status="queued", lease_expires_at=None)).rowcount
+        db.commit()
+        return failed + requeued
+    finally:
+        db.close()
+
+
+def cancel_job(job_id: str, jobs_dir: Path = JOBS_DIR, session_factory=SessionLocal) -> Optional[Dict]:
+    """cancels a queued or running job; a running job stops at its next progress report"""
+    db = session_factory()
+    try:
+        job = db.query(DetectionJob).filter_by(job_id=job_id).first()
+        if job is None:
+            return None
+        if job.status not in FINAL_STATUSES:
+            job.status = "cancelled"
+            job.finished_at = datetime.utcnow()
+            job.lease_expires_at = None
+            db.commit()
+            shutil.rmtree(jobs_dir / job_id, ignore_errors=True)
+        return job_dict(job)
+    finally:
+        db.close()
+
+
+def queue_stats(session_factory=SessionLocal) -> Dict:
+    db = session_factory()
+    try:
+        counts = dict(db.query(DetectionJob.status, func.count(DetectionJob.id)).group_by(DetectionJob.status).all())
+        return {status: counts.get(status, 0) for status in ("queued", "running", *FINAL_STATUSES)}
+    finally:
+        db.close()
+
+
+class JobCancelled(Exception):
+    """raised by a job handler's progress callback once the job was cancelled or taken away"""
+
+
+class JobRunner:
+    """background threads that drain the job queue at their own pace
+
+    each thread claims one job at a time and passes it to handler(job,
+    progress), which returns (results, errors). progress(processed, failed)
+    extends the job's lease and raises JobCancelled when the job is no
+    longer this runner's. results are written to the detection history
+    together with the job's completion. a handler that raises gets the job
+    retried, up to JOB_MAX_ATTEMPTS. a job whose images are missing fails
+    straight away rather than completing with no results.
+    """
+
+    def __init__(
+        self,
+        handler: Callable,
+        workers: int = JOB_WORKERS,
+        per_client: int = JOBS_PER_CLIENT,
+        poll_interval_ms: float = JOB_POLL_INTERVAL_MS,
+        lease_seconds: float = JOB_LEASE_SECONDS,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        jobs_dir: Path = JOBS_DIR,
+        session_factory=SessionLocal,
+    ):
+        self.handler = handler
+        self.per_client = per_client
+        self.poll_interval = poll_interval_ms / 1000
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.jobs_dir = jobs_dir
+        self.session_factory = session_factory
+
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self.jobs_done = 0
+        self.jobs_failed = 0
+        self._threads = [
+            threading.Thread(target=self._run, name=f"job-runner-{i}", daemon=True) for i in range(max(0, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """stops claiming jobs; a job still running is requeued once its lease expires"""
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"workers": len(self._threads), "jobs_done": self.jobs_done, "jobs_failed": self.jobs_failed}
+
+    def _run(self):
+        last_sweep = 0.0
+        while not self._stopped.is_set():
+            try:
+                if time.monotonic() - last_sweep >= self.lease_seconds / 4:
+                    last_sweep = time.monotonic()
+                    requeue_expired(self.max_attempts, self.session_factory)
+                job = claim_job(self.per_client, self.lease_seconds, self.session_factory)
+            except Exception as e:
+                logger.error(f"claiming a job failed: {str(e)}")
+                job = None
+
+            if job is None:
+                self._stopped.wait(self.poll_interval)
+                continue
+            self.run_job(job)
+
+    def run_job(self, job: Dict):
+        job_id, attempt = job["job_id"], job["attempts"]
+
+        def progress(processed: int, failed: int):
+            if not heartbeat(job_id, attempt, processed, failed, self.lease_seconds, self.session_factory):
+                raise JobCancelled(job_id)
+
+        start = time.perf_counter()
+        try:
+            job_files(job_id, self.jobs_dir, expected=job["total_images"])
+        except JobFilesMissing as e:
+            logger.error(f"job {job_id} failed, its images are missing: {e}")
+            fail_job(job_id, attempt, f"job images are missing: {e}", max_attempts=0, session_factory=self.session_factory)
+            with self._lock:
+                self.jobs_failed += 1
+            return
+
+        try:
+            results, errors = self.handler(job, progress)
+            finished = complete_job(job_id, attempt, results, errors, job["confidence_threshold"], self.session_factory)
+        except JobCancelled:
+            logger.info(f"job {job_id} was cancelled or reassigned while running")
+            return
+        except Exception as e:
+            logger.exception(f"job {job_id} failed: {e}")
+            status = fail_job(job_id, attempt, str(e), self.max_attempts, self.session_factory)
+            if status == "failed":
+                with self._lock:
+                    self.jobs_failed += 1
+                shutil.rmtree(self.jobs_dir / job_id, ignore_errors=True)
+            return
+
+        if finished:
+            with self._lock:
+                self.jobs_done += 1
+            shutil.rmtree(self.jobs_dir / job_id, ignore_errors=True)
+            logger.info(f"job {job_id} done: {len(results)} images in {time.perf_counter() - start:.1f}s")
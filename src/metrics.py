@@ -0,0 +1,239 @@
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SLOW_REQUEST_THRESHOLD_MS = float(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "2000"))
+PROFILE_SLOW_REQUESTS = os.getenv("PROFILE_SLOW_REQUESTS", "0") == "1"
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# stage name -> milliseconds, one dict per in-flight HTTP request
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    """labelled histogram rendered in the Prometheus text format"""
+
+    def __init__(self, name: str, help_text: str, label: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series: Dict[str, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+
+        for label_value, (counts, total, count) in sorted(snapshot.items()):
+            labels = f'{self.label}="{label_value}"'
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total:.6f}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.stage_duration = Histogram(
+            "detection_stage_duration_seconds", "time spent per detection pipeline stage", "stage"
+        )
+        self.request_duration = Histogram(
+            "http_request_duration_seconds", "end to end HTTP request latency", "route"
+        )
+        self.model_inference = Histogram(
+            "model_inference_duration_seconds", "model forward pass time per image", "model"
+        )
+        self.in_flight = 0
+        self._gauges: Dict[str, tuple] = {}
+
+    def register_value(self, name: str, help_text: str, read: Callable[[], Optional[float]], kind: str = "gauge"):
+        """values owned elsewhere are read lazily on every scrape, read may return None to skip"""
+        self._gauges[name] = (help_text, read, kind)
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_requests_in_flight HTTP requests currently being handled",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+        ]
+        for name, (help_text, read, kind) in sorted(self._gauges.items()):
+            try:
+                value = read()
+            except Exception as e:
+                logger.warning(f"metric {name} failed: {e}")
+                continue
+            if value is None:
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+
+        lines += self.stage_duration.render()
+        lines += self.request_duration.render()
+        lines += self.model_inference.render()
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+def record_stage(stage_name: str, elapsed_ms: float):
+    """adds a stage to the histograms and to the current request's Server-Timing"""
+    metrics.stage_duration.observe(stage_name, elapsed_ms / 1000)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage_name] = timings.get(stage_name, 0.0) + elapsed_ms
+
+
+def record_stages(stage_timings: Dict[str, float]):
+    for stage_name, elapsed_ms in stage_timings.items():
+        record_stage(stage_name, elapsed_ms)
+
+
+@contextmanager
+def stage(stage_name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage_name, (time.perf_counter() - start) * 1000)
+
+
+def server_timing_header(timings: Dict[str, float], total_ms: float) -> str:
+    entries = [f"{name};dur={elapsed:.2f}" for name, elapsed in timings.items()]
+    entries.append(f"total;dur={total_ms:.2f}")
+    return ", ".join(entries)
+
+
+class StackSampler:
+    """low overhead sampling profiler for slow requests
+
+    a background thread snapshots every thread's stack at a fixed interval
+    into a short ring buffer. when a request turns out to be slow, the samples
+    taken during it are folded into the most frequent frames.
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS, window_seconds: float = 60.0):
+        self.interval = interval_ms / 1000
+        self._samples: deque = deque(maxlen=max(1, int(window_seconds / self.interval)))
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            now = time.monotonic()
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                summary = traceback.extract_stack(frame, limit=8)
+                if summary:
+                    top = summary[-1]
+                    self._samples.append((now, f"{top.filename}:{top.lineno} {top.name}"))
+
+    def hot_frames(self, since: float, until: float, limit: int = 10) -> List[tuple]:
+        counts = Counter(frame for at, frame in list(self._samples) if since <= at <= until)
+        return counts.most_common(limit)
+
+    def stop(self):
+        self._stopped.set()
+
+
+_slow_request_hooks: List[Callable] = []
+sampler: Optional[StackSampler] = None
+
+
+def register_slow_request_hook(hook: Callable[[str, float, Dict[str, float], float], None]):
+    """hook(route, total_ms, stage_timings, started_monotonic) runs for requests above the threshold"""
+    _slow_request_hooks.append(hook)
+
+
+def log_slow_request(route: str, total_ms: float, timings: Dict[str, float], started: float):
+    breakdown = ", ".join(f"{name}={elapsed:.1f}ms" for name, elapsed in timings.items())
+    logger.warning(f"slow request {route} took {total_ms:.1f}ms ({breakdown or 'no stages recorded'})")
+    if sampler is not None:
+        for frame, hits in sampler.hot_frames(started, time.monotonic()):
+            logger.warning(f"  {hits:4d} samples  {frame}")
+
+
+register_slow_request_hook(log_slow_request)
+
+if PROFILE_SLOW_REQUESTS:
+    sampler = StackSampler()
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request
+
+    sets up the per-request stage timings, exposes them as a Server-Timing
+    header and hands requests above SLOW_REQUEST_THRESHOLD_MS to the slow
+    request hooks.
+    """
+
+    def __init__(self, app, slow_threshold_ms: float = SLOW_REQUEST_THRESHOLD_MS):
+        self.app = app
+        self.slow_threshold_ms = slow_threshold_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+        started = time.monotonic()
+        start = time.perf_counter()
+        metrics.in_flight += 1
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and timings:
+                total_ms = (time.perf_counter() - start) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing_header(timings, total_ms).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            metrics.in_flight -= 1
+            _request_timings.reset(token)
+
+            total_ms = (time.perf_counter() - start) * 1000
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            metrics.request_duration.observe(route_path, total_ms / 1000)
+
+            if total_ms > self.slow_threshold_ms:
+                for hook in _slow_request_hooks:
+                    try:
+                        hook(route_path, total_ms, dict(timings), started)
+                    except Exception as e:
+                        logger.warning(f"slow request hook failed: {e}")
@@ -0,0 +1,446 @@
+"""time partitioning, retention and archival of the detection tables
+
+on postgres, detection_logs and detected_objects are range partitioned by
+created_at, one partition per PARTITION_INTERVAL (day or month), created a
+few periods ahead with a default partition catching anything outside them.
+expired partitions are archived to Parquet and dropped whole. other
+databases keep plain tables, and an expired period is removed with one
+range DELETE on the created_at index instead.
+
+    python -m src.partitions            # create upcoming partitions, apply retention
+    python -m src.partitions --dry-run  # list the periods retention would archive
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, insert, literal, select, text
+from sqlalchemy.orm import sessionmaker
+
+from src.database import ArchivedDetection, Base, DetectedObject, DetectionArchive, DetectionLog, engine
+
+logger = logging.getLogger(__name__)
+
+DETECTION_PARTITIONING = os.getenv("DETECTION_PARTITIONING", "1") == "1"
+PARTITION_INTERVAL = os.getenv("PARTITION_INTERVAL", "month")
+# partitions created ahead of the current one
+PARTITION_PREMAKE = int(os.getenv("PARTITION_PREMAKE", "2"))
+# detections older than this many days are archived and dropped, 0 keeps everything
+DETECTION_RETENTION_DAYS = int(os.getenv("DETECTION_RETENTION_DAYS", "0"))
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR", "archive"))
+PARTITION_MAINTENANCE_INTERVAL_S = float(os.getenv("PARTITION_MAINTENANCE_INTERVAL_S", "3600"))
+
+PARTITIONED_TABLES = (DetectionLog.__tablename__, DetectedObject.__tablename__)
+INTERVALS = {"day": "%Y%m%d", "month": "%Y%m"}
+
+
+def period_start(moment: datetime, interval: str = PARTITION_INTERVAL) -> datetime:
+    if interval == "day":
+        return datetime(moment.year, moment.month, moment.day)
+    return datetime(moment.year, moment.month, 1)
+
+
+def next_period(start: datetime, interval: str = PARTITION_INTERVAL) -> datetime:
+    if interval == "day":
+        return start + timedelta(days=1)
+    return datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+def partition_name(table: str, start: datetime, interval: str = PARTITION_INTERVAL) -> str:
+    return f"{table}_p{start.strftime(INTERVALS[interval])}"
+
+
+def parse_partition_name(table: str, name: str) -> Optional[Tuple[datetime, datetime]]:
+    """(start, end) of a partition from its name, None for the default partition or foreign tables"""
+    match = re.fullmatch(re.escape(table) + r"_p(\d{8}|\d{6})", name)
+    if match is None:
+        return None
+    interval = "day" if len(match.group(1)) == 8 else "month"
+    start = datetime.strptime(match.group(1), INTERVALS[interval])
+    return start, next_period(start, interval)
+
+
+def is_postgres(bind) -> bool:
+    return bind.dialect.name == "postgresql"
+
+
+def is_partitioned(connection, table: str) -> bool:
+    return (
+        connection.execute(
+            text(
+                "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+                "WHERE c.relname = :table"
+            ),
+            {"table": table},
+        ).first()
+        is not None
+    )
+
+
+def list_partitions(connection, table: str) -> List[Tuple[str, datetime, datetime]]:
+    """(name, start, end) of the range partitions of a table, oldest first"""
+    names = connection.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :table"
+        ),
+        {"table": table},
+    ).scalars()
+    partitions = []
+    for name in names:
+        bounds = parse_partition_name(table, name)
+        if bounds is not None:
+            partitions.append((name, *bounds))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_partition(connection, table: str, start: datetime, interval: str = PARTITION_INTERVAL) -> bool:
+    """creates the partition for the period starting at start, False when it could not be made
+
+    creation fails when the default partition already holds rows of that
+    period; they stay there and are served as before.
+    """
+    name = partition_name(table, start, interval)
+    try:
+        with connection.begin_nested():
+            connection.execute(
+                text(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+                    f"FOR VALUES FROM ('{start.isoformat()}') TO ('{next_period(start, interval).isoformat()}')"
+                )
+            )
+        return True
+    except Exception as e:
+        logger.warning(f"could not create partition {name}: {str(e)}")
+        return False
+
+
+def convert_to_partitioned(connection, table: str, interval: str = PARTITION_INTERVAL, premake: int = PARTITION_PREMAKE):
+    """rebuilds a plain table as a range-partitioned one and moves its rows over
+
+    runs once per table, inside the caller's transaction. the primary key
+    becomes (id, created_at), since postgres requires the partition key in
+    every unique index, and the id sequence is kept.
+    """
+    staging = f"{table}_partitioned"
+    columns = [c.name for c in Base.metadata.tables[table].columns]
+    first, last = connection.execute(text(f"SELECT MIN(created_at), MAX(created_at) FROM {table}")).one()
+
+    connection.execute(
+        text(f"CREATE TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)")
+    )
+    connection.execute(text(f"ALTER TABLE {staging} ADD PRIMARY KEY (id, created_at)"))
+    connection.execute(text(f"CREATE TABLE {table}_default PARTITION OF {staging} DEFAULT"))
+
+    now = datetime.now()
+    start = period_start(min(first or now, now), interval)
+    end = next_period(period_start(max(last or now, now), interval), interval)
+    for _ in range(premake):
+        end = next_period(end, interval)
+    while start < end:
+        connection.execute(
+            text(
+                f"CREATE TABLE {partition_name(table, start, interval)} PARTITION OF {staging} "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{next_period(start, interval).isoformat()}')"
+            )
+        )
+        start = next_period(start, interval)
+
+    # rows logged without a timestamp get the migration time, the key cannot be null
+    selected = ", ".join("COALESCE(created_at, now()::timestamp)" if c == "created_at" else c for c in columns)
+    connection.execute(text(f"INSERT INTO {staging} ({', '.join(columns)}) SELECT {selected} FROM {table}"))
+
+    sequence = connection.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": table}).scalar()
+    if sequence:
+        connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {staging}.id"))
+    connection.execute(text(f"DROP TABLE {table}"))
+    connection.execute(text(f"ALTER TABLE {staging} RENAME TO {table}"))
+
+    # indexes on the parent are created on every partition, current and future
+    for index in Base.metadata.tables[table].indexes:
+        index.create(bind=connection, checkfirst=True)
+    logger.info(f"converted {table} to partitions by {interval}")
+
+
+def setup_partitions(bind=engine, interval: str = PARTITION_INTERVAL, premake: int = PARTITION_PREMAKE) -> int:
+    """partitions the detection tables on postgres and creates the upcoming partitions
+
+    returns how many partitions were created; other databases are left alone.
+    """
+    if not (DETECTION_PARTITIONING and is_postgres(bind)):
+        return 0
+
+    created = 0
+    with bind.begin() as connection:
+        for table in PARTITIONED_TABLES:
+            if not is_partitioned(connection, table):
+                convert_to_partitioned(connection, table, interval, premake)
+                continue
+
+            existing = {name for name, _, _ in list_partitions(connection, table)}
+            start = period_start(datetime.now(), interval)
+            for _ in range(premake + 1):
+                if partition_name(table, start, interval) not in existing:
+                    created += create_partition(connection, table, start, interval)
+                start = next_period(start, interval)
+    return created
+
+
+def default_partition_periods(connection, cutoff: datetime, interval: str = PARTITION_INTERVAL) -> List[Tuple[datetime, datetime]]:
+    """(start, end) of the periods ended by cutoff that have rows in the default partition of detection_logs
+
+    rows land there when their partition did not exist yet, or could not be created.
+    """
+    starts = connection.execute(
+        text(
+            f"SELECT DISTINCT date_trunc(:interval, created_at) AS start FROM {DetectionLog.__tablename__}_default "
+            "WHERE created_at < :cutoff ORDER BY start"
+        ),
+        {"interval": interval, "cutoff": cutoff},
+    ).scalars()
+    periods = [(start, next_period(start, interval)) for start in starts]
+    return [(start, end) for start, end in periods if end <= cutoff]
+
+
+def expired_periods(connection, cutoff: datetime, interval: str = PARTITION_INTERVAL) -> List[Tuple[datetime, datetime]]:
+    """(start, end) of every period of detection_logs that ended at or before cutoff
+
+    on a partitioned table these are the expired range partitions plus the
+    expired periods that have rows in the default partition.
+    """
+    table = DetectionLog.__tablename__
+    if is_postgres(connection) and is_partitioned(connection, table):
+        periods = [(start, end) for _, start, end in list_partitions(connection, table) if end <= cutoff]
+        # a period with rows in the default partition has no range partition of its own
+        periods.extend(default_partition_periods(connection, cutoff, interval))
+        return sorted(periods)
+
+    first = connection.execute(select(func.min(DetectionLog.created_at))).scalar()
+    periods = []
+    start = period_start(first, interval) if first else cutoff
+    while next_period(start, interval) <= cutoff:
+        periods.append((start, next_period(start, interval)))
+        start = next_period(start, interval)
+    return periods
+
+
+def write_archive(session_factory, start: datetime, end: datetime, archive_dir: Path) -> Tuple[Path, int]:
+    """streams the detection logs of one period into a Parquet file, returns (path, rows)"""
+    from src.export import export_parquet, iter_export_chunks
+
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    label = start.strftime("%Y%m%d") + "_" + end.strftime("%Y%m%d")
+    path = archive_dir / f"detection_logs_{label}.parquet"
+    partial = path.with_name(path.name + ".tmp")
+
+    rows = 0
+
+    def counted(chunks):
+        nonlocal rows
+        for chunk in chunks:
+            rows += len(chunk)
+            yield chunk
+
+    with open(partial, "wb") as handle:
+        for data in export_parquet(counted(iter_export_chunks(start, end, session_factory=session_factory))):
+            handle.write(data)
+    os.replace(partial, path)
+    return path, rows
+
+
+def drop_period(connection, start: datetime, end: datetime):
+    """removes one period from both detection tables, as whole partitions where there are any
+
+    rows of the period that sit in the default partition are deleted by range.
+    """
+    for table in PARTITIONED_TABLES:
+        if is_postgres(connection) and is_partitioned(connection, table):
+            for name, partition_start, partition_end in list_partitions(connection, table):
+                if partition_start >= start and partition_end <= end:
+                    connection.execute(text(f"DROP TABLE {name}"))
+            connection.execute(
+                text(f"DELETE FROM {table}_default WHERE created_at >= :start AND created_at < :end"),
+                {"start": start, "end": end},
+            )
+        else:
+            model = DetectionLog if table == DetectionLog.__tablename__ else DetectedObject
+            connection.execute(
+                model.__table__.delete().where(model.created_at >= start, model.created_at < end)
+            )
+
+
+def apply_retention(
+    bind=engine,
+    retention_days: int = DETECTION_RETENTION_DAYS,
+    archive_dir: Path = ARCHIVE_DIR,
+    interval: str = PARTITION_INTERVAL,
+    now: Optional[datetime] = None,
+    dry_run: bool = False,
+) -> List[Dict]:
+    """archives and drops every period that is entirely older than retention_days
+
+    each period is written to Parquet first, then its detection ids are
+    added to the archive index and the period is dropped in one transaction,
+    so an interruption at worst leaves an archive file that the next run
+    writes again. boxes in detected_objects are not archived separately,
+    they are part of the archived detections column.
+    """
+    if retention_days <= 0:
+        return []
+
+    cutoff = (now or datetime.now()) - timedelta(days=retention_days)
+    session_factory = sessionmaker(bind=bind)
+    with bind.connect() as connection:
+        periods = expired_periods(connection, cutoff, interval)
+
+    archived = []
+    for start, end in periods:
+        if dry_run:
+            archived.append({"period_start": start.isoformat(), "period_end": end.isoformat()})
+            continue
+
+        with bind.connect() as connection:
+            count = connection.execute(
+                select(func.count(DetectionLog.id)).where(DetectionLog.created_at >= start, DetectionLog.created_at < end)
+            ).scalar()
+        if not count:
+            # nothing to keep, an empty partition is simply dropped
+            with bind.begin() as connection:
+                drop_period(connection, start, end)
+            continue
+
+        path, rows = write_archive(session_factory, start, end, archive_dir)
+        with bind.begin() as connection:
+            archive_id = connection.execute(
+                insert(DetectionArchive)
+                .values(period_start=start, period_end=end, path=str(path), row_count=rows, created_at=datetime.utcnow())
+                .returning(DetectionArchive.id)
+            ).scalar()
+            connection.execute(
+                insert(ArchivedDetection).from_select(
+                    ["detection_id", "archive_id"],
+                    select(DetectionLog.detection_id, literal(archive_id)).where(
+                        DetectionLog.created_at >= start, DetectionLog.created_at < end
+                    ),
+                )
+            )
+            drop_period(connection, start, end)
+        logger.info(f"archived {rows} detections from {start:%Y-%m-%d} to {end:%Y-%m-%d} into {path}")
+        archived.append({"period_start": start.isoformat(), "period_end": end.isoformat(), "path": str(path), "rows": rows})
+    return archived
+
+
+def find_archived_detection(db, detection_id: str) -> Optional[Dict]:
+    """an archived detection log as an export row, found through the archive index"""
+    import polars as pl
+
+    archive = (
+        db.query(DetectionArchive)
+        .join(ArchivedDetection, ArchivedDetection.archive_id == DetectionArchive.id)
+        .filter(ArchivedDetection.detection_id == detection_id)
+        .first()
+    )
+    if archive is None or not Path(archive.path).is_file():
+        return None
+
+    rows = pl.scan_parquet(archive.path).filter(pl.col("detection_id") == detection_id).head(1).collect().to_dicts()
+    if not rows:
+        return None
+    row = rows[0]
+    return {
+        **row,
+        "detections": json.loads(row["detections"]) if row["detections"] else [],
+        "created_at": row["created_at"].isoformat() if row["created_at"] else None,
+        "archived": True,
+    }
+
+
+def prune_files(directory: Path, retention_days: int = DETECTION_RETENTION_DAYS, now: Optional[datetime] = None) -> int:
+    """deletes files in directory last modified more than retention_days ago, returns how many"""
+    if retention_days <= 0 or not directory.is_dir():
+        return 0
+
+    cutoff = ((now or datetime.now()) - timedelta(days=retention_days)).timestamp()
+    removed = 0
+    for path in directory.iterdir():
+        try:
+            if path.is_file() and path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            # removed by someone else in the meantime
+            continue
+    return removed
+
+
+class PartitionMaintainer:
+    """background thread that keeps partitions ahead of time and applies retention
+
+    file_dirs hold files that belong to detections, like stored annotated
+    images; they are pruned with the same retention.
+    """
+
+    def __init__(self, bind=engine, interval_s: float = PARTITION_MAINTENANCE_INTERVAL_S, file_dirs: Sequence[Path] = ()):
+        self.bind = bind
+        self.interval_s = interval_s
+        self.file_dirs = list(file_dirs)
+        self.last_run: Optional[datetime] = None
+        self.last_archived: List[Dict] = []
+        self.last_pruned_files = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="partition-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        self._stopped.set()
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict:
+        return {
+            "partitioning": DETECTION_PARTITIONING and is_postgres(self.bind),
+            "interval": PARTITION_INTERVAL,
+            "retention_days": DETECTION_RETENTION_DAYS,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_archived": self.last_archived,
+            "last_pruned_files": self.last_pruned_files,
+        }
+
+    def _run(self):
+        while not self._stopped.wait(self.interval_s):
+            self.run_once()
+
+    def run_once(self):
+        try:
+            setup_partitions(self.bind)
+            self.last_archived = apply_retention(self.bind)
+            self.last_pruned_files = sum(prune_files(directory) for directory in self.file_dirs)
+        except Exception as e:
+            logger.exception(f"partition maintenance failed: {e}")
+        self.last_run = datetime.now()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="create upcoming detection partitions and apply retention")
+    parser.add_argument("--retention-days", type=int, default=DETECTION_RETENTION_DAYS)
+    parser.add_argument("--archive-dir", default=str(ARCHIVE_DIR))
+    parser.add_argument("--dry-run", action="store_true", help="only list the periods that would be archived")
+    args = parser.parse_args(argv)
+
+    if not args.dry_run:
+        print(f"created {setup_partitions()} partitions")
+    for entry in apply_retention(retention_days=args.retention_days, archive_dir=Path(args.archive_dir), dry_run=args.dry_run):
+        print(json.dumps(entry))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
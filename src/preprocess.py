@@ -0,0 +1,138 @@
+import os
+import struct
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+from src.backends import MODEL_IMGSZ
+
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(20 * 1024 * 1024)))
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(50_000_000)))
+# decode large JPEGs at 1/2, 1/4 or 1/8 scale when the model would downscale them anyway
+REDUCED_DECODE = os.getenv("REDUCED_DECODE", "1") == "1"
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+JPEG_SIGNATURE = b"\xff\xd8\xff"
+# start-of-frame markers carry the dimensions, C4, C8 and CC are other segments
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# markers without a length field
+JPEG_STANDALONE_MARKERS = {0x01, *range(0xD0, 0xD9)}
+
+
+class ImageTooLarge(ValueError):
+    """raised for uploads whose byte size or pixel count is over the limit"""
+
+
+def sniff_format(data: bytes) -> Optional[str]:
+    """the real image format from its magic bytes, whatever the client claimed"""
+    if data.startswith(JPEG_SIGNATURE):
+        return "jpeg"
+    if data.startswith(PNG_SIGNATURE):
+        return "png"
+    return None
+
+
+def png_size(data: bytes) -> Optional[Tuple[int, int]]:
+    # the IHDR chunk always comes first: length, type, width, height
+    if len(data) < 24 or data[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", data[16:24])
+
+
+def jpeg_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """walks the marker segments up to the first start-of-frame, without decoding anything"""
+    view = memoryview(data)
+    position = 2
+    while position + 4 <= len(view):
+        if view[position] != 0xFF:
+            return None
+        marker = view[position + 1]
+        if marker == 0xFF:
+            # fill byte before a marker
+            position += 1
+            continue
+        if marker in JPEG_STANDALONE_MARKERS:
+            position += 2
+            continue
+        if marker == 0xD9:
+            return None
+
+        (length,) = struct.unpack(">H", view[position + 2 : position + 4])
+        if marker in JPEG_SOF_MARKERS:
+            if position + 9 > len(view):
+                return None
+            height, width = struct.unpack(">HH", view[position + 5 : position + 9])
+            return width, height
+        position += 2 + length
+    return None
+
+
+def image_size(data: bytes, image_format: str) -> Optional[Tuple[int, int]]:
+    """(width, height) read from the file header, None when the header is not readable"""
+    return png_size(data) if image_format == "png" else jpeg_size(data)
+
+
+def check_image(data: bytes, max_pixels: int = IMAGE_MAX_PIXELS) -> Tuple[str, Tuple[int, int]]:
+    """validates an upload from its first bytes and returns (format, (width, height))
+
+    rejects anything that is not a JPEG or PNG, and images whose header
+    declares more than max_pixels, before any pixel data is decoded.
+    """
+    image_format = sniff_format(data)
+    if image_format is None:
+        raise ValueError("only JPEG and PNG supported")
+
+    size = image_size(data, image_format)
+    if size is None or not all(size):
+        raise ValueError("could not read image dimensions")
+    if size[0] * size[1] > max_pixels:
+        raise ImageTooLarge(f"image is {size[0]}x{size[1]}, more than {max_pixels} pixels")
+    return image_format, size
+
+
+def reduction_factor(size: Tuple[int, int], target_size: int = MODEL_IMGSZ) -> int:
+    """largest of 8, 4, 2 that keeps the long side at or above the model input size, else 1"""
+    for factor in (8, 4, 2):
+        if max(size) // factor >= target_size:
+            return factor
+    return 1
+
+
+def decode_reduced(data: bytes, factor: int) -> np.ndarray:
+    """decodes a JPEG at 1/factor scale, libjpeg skips the discarded detail instead of resizing afterwards"""
+    import cv2
+
+    flags = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+    image = cv2.imdecode(np.frombuffer(memoryview(data), dtype=np.uint8), flags[factor])
+    if image is None:
+        raise ValueError("could not decode image")
+    return image
+
+
+def load_image(path: Path, reduce: bool = REDUCED_DECODE) -> Tuple[np.ndarray, Tuple[int, int], int]:
+    """(decoded image, original (width, height), reduction factor) for an image file on disk
+
+    validated from its header first, like an upload.
+    """
+    data = Path(path).read_bytes()
+    image_format, size = check_image(data)
+    factor = reduction_factor(size) if reduce and image_format == "jpeg" else 1
+    return decode_reduced(data, factor), size, factor
+
+
+def rescale_result(result: dict, size: Tuple[int, int], decoded_shape: Tuple[int, ...]) -> dict:
+    """maps boxes found on a reduced decode back to the original image coordinates"""
+    width, height = size
+    decoded_height, decoded_width = decoded_shape[:2]
+    # the decoder applies EXIF rotation, the header size is from before it
+    if (width >= height) != (decoded_width >= decoded_height):
+        width, height = height, width
+
+    scale_x, scale_y = width / decoded_width, height / decoded_height
+    detections = [
+        {**d, "bbox": [d["bbox"][0] * scale_x, d["bbox"][1] * scale_y, d["bbox"][2] * scale_x, d["bbox"][3] * scale_y]}
+        for d in result["detections"]
+    ]
+    return {**result, "detections": detections, "image_width": width, "image_height": height}
@@ -0,0 +1,75 @@
+import json
+import os
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from src.backends import MODEL_IMGSZ
+
+
+class InferenceProfile(NamedTuple):
+    """a speed/accuracy trade-off a request can pick, small enough to pickle to a worker"""
+
+    name: str
+    imgsz: int = MODEL_IMGSZ
+    max_det: int = 300
+    # class names to keep, empty keeps every class
+    classes: Tuple[str, ...] = ()
+    # run a dynamically quantized INT8 ONNX Runtime model instead of the FP32 weights
+    int8: bool = False
+
+    def summary(self) -> Dict:
+        return {**self._asdict(), "classes": list(self.classes)}
+
+
+DEFAULT_PROFILES = {
+    "fast": {"imgsz": 320, "max_det": 100, "int8": True},
+    "balanced": {"imgsz": MODEL_IMGSZ, "max_det": 300},
+    "accurate": {"imgsz": 960, "max_det": 300},
+}
+
+
+class UnknownProfile(ValueError):
+    """raised for a profile name that is not configured"""
+
+
+def parse_profiles(spec: str) -> Dict[str, InferenceProfile]:
+    """profiles from a JSON object of name -> settings, layered over DEFAULT_PROFILES
+
+    e.g. {"fast": {"imgsz": 256}, "people": {"imgsz": 640, "classes": ["person"]}}
+    """
+    settings = {name: dict(values) for name, values in DEFAULT_PROFILES.items()}
+    for name, values in (json.loads(spec) if spec.strip() else {}).items():
+        settings.setdefault(name, {}).update(values)
+
+    return {
+        name: InferenceProfile(
+            name=name,
+            imgsz=int(values.get("imgsz", MODEL_IMGSZ)),
+            max_det=int(values.get("max_det", 300)),
+            classes=tuple(values.get("classes") or ()),
+            int8=bool(values.get("int8", False)),
+        )
+        for name, values in settings.items()
+    }
+
+
+PROFILES = parse_profiles(os.getenv("INFERENCE_PROFILES", ""))
+
+
+def get_profile(name: Optional[str], profiles: Dict[str, InferenceProfile] = PROFILES) -> Optional[InferenceProfile]:
+    """the named profile, None when no profile was asked for"""
+    if not name:
+        return None
+    if name not in profiles:
+        raise UnknownProfile(f"unknown profile {name!r}, available: {', '.join(profiles)}")
+    return profiles[name]
+
+
+def class_ids(profile: InferenceProfile, names: Dict[int, str]) -> Optional[list]:
+    """ids of the profile's class subset for a model, None when it keeps every class"""
+    if not profile.classes:
+        return None
+    by_name = {name: class_id for class_id, name in names.items()}
+    missing = [name for name in profile.classes if name not in by_name]
+    if missing:
+        raise ValueError(f"profile {profile.name!r} names classes the model does not have: {', '.join(missing)}")
+    return sorted(by_name[name] for name in profile.classes)
@@ -0,0 +1,227 @@
+import gc
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# name=weights pairs; a bare path is named after its file stem
+MODELS = os.getenv("MODELS", "YOLOv8n=yolov8n.pt,YOLOv8s=yolov8s.pt,YOLOv8m=yolov8m.pt")
+DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "YOLOv8n")
+MODEL_MEMORY_BUDGET_MB = float(os.getenv("MODEL_MEMORY_BUDGET_MB", "2048"))
+
+
+class UnknownModel(Exception):
+    """raised for a model name that is not configured in MODELS"""
+
+
+def parse_model_specs(spec: str) -> Dict[str, str]:
+    models = {}
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, path = entry.partition("=")
+        if not path:
+            name, path = Path(entry).stem, entry
+        models[name.strip()] = path.strip()
+    return models
+
+
+class LoadedModel:
+    def __init__(self, name: str, path: str, detector, scheduler, memory_bytes: int):
+        self.name = name
+        self.path = path
+        self.detector = detector
+        self.scheduler = scheduler
+        self.memory_bytes = memory_bytes
+        self.loaded_at = datetime.now()
+        self.last_used = time.monotonic()
+        self.active = 0
+
+    def summary(self) -> Dict:
+        return {
+            "name": self.name,
+            "path": self.path,
+            "model_id": self.detector.model_id,
+            "memory_bytes": self.memory_bytes,
+            "active_requests": self.active,
+            "loaded_at": self.loaded_at.isoformat(),
+            "idle_seconds": round(time.monotonic() - self.last_used, 1),
+        }
+
+
+class ModelRegistry:
+    """loads configured models on first use and keeps them in a memory-budgeted LRU
+
+    each loaded model gets its own detector and scheduler. when loading a
+    model would take the total past the budget, the least recently used
+    models without requests in flight are stopped and dropped. the default
+    model is pinned and never evicted. loads are serialized, so the resident
+    memory measured around a load is attributable to that model.
+    """
+
+    def __init__(
+        self,
+        specs: Dict[str, str],
+        default_model: str,
+        detector_factory: Callable,
+        scheduler_factory: Callable,
+        memory_budget_bytes: int,
+        on_load: Optional[Callable] = None,
+    ):
+        if default_model not in specs:
+            raise ValueError(f"default model {default_model!r} is not in {sorted(specs)}")
+
+        self.specs = specs
+        self.default_model = default_model
+        self.detector_factory = detector_factory
+        self.scheduler_factory = scheduler_factory
+        self.memory_budget_bytes = memory_budget_bytes
+        self.on_load = on_load
+
+        self._models: "OrderedDict[str, LoadedModel]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def resolve(self, name: Optional[str]) -> str:
+        if not name:
+            return self.default_model
+        if name in self.specs:
+            return name
+        for configured in self.specs:
+            if configured.lower() == name.lower():
+                return configured
+        raise UnknownModel(f"unknown model {name!r}, available: {', '.join(self.specs)}")
+
+    def peek(self, name: Optional[str] = None) -> Optional[LoadedModel]:
+        """the loaded model, without loading it or touching its LRU position"""
+        with self._lock:
+            return self._models.get(self.resolve(name))
+
+    def get(self, name: Optional[str] = None) -> LoadedModel:
+        name = self.resolve(name)
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is not None:
+                self._models.move_to_end(name)
+                entry.last_used = time.monotonic()
+                return entry
+
+        with self._load_lock:
+            # another request may have loaded it while this one waited
+            with self._lock:
+                entry = self._models.get(name)
+            if entry is None:
+                entry = self._load(name)
+            return entry
+
+    def acquire(self, name: Optional[str] = None) -> LoadedModel:
+        """get() that also marks a request in flight, so the model is not evicted under it"""
+        while True:
+            entry = self.get(name)
+            with self._lock:
+                # lost a race with eviction, load it again
+                if self._models.get(entry.name) is entry:
+                    entry.active += 1
+                    entry.last_used = time.monotonic()
+                    return entry
+
+    def release(self, entry: LoadedModel):
+        with self._lock:
+            entry.active -= 1
+
+    @contextmanager
+    def use(self, name: Optional[str] = None) -> Iterator[LoadedModel]:
+        entry = self.acquire(name)
+        try:
+            yield entry
+        finally:
+            self.release(entry)
+
+    def loaded(self) -> Dict[str, LoadedModel]:
+        with self._lock:
+            return dict(self._models)
+
+    def memory_used(self) -> int:
+        with self._lock:
+            return sum(entry.memory_bytes for entry in self._models.values())
+
+    def stats(self) -> Dict:
+        with self._lock:
+            loaded = [entry.summary() for entry in self._models.values()]
+        return {
+            "default_model": self.default_model,
+            "available": list(self.specs),
+            "loaded": loaded,
+            "memory_budget_bytes": self.memory_budget_bytes,
+            "memory_used_bytes": sum(entry["memory_bytes"] for entry in loaded),
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
+
+    def stop(self):
+        with self._lock:
+            entries, self._models = list(self._models.values()), OrderedDict()
+        for entry in entries:
+            entry.scheduler.stop()
+
+    def _load(self, name: str) -> LoadedModel:
+        path = self.specs[name]
+        # make room for roughly the weights file before loading, the real footprint is measured after
+        estimate = os.path.getsize(path) if os.path.isfile(path) else 0
+        self._evict(estimate, keep=name)
+
+        logger.info(f"loading model {name} from {path}")
+        process = psutil.Process()
+        rss_before = process.memory_info().rss
+        detector = self.detector_factory(path)
+        rss_delta = max(0, process.memory_info().rss - rss_before)
+        memory_bytes = max(rss_delta, detector.parameter_bytes() or 0)
+
+        entry = LoadedModel(name, path, detector, self.scheduler_factory(detector), memory_bytes)
+        with self._lock:
+            self._models[name] = entry
+            self.loads += 1
+        logger.info(f"model {name} loaded ({memory_bytes / 2**20:.0f} MiB)")
+
+        self._evict(0, keep=name)
+
+        if self.on_load is not None:
+            try:
+                self.on_load(entry)
+            except Exception as e:
+                logger.warning(f"on_load hook for {name} failed: {e}")
+        return entry
+
+    def _evict(self, incoming_bytes: int, keep: str):
+        evicted = []
+        with self._lock:
+            used = sum(entry.memory_bytes for entry in self._models.values()) + incoming_bytes
+            for name in list(self._models):
+                if used <= self.memory_budget_bytes:
+                    break
+                entry = self._models[name]
+                if name in (keep, self.default_model) or entry.active:
+                    continue
+                del self._models[name]
+                used -= entry.memory_bytes
+                evicted.append(entry)
+                self.evictions += 1
+
+        for entry in evicted:
+            logger.info(f"evicting model {entry.name} ({entry.memory_bytes / 2**20:.0f} MiB)")
+            entry.scheduler.stop()
+        if evicted:
+            del entry, evicted
+            gc.collect()
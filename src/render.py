@@ -0,0 +1,146 @@
+import colorsys
+import os
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# defaults for annotated output when the request does not pick its own
+ANNOTATED_FORMAT = os.getenv("ANNOTATED_FORMAT", "jpeg")
+ANNOTATED_QUALITY = int(os.getenv("ANNOTATED_QUALITY", "80"))
+# long side of the annotated image in pixels, 0 keeps the decoded size
+ANNOTATED_MAX_SIZE = int(os.getenv("ANNOTATED_MAX_SIZE", "0"))
+
+# format name -> (file extension, media type)
+OUTPUT_FORMATS = {
+    "jpeg": (".jpg", "image/jpeg"),
+    "webp": (".webp", "image/webp"),
+    "png": (".png", "image/png"),
+}
+
+
+class OutputEncoding(NamedTuple):
+    """how an annotated image is sized and encoded, small enough to pickle to a worker"""
+
+    format: str = ANNOTATED_FORMAT
+    quality: int = ANNOTATED_QUALITY
+    max_size: int = ANNOTATED_MAX_SIZE
+
+    @property
+    def extension(self) -> str:
+        return OUTPUT_FORMATS[self.format][0]
+
+    @property
+    def media_type(self) -> str:
+        return OUTPUT_FORMATS[self.format][1]
+
+
+def class_palette(count: int) -> np.ndarray:
+    """one BGR colour per class id, evenly spread over the hue circle and computed once"""
+    colours = []
+    for class_id in range(max(1, count)):
+        # golden-ratio steps keep neighbouring class ids visually apart
+        hue = (class_id * 0.618033988749895) % 1.0
+        r, g, b = colorsys.hsv_to_rgb(hue, 0.85, 0.95)
+        colours.append((int(b * 255), int(g * 255), int(r * 255)))
+    return np.array(colours, dtype=np.uint8)
+
+
+class AnnotationRenderer:
+    """draws already computed boxes onto a decoded image and encodes it
+
+    the palette and the label text of every class are prepared once per
+    model, so a request only pays for the rectangles and the encode. the
+    image is downscaled first when it is larger than the requested output
+    size, then drawn on in place rather than copied.
+    """
+
+    def __init__(self, names: Dict[int, str]):
+        self.names = names
+        self.palette = class_palette(max(names, default=0) + 1)
+        self._colours: List[Tuple[int, int, int]] = [tuple(int(c) for c in colour) for colour in self.palette]
+        self._label_sizes: Dict[Tuple[int, float, int], Tuple[int, int]] = {}
+
+    def render(self, image: np.ndarray, data: np.ndarray, encoding: Optional[OutputEncoding] = None) -> bytes:
+        """annotated image bytes for (x1, y1, x2, y2, conf, cls) rows in image coordinates"""
+        encoding = encoding or OutputEncoding()
+        image, scale = fit_image(image, encoding.max_size)
+        self.draw(image, data[:, :4] * scale if scale != 1.0 else data[:, :4], data[:, 4], data[:, 5].astype(int))
+        return encode_image(image, encoding)
+
+    def draw(self, image: np.ndarray, boxes: np.ndarray, confidences: np.ndarray, class_ids: np.ndarray):
+        """draws boxes and labels onto image in place"""
+        import cv2
+
+        if not len(boxes):
+            return
+
+        height, width = image.shape[:2]
+        thickness = max(1, round((height + width) / 2 * 0.003))
+        font_scale = max(0.4, thickness / 3)
+        font_thickness = max(1, thickness - 1)
+
+        # one conversion for all corners instead of per-box float to int
+        corners = np.rint(boxes).astype(np.int32)
+        corners[:, 0::2] = corners[:, 0::2].clip(0, width - 1)
+        corners[:, 1::2] = corners[:, 1::2].clip(0, height - 1)
+
+        for (x1, y1, x2, y2), confidence, class_id in zip(corners.tolist(), confidences.tolist(), class_ids.tolist()):
+            colour = self._colours[class_id % len(self._colours)]
+            cv2.rectangle(image, (x1, y1), (x2, y2), colour, thickness, cv2.LINE_AA)
+
+            label = f"{self.names.get(class_id, class_id)} {confidence:.2f}"
+            text_width, text_height = self._label_size(class_id, font_scale, font_thickness, label)
+            # the label sits above the box, or inside it when the box touches the top edge
+            top = y1 - text_height - 3 if y1 - text_height - 3 >= 0 else y1
+            cv2.rectangle(image, (x1, top), (x1 + text_width, top + text_height + 3), colour, -1)
+            cv2.putText(
+                image,
+                label,
+                (x1, top + text_height),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                font_scale,
+                (255, 255, 255),
+                font_thickness,
+                cv2.LINE_AA,
+            )
+
+    def _label_size(self, class_id: int, font_scale: float, font_thickness: int, label: str) -> Tuple[int, int]:
+        # labels of a class only differ in the fixed-width confidence digits
+        key = (class_id, font_scale, font_thickness)
+        size = self._label_sizes.get(key)
+        if size is None:
+            import cv2
+
+            size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, font_thickness)
+            self._label_sizes[key] = size
+        return size
+
+
+def fit_image(image: np.ndarray, max_size: int) -> Tuple[np.ndarray, float]:
+    """(image, scale) with the long side shrunk to max_size, the image itself when it already fits"""
+    height, width = image.shape[:2]
+    if max_size <= 0 or max(height, width) <= max_size:
+        return image, 1.0
+
+    import cv2
+
+    scale = max_size / max(height, width)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA), scale
+
+
+def encode_image(image: np.ndarray, encoding: OutputEncoding) -> bytes:
+    import cv2
+
+    if encoding.format == "jpeg":
+        params = [cv2.IMWRITE_JPEG_QUALITY, encoding.quality]
+    elif encoding.format == "webp":
+        params = [cv2.IMWRITE_WEBP_QUALITY, max(1, encoding.quality)]
+    else:
+        # png is lossless, map quality onto its compression effort instead (0 fastest, 9 smallest)
+        params = [cv2.IMWRITE_PNG_COMPRESSION, min(9, max(0, (100 - encoding.quality) // 10))]
+
+    success, buffer = cv2.imencode(encoding.extension, image, params)
+    if not success:
+        raise RuntimeError("failed to encode annotated image")
+    return buffer.tobytes()
@@ -0,0 +1,181 @@
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.database import DetectionLog, DetectionRollup
+from src.registry import DEFAULT_MODEL
+
+GRANULARITIES = ("minute", "hour", "day")
+TOTAL_BUCKET = datetime(1970, 1, 1)
+
+# processing time bucket upper bounds in seconds, the last bucket is open ended
+LATENCY_BOUNDS = (0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    if granularity == "total":
+        return TOTAL_BUCKET
+    if granularity == "minute":
+        return timestamp.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"unknown granularity {granularity!r}")
+
+
+def histogram_percentile(counts: List[int], pct: float) -> float:
+    """upper bound of the bucket holding the pct-th percentile"""
+    total = sum(counts)
+    if not total:
+        return 0.0
+    threshold = total * pct / 100
+    cumulative = 0
+    for bound, count in zip(LATENCY_BOUNDS, counts):
+        cumulative += count
+        if cumulative >= threshold:
+            return bound
+    return LATENCY_BOUNDS[-1]
+
+
+def _empty_aggregate() -> Dict:
+    return {
+        "detection_count": 0,
+        "total_objects": 0,
+        "processing_time_sum": 0.0,
+        "processing_time_max": 0.0,
+        "latency_histogram": [0] * (len(LATENCY_BOUNDS) + 1),
+        "class_counts": Counter(),
+    }
+
+
+def fold_detections(results: Iterable[Dict]) -> Dict[Tuple[str, datetime], Dict]:
+    """pre-aggregates detections in memory so each bucket is written once per batch"""
+    aggregates: Dict[Tuple[str, datetime], Dict] = {}
+    for result in results:
+        timestamp = result["timestamp"]
+        processing_time = result["processing_time"] or 0.0
+        latency_bucket = bisect_left(LATENCY_BOUNDS, processing_time)
+        class_counts = Counter(d["class_name"] for d in result["detections"] or [])
+
+        for granularity in ("total", *GRANULARITIES):
+            key = (granularity, bucket_start(timestamp, granularity))
+            aggregate = aggregates.get(key)
+            if aggregate is None:
+                aggregate = aggregates[key] = _empty_aggregate()
+            aggregate["detection_count"] += 1
+            aggregate["total_objects"] += result["total_objects"]
+            aggregate["processing_time_sum"] += processing_time
+            aggregate["processing_time_max"] = max(aggregate["processing_time_max"], processing_time)
+            aggregate["latency_histogram"][latency_bucket] += 1
+            aggregate["class_counts"].update(class_counts)
+
+    return aggregates
+
+
+def _locked_bucket(db: Session, model_name: str, granularity: str, start: datetime) -> DetectionRollup:
+    query = db.query(DetectionRollup).filter_by(model_name=model_name, granularity=granularity, bucket_start=start)
+    rollup = query.with_for_update().first()
+    if rollup is not None:
+        return rollup
+
+    try:
+        with db.begin_nested():
+            rollup = DetectionRollup(
+                model_name=model_name,
+                granularity=granularity,
+                bucket_start=start,
+                detection_count=0,
+                total_objects=0,
+                processing_time_sum=0.0,
+                processing_time_max=0.0,
+                latency_histogram=[0] * (len(LATENCY_BOUNDS) + 1),
+                class_counts={},
+            )
+            db.add(rollup)
+        return rollup
+    except IntegrityError:
+        # another writer created the bucket first
+        return query.with_for_update().first()
+
+
+def update_rollups(db: Session, results: List[Dict], model_name: str = DEFAULT_MODEL):
+    """folds detections into the running aggregates, the caller commits
+
+    each touched bucket row is locked for the update, so concurrent writers
+    serialize per bucket instead of losing increments.
+    """
+    for (granularity, start), aggregate in sorted(fold_detections(results).items()):
+        rollup = _locked_bucket(db, model_name, granularity, start)
+
+        rollup.detection_count += aggregate["detection_count"]
+        rollup.total_objects += aggregate["total_objects"]
+        rollup.processing_time_sum += aggregate["processing_time_sum"]
+        rollup.processing_time_max = max(rollup.processing_time_max, aggregate["processing_time_max"])
+        rollup.latency_histogram = [a + b for a, b in zip(rollup.latency_histogram, aggregate["latency_histogram"])]
+        rollup.class_counts = dict(Counter(rollup.class_counts) + aggregate["class_counts"])
+
+
+def rollup_summary(rollup: Optional[DetectionRollup], top_classes: int = 10) -> Dict:
+    if rollup is None or not rollup.detection_count:
+        return {
+            "total_detections": 0,
+            "average_processing_time": 0,
+            "total_objects_detected": 0,
+            "processing_time_percentiles": {"p50": 0, "p95": 0, "p99": 0},
+            "most_common_objects": [],
+        }
+
+    most_common = Counter(rollup.class_counts).most_common(top_classes)
+    return {
+        "total_detections": rollup.detection_count,
+        "average_processing_time": round(rollup.processing_time_sum / rollup.detection_count, 3),
+        "total_objects_detected": rollup.total_objects,
+        "processing_time_percentiles": {
+            "p50": histogram_percentile(rollup.latency_histogram, 50),
+            "p95": histogram_percentile(rollup.latency_histogram, 95),
+            "p99": histogram_percentile(rollup.latency_histogram, 99),
+        },
+        "max_processing_time": round(rollup.processing_time_max, 3),
+        "most_common_objects": [{"class_name": name, "count": count} for name, count in most_common],
+    }
+
+
+def backfill_rollups(db: Session, model_name: str = DEFAULT_MODEL, chunk_size: int = 1000) -> int:
+    """builds the aggregates from existing detection_logs rows, used once on upgrade"""
+    rows = (
+        db.query(
+            DetectionLog.created_at,
+            DetectionLog.processing_time,
+            DetectionLog.total_objects,
+            DetectionLog.detections,
+        )
+        .order_by(DetectionLog.id)
+        .yield_per(chunk_size)
+    )
+
+    chunk, total = [], 0
+    for created_at, processing_time, total_objects, detections in rows:
+        chunk.append(
+            {
+                "timestamp": created_at or TOTAL_BUCKET,
+                "processing_time": processing_time,
+                "total_objects": total_objects or 0,
+                "detections": detections,
+            }
+        )
+        if len(chunk) >= chunk_size:
+            update_rollups(db, chunk, model_name)
+            total += len(chunk)
+            chunk = []
+
+    if chunk:
+        update_rollups(db, chunk, model_name)
+        total += len(chunk)
+
+    db.commit()
+    return total
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -26,10 +26,22 @@ class DetectionResponse(BaseModel):
     image_height: int
     processing_time: float
     timestamp: datetime = Field(default_factory=datetime.now)
+    model: Optional[str] = Field(None, description="model that produced the detections")
+    cached: bool = Field(False, description="answered from the result cache")
+
+
+class AnnotatedDetectionResponse(DetectionResponse):
+    annotated_image: str = Field(..., description="base64 encoded annotated image")
+    annotated_image_type: str = Field("image/jpeg", description="media type of the annotated image")
+    annotated_image_url: Optional[str] = Field(
+        None, description="path to fetch the stored annotated image, set when SAVE_ANNOTATED_IMAGES is on"
+    )
 
 
 class HealthResponse(BaseModel):
     status: str
+    model: str
     model_loaded: bool
     model_classes: int
+    loaded_models: List[str] = []
     timestamp: datetime
\ No newline at end of file
@@ -0,0 +1,122 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from src.database import DetectedObject, DetectionLog
+
+REGION_MODES = ("intersects", "within")
+
+
+def detected_object_rows(result: Dict) -> List[Dict]:
+    """one detected_objects row per box of a detection result"""
+    return [
+        {
+            "detection_id": result["detection_id"],
+            "class_id": d["class_id"],
+            "class_name": d["class_name"],
+            "confidence": d["confidence"],
+            "x1": d["bbox"][0],
+            "y1": d["bbox"][1],
+            "x2": d["bbox"][2],
+            "y2": d["bbox"][3],
+            "created_at": result["timestamp"],
+        }
+        for d in result["detections"] or []
+    ]
+
+
+def insert_detected_objects(db: Session, results: Iterable[Dict]) -> int:
+    rows = [row for result in results for row in detected_object_rows(result)]
+    if rows:
+        db.execute(insert(DetectedObject), rows)
+    return len(rows)
+
+
+def search_objects(
+    db: Session,
+    class_ids: Optional[Sequence[int]] = None,
+    class_names: Optional[Sequence[str]] = None,
+    min_confidence: Optional[float] = None,
+    max_confidence: Optional[float] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    region: Optional[Sequence[float]] = None,
+    region_mode: str = "intersects",
+    limit: int = 100,
+) -> List[DetectedObject]:
+    """newest boxes matching every given filter
+
+    class, confidence and time filters are served by the detected_objects
+    indexes; the region test (x1, y1, x2, y2 in pixels) is applied to the rows
+    those indexes select.
+    """
+    query = db.query(DetectedObject)
+
+    if class_ids:
+        query = query.filter(DetectedObject.class_id.in_(class_ids))
+    if class_names:
+        query = query.filter(DetectedObject.class_name.in_(class_names))
+    if min_confidence is not None:
+        query = query.filter(DetectedObject.confidence >= min_confidence)
+    if max_confidence is not None:
+        query = query.filter(DetectedObject.confidence <= max_confidence)
+    if since is not None:
+        query = query.filter(DetectedObject.created_at >= since)
+    if until is not None:
+        query = query.filter(DetectedObject.created_at < until)
+
+    if region is not None:
+        rx1, ry1, rx2, ry2 = region
+        if region_mode == "within":
+            query = query.filter(
+                DetectedObject.x1 >= rx1,
+                DetectedObject.y1 >= ry1,
+                DetectedObject.x2 <= rx2,
+                DetectedObject.y2 <= ry2,
+            )
+        elif region_mode == "intersects":
+            query = query.filter(
+                DetectedObject.x1 < rx2,
+                DetectedObject.x2 > rx1,
+                DetectedObject.y1 < ry2,
+                DetectedObject.y2 > ry1,
+            )
+        else:
+            raise ValueError(f"unknown region mode {region_mode!r}")
+
+    return query.order_by(DetectedObject.created_at.desc(), DetectedObject.id.desc()).limit(limit).all()
+
+
+def object_summary(obj: DetectedObject) -> Dict:
+    return {
+        "detection_id": obj.detection_id,
+        "class_id": obj.class_id,
+        "class_name": obj.class_name,
+        "confidence": obj.confidence,
+        "bbox": [obj.x1, obj.y1, obj.x2, obj.y2],
+        "created_at": obj.created_at.isoformat(),
+    }
+
+
+def backfill_detected_objects(db: Session, chunk_size: int = 1000) -> int:
+    """splits the detections JSON of existing detection_logs rows into detected_objects, used once on upgrade"""
+    rows = (
+        db.query(DetectionLog.detection_id, DetectionLog.created_at, DetectionLog.detections)
+        .order_by(DetectionLog.id)
+        .yield_per(chunk_size)
+    )
+
+    chunk, total = [], 0
+    for detection_id, created_at, detections in rows:
+        chunk.append({"detection_id": detection_id, "timestamp": created_at, "detections": detections})
+        if len(chunk) >= chunk_size:
+            total += insert_detected_objects(db, chunk)
+            chunk = []
+
+    if chunk:
+        total += insert_detected_objects(db, chunk)
+
+    db.commit()
+    return total
@@ -0,0 +1,72 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+
+class StartupReport:
+    """tracks the phases of a cold start and whether the service is ready
+
+    phases are timed as they run and reported in milliseconds, together with
+    the time from process creation (not module import) to ready, so slow
+    imports before any of our code runs are counted as well.
+    """
+
+    def __init__(self):
+        self.process_started = psutil.Process().create_time()
+        self.phases: Dict[str, float] = {}
+        self.state = "starting"
+        self.current_phase: Optional[str] = None
+        self.error: Optional[str] = None
+        self.ready_after: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self.phases[name] = seconds
+
+    @contextmanager
+    def phase(self, name: str):
+        self.current_phase = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+        # a phase that raised stays current, so a failure reports where it happened
+        self.current_phase = None
+
+    def since_process_start(self) -> float:
+        return time.time() - self.process_started
+
+    def mark_ready(self):
+        self.ready_after = self.since_process_start()
+        self.state = "ready"
+        breakdown = ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.phases.items())
+        logger.info(f"ready {self.ready_after:.2f}s after process start ({breakdown})")
+
+    def mark_failed(self, error: str):
+        self.error = error
+        self.state = "failed"
+        logger.error(f"startup failed during {self.current_phase or 'startup'}: {error}")
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def summary(self) -> Dict:
+        with self._lock:
+            phases = {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()}
+        return {
+            "state": self.state,
+            "current_phase": self.current_phase,
+            "error": self.error,
+            "phases_ms": phases,
+            "ready_after_ms": round(self.ready_after * 1000, 1) if self.ready_after is not None else None,
+            "uptime_ms": round(self.since_process_start() * 1000, 1),
+        }
@@ -26,7 +26,8 @@ def main():
             print(f"  {det['class_name']}: {det['confidence']:.2%}")
 
         out_img = results_dir / f"detected_{img_path.name}"
-        detector.draw_detections(str(img_path), str(out_img))
+        # draws the boxes found above instead of running the model again
+        detector.draw_detections(str(img_path), str(out_img), detections=detection_result["detections"])
         print(f"saved image: {out_img}")
 
         out_json = results_dir / f"detected_{img_path.stem}.json"
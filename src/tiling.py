@@ -0,0 +1,88 @@
+import os
+from typing import List
+
+import numpy as np
+
+# defaults for /detect when tile_size is given without tile_overlap
+TILE_OVERLAP = float(os.getenv("TILE_OVERLAP", "0.2"))
+TILE_NMS_IOU = float(os.getenv("TILE_NMS_IOU", "0.5"))
+# no image is cut into more tiles than this, larger tiles are used instead
+TILE_MAX_COUNT = int(os.getenv("TILE_MAX_COUNT", "64"))
+
+
+def tile_starts(length: int, tile_size: int, overlap: float) -> List[int]:
+    """start positions along one axis, the last tile is aligned to the far edge"""
+    if length <= tile_size:
+        return [0]
+    step = max(1, int(tile_size * (1 - overlap)))
+    starts = list(range(0, length - tile_size, step))
+    starts.append(length - tile_size)
+    return starts
+
+
+def tile_offsets(height: int, width: int, tile_size: int, overlap: float) -> np.ndarray:
+    """(x, y) top-left corner of every tile covering the image, row by row"""
+    ys = tile_starts(height, tile_size, overlap)
+    xs = tile_starts(width, tile_size, overlap)
+    return np.array([(x, y) for y in ys for x in xs], dtype=np.float32).reshape(-1, 2)
+
+
+def fit_tile_size(height: int, width: int, tile_size: int, overlap: float, max_tiles: int = TILE_MAX_COUNT) -> int:
+    """grows the tile size until the image needs at most max_tiles tiles"""
+    while len(tile_offsets(height, width, tile_size, overlap)) > max_tiles:
+        tile_size = int(tile_size * 1.25) + 1
+    return tile_size
+
+
+def tile_views(image: np.ndarray, offsets: np.ndarray, tile_size: int) -> List[np.ndarray]:
+    """slices of the decoded image, views into the same buffer rather than copies"""
+    return [image[y : y + tile_size, x : x + tile_size] for x, y in offsets.astype(int)]
+
+
+def batched_nms(boxes: np.ndarray, scores: np.ndarray, class_ids: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """indices of the boxes kept by class-aware greedy NMS, highest score first
+
+    boxes of different classes are shifted apart by more than the image
+    extent so one pass over all of them never suppresses across classes.
+    each step compares the best remaining box against all others at once.
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    shift = (class_ids.astype(np.float32) * (boxes.max() + 1))[:, None]
+    shifted = boxes + shift
+    x1, y1, x2, y2 = shifted.T
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size:
+        best, rest = order[0], order[1:]
+        keep.append(best)
+        width = (np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest])).clip(0)
+        height = (np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest])).clip(0)
+        intersection = width * height
+        iou = intersection / np.maximum(areas[best] + areas[rest] - intersection, 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def merge_tile_detections(
+    tile_data: List[np.ndarray], offsets: np.ndarray, iou_threshold: float = TILE_NMS_IOU
+) -> np.ndarray:
+    """maps per-tile (x1, y1, x2, y2, conf, cls) rows to image coordinates and merges them
+
+    offsets has one (x, y) row per entry of tile_data; a full-image pass is
+    included with offset (0, 0). duplicates from overlapping tiles are
+    removed with class-aware NMS.
+    """
+    counts = [len(data) for data in tile_data]
+    if not sum(counts):
+        return np.empty((0, 6), dtype=np.float32)
+
+    data = np.concatenate(tile_data).astype(np.float32, copy=False)
+    shifts = np.repeat(offsets, counts, axis=0)
+    data[:, 0:4] += np.tile(shifts, 2)
+
+    keep = batched_nms(data[:, :4], data[:, 4], data[:, 5], iou_threshold)
+    return data[keep]
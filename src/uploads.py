@@ -0,0 +1,129 @@
+import io
+import os
+import tarfile
+import zipfile
+from pathlib import Path, PurePosixPath
+from typing import Iterator, List, Tuple, Union
+
+from src.preprocess import IMAGE_MAX_BYTES, ImageTooLarge
+
+BATCH_UPLOAD_MAX_IMAGES = int(os.getenv("BATCH_UPLOAD_MAX_IMAGES", "64"))
+# an archive upload is held in memory, and so are the images unpacked from it
+ARCHIVE_MAX_BYTES = int(os.getenv("ARCHIVE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+ARCHIVE_CONTENT_TYPES = {
+    "application/zip",
+    "application/x-zip-compressed",
+    "application/x-tar",
+    "application/gzip",
+    "application/x-gzip",
+}
+
+
+def is_archive(filename: str, content_type: str) -> bool:
+    name = (filename or "").lower()
+    return content_type in ARCHIVE_CONTENT_TYPES or name.endswith((".zip", ".tar", ".tar.gz", ".tgz"))
+
+
+def _is_image_name(name: str) -> bool:
+    path = PurePosixPath(name)
+    return path.suffix.lower() in IMAGE_EXTENSIONS and not path.name.startswith(".")
+
+
+def _check_member(name: str, size: int, total: int, max_member_bytes: int, max_total_bytes: int):
+    """rejects a member from its declared size, before it is decompressed"""
+    if size > max_member_bytes:
+        raise ImageTooLarge(f"{PurePosixPath(name).name} unpacks to more than {max_member_bytes} bytes")
+    if total + size > max_total_bytes:
+        raise ImageTooLarge(f"archive unpacks to more than {max_total_bytes} bytes")
+
+
+def iter_archive(
+    source: Union[bytes, str, Path],
+    max_images: int = BATCH_UPLOAD_MAX_IMAGES,
+    max_member_bytes: int = IMAGE_MAX_BYTES,
+    max_total_bytes: int = ARCHIVE_MAX_BYTES,
+) -> Iterator[Tuple[str, bytes]]:
+    """yields the image members of a zip or tar archive one at a time, in archive order
+
+    source is the archive itself or the path of a file holding it. members are
+    checked against max_member_bytes and the running total against
+    max_total_bytes from the sizes in the archive index, so a zip or tar bomb
+    is rejected with ImageTooLarge without being unpacked.
+    """
+    count, total = 0, 0
+    with (io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else open(source, "rb")) as handle:
+        if zipfile.is_zipfile(handle):
+            handle.seek(0)
+            with zipfile.ZipFile(handle) as archive:
+                for info in archive.infolist():
+                    if info.is_dir() or not _is_image_name(info.filename):
+                        continue
+                    if count >= max_images:
+                        raise ValueError(f"archive holds more than {max_images} images")
+                    _check_member(info.filename, info.file_size, total, max_member_bytes, max_total_bytes)
+                    count, total = count + 1, total + info.file_size
+                    # zipfile stops at the declared size and fails the CRC check if the data runs on
+                    yield PurePosixPath(info.filename).name, archive.read(info)
+            return
+
+        handle.seek(0)
+        try:
+            with tarfile.open(fileobj=handle, mode="r:*") as archive:
+                for member in archive:
+                    if not member.isfile() or not _is_image_name(member.name):
+                        continue
+                    if count >= max_images:
+                        raise ValueError(f"archive holds more than {max_images} images")
+                    _check_member(member.name, member.size, total, max_member_bytes, max_total_bytes)
+                    count, total = count + 1, total + member.size
+                    yield PurePosixPath(member.name).name, archive.extractfile(member).read(member.size)
+        except tarfile.TarError:
+            raise ValueError("archive is not a readable zip or tar file")
+
+
+def extract_archive(
+    data: bytes,
+    max_images: int = BATCH_UPLOAD_MAX_IMAGES,
+    max_member_bytes: int = IMAGE_MAX_BYTES,
+    max_total_bytes: int = ARCHIVE_MAX_BYTES,
+) -> List[Tuple[str, bytes]]:
+    """reads the image members of a zip or tar archive in memory, in archive order"""
+    return list(iter_archive(data, max_images, max_member_bytes, max_total_bytes))
+
+
+def iter_uploads(
+    uploads: List[Tuple[str, str, Union[bytes, str, Path]]],
+    max_images: int = BATCH_UPLOAD_MAX_IMAGES,
+    max_total_bytes: int = ARCHIVE_MAX_BYTES,
+) -> Iterator[Tuple[str, bytes]]:
+    """yields (filename, data) images from (filename, content_type, data or path) uploads
+
+    archives are unpacked one member at a time, everything else is passed
+    through as a single image, so uploads spooled to disk are never held in
+    memory as a whole.
+    """
+    count = 0
+    for filename, content_type, source in uploads:
+        if is_archive(filename, content_type):
+            images = iter_archive(source, max_images, IMAGE_MAX_BYTES, max_total_bytes)
+        else:
+            images = [(filename, source if isinstance(source, (bytes, bytearray)) else Path(source).read_bytes())]
+
+        for image in images:
+            count += 1
+            if count > max_images:
+                raise ValueError(f"at most {max_images} images per batch")
+            yield image
+
+
+def expand_uploads(
+    uploads: List[Tuple[str, str, bytes]],
+    max_images: int = BATCH_UPLOAD_MAX_IMAGES,
+) -> List[Tuple[str, bytes]]:
+    """flattens (filename, content_type, data) uploads into (filename, data) images
+
+    archives are unpacked, everything else is passed through as a single image.
+    """
+    return list(iter_uploads(uploads, max_images))
@@ -0,0 +1,66 @@
+import os
+from itertools import islice
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import cv2
+
+VIDEO_MAX_BYTES = int(os.getenv("VIDEO_MAX_BYTES", str(512 * 1024 * 1024)))
+VIDEO_UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def open_video(video_path: str) -> "cv2.VideoCapture":
+    import cv2
+
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        capture.release()
+        raise ValueError("could not open video")
+    return capture
+
+
+def iter_frames(
+    capture: "cv2.VideoCapture",
+    stride: int = 1,
+    target_fps: Optional[float] = None,
+) -> Iterator[Tuple[int, Optional[float], np.ndarray]]:
+    """yields (frame_index, timestamp_seconds, frame) for every kept frame
+
+    keeps every stride-th frame, thinned further when target_fps is below the
+    source rate. skipped frames are only grabbed, never decoded, and frames are
+    read one at a time so memory does not grow with video length.
+    """
+    import cv2
+
+    try:
+        source_fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+        step = max(1, stride)
+        if target_fps and source_fps > target_fps:
+            step = max(step, round(source_fps / target_fps))
+
+        index = 0
+        while True:
+            if index % step:
+                if not capture.grab():
+                    break
+            else:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                timestamp = round(index / source_fps, 3) if source_fps else None
+                yield index, timestamp, frame
+            index += 1
+
+    finally:
+        capture.release()
+
+
+def iter_batches(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
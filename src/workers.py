@@ -0,0 +1,300 @@
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.batching import BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS, BATCH_QUEUE_SIZE, BatchScheduler
+
+logger = logging.getLogger(__name__)
+
+# 0 keeps inference on a thread in the API process
+INFERENCE_PROCESSES = int(os.getenv("INFERENCE_PROCESSES", "0"))
+# torch threads per worker process, 0 splits the cores evenly between workers
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "0"))
+# workers load their own copy of the weights. fork shares the API process's weights
+# copy-on-write, but forking a process that already runs torch, scheduler and writer
+# threads can leave a lock held in the child, so it is opt-in
+WORKER_START_METHOD = os.getenv(
+    "WORKER_START_METHOD", "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+)
+
+REQUEST_FIELDS = ("filename", "conf_threshold", "annotate", "tile_size", "tile_overlap", "encoding", "profile")
+
+
+def detect_with_retry(detector, requests: List[Dict]) -> List[Tuple[str, object]]:
+    """("ok", output) or ("error", message) per request, retrying one by one if the batch fails"""
+    try:
+        return [("ok", output) for output in detector.detect_batch(requests)]
+    except Exception as e:
+        if len(requests) == 1:
+            return [("error", str(e))]
+        logger.warning(f"batch of {len(requests)} failed, retrying individually: {e}")
+
+    outcomes = []
+    for request in requests:
+        try:
+            outcomes.append(("ok", detector.detect_batch([request])[0]))
+        except Exception as e:
+            outcomes.append(("error", str(e)))
+    return outcomes
+
+
+def _worker_main(
+    index: int, detector, task_queue, result_queue, current_batch, warmed, threads: int, warmup_runs: int
+):
+    # exported backends read this when their session is created, torch is set directly
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    import torch
+
+    torch.set_num_threads(threads)
+
+    if isinstance(detector, dict):
+        from src.detector import ObjectDetector
+
+        detector = ObjectDetector(**detector)
+        # the API process already exported the profile weights, this only loads them
+        from src.profiles import PROFILES
+
+        detector.prepare_profiles(PROFILES.values())
+    if warmup_runs:
+        detector.warmup(warmup_runs)
+    warmed[index] = 1
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+
+        batch_id, items = task
+        current_batch[index] = batch_id
+
+        blocks, requests = [], []
+        try:
+            for name, shape, dtype, fields in items:
+                block = shared_memory.SharedMemory(name=name)
+                blocks.append(block)
+                requests.append({**fields, "image": np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)})
+            outcomes = detect_with_retry(detector, requests)
+        except Exception as e:
+            outcomes = [("error", str(e))] * len(items)
+        finally:
+            # the arrays borrow the shared buffers and must go before the blocks close
+            requests.clear()
+            for block in blocks:
+                block.close()
+
+        result_queue.put((batch_id, outcomes))
+        current_batch[index] = -1
+
+
+class ProcessScheduler(BatchScheduler):
+    """micro-batches requests in the API process and runs them on a pool of worker processes
+
+    batches are formed exactly as in BatchScheduler, then handed to whichever
+    worker is free through a multiprocessing queue. images travel through
+    shared memory blocks, only their names and shapes are pickled. by default
+    each worker is started from a clean process (forkserver or spawn) and loads
+    the model itself, which also keeps replacement workers started from the
+    reader thread safe. with the fork start method the workers inherit the
+    detector already loaded in the API process instead, sharing its weight
+    tensors copy-on-write.
+
+    at most two batches per worker are in flight; beyond that requests wait
+    in the bounded request queue and overload is rejected as before. the
+    scheduler is ready once every worker has loaded and warmed up its model,
+    and again once a replacement worker has.
+    """
+
+    def __init__(
+        self,
+        detector,
+        processes: int = INFERENCE_PROCESSES,
+        threads_per_worker: int = WORKER_THREADS,
+        start_method: str = WORKER_START_METHOD,
+        warmup_runs: int = 0,
+        max_batch_size: int = BATCH_MAX_SIZE,
+        max_wait_ms: float = BATCH_MAX_WAIT_MS,
+        max_queue_size: int = BATCH_QUEUE_SIZE,
+    ):
+        self.processes = max(1, processes)
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // self.processes)
+        self.start_method = start_method
+        self.warmup_runs = warmup_runs
+
+        self._context = mp.get_context(start_method)
+        self._tasks = self._context.Queue()
+        self._results = self._context.Queue()
+        self._current = self._context.Array("q", [-1] * self.processes, lock=False)
+        # set by each worker once its model is loaded and warmed up
+        self._warmed = self._context.Array("b", [0] * self.processes, lock=False)
+        self._batch_ids = itertools.count()
+        self._pending: Dict[int, Tuple[List[Tuple[Dict, Future]], float, List[shared_memory.SharedMemory]]] = {}
+        self._pending_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.processes * 2)
+        self.worker_restarts = 0
+
+        self._detector_arg = detector
+        if start_method != "fork":
+            self._detector_arg = {"model_path": detector.model_path, "backend": detector.backend}
+        # workers inherit the running resource tracker, so blocks they attach to
+        # are tracked once, by the API process that creates and unlinks them
+        resource_tracker.ensure_running()
+        self._workers = [self._start_worker(i) for i in range(self.processes)]
+
+        super().__init__(detector, max_batch_size, max_wait_ms, max_queue_size)
+
+        self._reader = threading.Thread(target=self._read_results, name="inference-results", daemon=True)
+        self._reader.start()
+
+    def _start_worker(self, index: int):
+        self._warmed[index] = 0
+        worker = self._context.Process(
+            target=_worker_main,
+            args=(
+                index,
+                self._detector_arg,
+                self._tasks,
+                self._results,
+                self._current,
+                self._warmed,
+                self.threads_per_worker,
+                self.warmup_runs,
+            ),
+            name=f"inference-worker-{index}",
+            daemon=True,
+        )
+        worker.start()
+        return worker
+
+    def ready(self) -> bool:
+        return all(self._warmed)
+
+    def stats(self) -> Dict:
+        with self._pending_lock:
+            in_flight = len(self._pending)
+        return {
+            **super().stats(),
+            "processes": self.processes,
+            "threads_per_worker": self.threads_per_worker,
+            "start_method": self.start_method,
+            "workers_ready": sum(self._warmed),
+            "in_flight_batches": in_flight,
+            "worker_restarts": self.worker_restarts,
+        }
+
+    def stop(self, timeout: float = 5.0):
+        super().stop(timeout)
+
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+
+        self._results.put(None)
+        self._reader.join(timeout)
+
+        with self._pending_lock:
+            pending, self._pending = list(self._pending.values()), {}
+        for batch, _, blocks in pending:
+            self._release(blocks)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("batch scheduler is stopped"))
+
+    def _process(self, batch: List[Tuple[Dict, Future]], started: float):
+        # wait for a free slot, but give up if the scheduler is shutting down
+        while not self._slots.acquire(timeout=0.1):
+            if self._stopped.is_set():
+                for _, future in batch:
+                    future.set_exception(RuntimeError("batch scheduler is stopped"))
+                return
+
+        blocks, items = [], []
+        try:
+            for request, _ in batch:
+                image = np.ascontiguousarray(request["image"])
+                block = shared_memory.SharedMemory(create=True, size=max(1, image.nbytes))
+                blocks.append(block)
+                np.ndarray(image.shape, dtype=image.dtype, buffer=block.buf)[...] = image
+                fields = {field: request[field] for field in REQUEST_FIELDS if field in request}
+                items.append((block.name, image.shape, image.dtype.str, fields))
+        except Exception as e:
+            self._release(blocks)
+            self._slots.release()
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        batch_id = next(self._batch_ids)
+        with self._pending_lock:
+            self._pending[batch_id] = (batch, started, blocks)
+        self._tasks.put((batch_id, items))
+
+    def _read_results(self):
+        while True:
+            # liveness is checked on every pass, a busy results queue must not hide a crashed worker
+            self._check_workers()
+            try:
+                message = self._results.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if message is None:
+                break
+
+            batch_id, outcomes = message
+            self._finish(batch_id, outcomes)
+
+    def _finish(self, batch_id: int, outcomes: Optional[List[Tuple[str, object]]], error: str = ""):
+        with self._pending_lock:
+            entry = self._pending.pop(batch_id, None)
+        if entry is None:
+            return
+
+        batch, started, blocks = entry
+        self._release(blocks)
+        self._slots.release()
+
+        if outcomes is None:
+            outcomes = [("error", error)] * len(batch)
+        for (request, future), (status, payload) in zip(batch, outcomes):
+            if status == "ok":
+                self._resolve(request, future, payload, started)
+            else:
+                future.set_exception(RuntimeError(payload))
+
+    def _check_workers(self):
+        """fails the batch a crashed worker was holding and starts a replacement"""
+        if self._stopped.is_set():
+            return
+        for index, worker in enumerate(self._workers):
+            if worker.is_alive():
+                continue
+            logger.error(f"inference worker {index} exited with code {worker.exitcode}, restarting")
+            batch_id = self._current[index]
+            self._current[index] = -1
+            if batch_id >= 0:
+                self._finish(batch_id, None, f"inference worker exited with code {worker.exitcode}")
+            self._workers[index] = self._start_worker(index)
+            self.worker_restarts += 1
+
+    @staticmethod
+    def _release(blocks: List[shared_memory.SharedMemory]):
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def create_scheduler(detector, processes: int = INFERENCE_PROCESSES, warmup_runs: int = 0) -> BatchScheduler:
+    """the in-process thread scheduler, or a worker pool when processes > 0"""
+    if processes > 0:
+        return ProcessScheduler(detector, processes=processes, warmup_runs=warmup_runs)
+    return BatchScheduler(detector)
@@ -0,0 +1,180 @@
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from src.database import DetectionLog, ModelMetrics, SessionLocal
+from src.registry import DEFAULT_MODEL
+from src.rollups import update_rollups
+from src.search import insert_detected_objects
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "10000"))
+WRITE_BEHIND_FLUSH_SIZE = int(os.getenv("WRITE_BEHIND_FLUSH_SIZE", "200"))
+WRITE_BEHIND_FLUSH_INTERVAL_MS = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL_MS", "500"))
+
+
+def detection_log_row(result: Dict, confidence: float) -> Dict:
+    return {
+        "detection_id": result["detection_id"],
+        "filename": result["filename"],
+        "total_objects": result["total_objects"],
+        "image_width": result["image_width"],
+        "image_height": result["image_height"],
+        "processing_time": result["processing_time"],
+        "confidence_threshold": confidence,
+        "model_name": result.get("model", DEFAULT_MODEL),
+        "detections": result["detections"],
+        "created_at": result["timestamp"],
+    }
+
+
+def persist_detections(db: Session, entries: List[Tuple[Dict, float]]):
+    """multi-row inserts of the logs and their boxes, one metrics update and one rollup pass per model
+
+    the caller commits.
+    """
+    db.execute(insert(DetectionLog), [detection_log_row(result, confidence) for result, confidence in entries])
+    insert_detected_objects(db, [result for result, _ in entries])
+
+    by_model: Dict[str, List[Dict]] = {}
+    for result, _ in entries:
+        by_model.setdefault(result.get("model", DEFAULT_MODEL), []).append(result)
+
+    for model_name, results in sorted(by_model.items()):
+        db.query(ModelMetrics).filter_by(model_name=model_name).update(
+            {
+                ModelMetrics.total_detections: ModelMetrics.total_detections + len(results),
+                ModelMetrics.last_updated: datetime.now(),
+            }
+        )
+        update_rollups(db, results, model_name)
+
+
+class DetectionWriter:
+    """write-behind queue that takes detection logging off the request path
+
+    requests enqueue their result and return. a background thread flushes
+    whatever is pending every flush_interval_ms, or as soon as flush_size rows
+    are waiting, as a single transaction. the queue is bounded: when it is
+    full enqueue returns False and the caller writes synchronously instead.
+    """
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        max_pending: int = WRITE_BEHIND_MAX_PENDING,
+        flush_size: int = WRITE_BEHIND_FLUSH_SIZE,
+        flush_interval_ms: float = WRITE_BEHIND_FLUSH_INTERVAL_MS,
+    ):
+        self.session_factory = session_factory
+        self.max_pending = max(1, max_pending)
+        self.flush_size = max(1, flush_size)
+        self.flush_interval_ms = flush_interval_ms
+
+        self._queue: queue.Queue = queue.Queue(maxsize=self.max_pending)
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.flushes = 0
+
+        self._thread = threading.Thread(target=self._run, name="detection-writer", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, result: Dict, confidence: float) -> bool:
+        if self._stopped.is_set():
+            return False
+        try:
+            self._queue.put_nowait((result, confidence))
+        except queue.Full:
+            return False
+        return True
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def stop(self, timeout: float = 10.0):
+        """stops accepting rows and waits for everything pending to be flushed"""
+        self._stopped.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.error(f"detection writer did not drain in {timeout}s, {self.pending()} rows lost")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "pending": self.pending(),
+                "max_pending": self.max_pending,
+                "rows_written": self.rows_written,
+                "rows_failed": self.rows_failed,
+                "flushes": self.flushes,
+            }
+
+    def _collect(self) -> List[Tuple[Dict, float]]:
+        batch = []
+        deadline = time.monotonic() + self.flush_interval_ms / 1000
+        # short polls so stop() does not wait out a whole flush interval
+        while len(batch) < self.flush_size and not self._stopped.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=min(remaining, 0.05)))
+            except queue.Empty:
+                continue
+        return batch
+
+    def _drain(self) -> List[Tuple[Dict, float]]:
+        batch = []
+        while len(batch) < self.flush_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+
+        while batch := self._drain():
+            self._flush(batch)
+
+    def _flush(self, batch: List[Tuple[Dict, float]]):
+        if self._write(batch):
+            return
+
+        # a single bad row (e.g. a duplicate id) should not sink the whole batch
+        if len(batch) > 1:
+            for entry in batch:
+                self._write([entry])
+
+    def _write(self, batch: List[Tuple[Dict, float]]) -> bool:
+        db = self.session_factory()
+        try:
+            persist_detections(db, batch)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"writing {len(batch)} detections failed: {str(e)}")
+            if len(batch) == 1:
+                with self._lock:
+                    self.rows_failed += 1
+            return False
+        finally:
+            db.close()
+
+        with self._lock:
+            self.rows_written += len(batch)
+            self.flushes += 1
+        return True
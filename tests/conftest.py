@@ -0,0 +1,63 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.database import Base
+
+
+@pytest.fixture
+def engine():
+    """an in-memory sqlite database with every table, shared by all threads of the test"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def make_result():
+    """builds detection results the way the detector returns them
+
+    boxes are (class_id, class_name, confidence, bbox) tuples; classes is a
+    shorthand for one box per class name.
+    """
+
+    def make(
+        detection_id: str = "det_1",
+        timestamp: datetime = datetime(2026, 1, 1, 10, 0),
+        boxes=((0, "person", 0.9, [0, 0, 10, 10]),),
+        classes=None,
+        processing_time: float = 0.05,
+    ):
+        if classes is not None:
+            boxes = [(0, name, 0.9, [0, 0, 10, 10]) for name in classes]
+        return {
+            "detection_id": detection_id,
+            "filename": "a.jpg",
+            "total_objects": len(boxes),
+            "detections": [
+                {"class_id": class_id, "class_name": name, "confidence": conf, "bbox": bbox}
+                for class_id, name, conf, bbox in boxes
+            ],
+            "image_width": 640,
+            "image_height": 480,
+            "processing_time": processing_time,
+            "timestamp": timestamp,
+        }
+
+    return make
@@ -1,5 +1,8 @@
 from fastapi.testclient import TestClient
 from pathlib import Path
+import io
+import json
+import zipfile
 from src.api import app
 import src.api as api_module
 
@@ -8,8 +11,7 @@ client = TestClient(app)
 
 def setup_module():
     # load the model once for tests
-    if api_module.detector is None:
-        api_module.detector = api_module.ObjectDetector()
+    api_module.warm_up()
 
 
 def test_root():
@@ -28,6 +30,35 @@ def test_health_check():
     assert data["model_classes"] == 80
 
 
+def test_liveness_and_readiness():
+    assert client.get("/livez").status_code == 200
+
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["state"] == "ready"
+    assert "model" in data["phases_ms"]
+
+    assert client.get("/stats/startup").json()["ready_after_ms"] > 0
+
+
+def test_metrics():
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "http_requests_in_flight" in response.text
+
+
+def test_models():
+    response = client.get("/models")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["default_model"] in [m["name"] for m in data["loaded"]]
+
+    response = client.get("/health", params={"model": "no-such-model"})
+    assert response.status_code == 404
+
+
 def test_get_classes():
     response = client.get("/classes")
     assert response.status_code == 200
@@ -37,6 +68,30 @@ def test_get_classes():
     assert "car" in data["classes"]
 
 
+def test_search_detections():
+    response = client.get("/detections/search", params={"class_name": "person", "min_confidence": 0.5})
+    assert response.status_code == 200
+    assert "objects" in response.json()
+
+    response = client.get("/detections/search", params={"region": "10,10,5,5"})
+    assert response.status_code == 400
+
+
+def test_history_cursor():
+    response = client.get("/history", params={"limit": 1})
+    assert response.status_code == 200
+    assert "next_cursor" in response.json()
+
+    response = client.get("/history", params={"cursor": "bogus"})
+    assert response.status_code == 400
+
+
+def test_history_export():
+    response = client.get("/history/export", params={"format": "csv"})
+    assert response.status_code == 200
+    assert response.text.startswith("detection_id,")
+
+
 def test_invalid_file_type():
     response = client.post(
         "/detect",
@@ -45,6 +100,23 @@ def test_invalid_file_type():
     assert response.status_code == 400
 
 
+def test_undecodable_image():
+    response = client.post(
+        "/detect",
+        files={"file": ("broken.jpg", b"not really a jpeg", "image/jpeg")},
+    )
+    assert response.status_code == 400
+
+
+def test_oversized_image_is_rejected():
+    header = b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR" + (100000).to_bytes(4, "big") * 2
+    response = client.post(
+        "/detect",
+        files={"file": ("huge.png", header, "image/png")},
+    )
+    assert response.status_code == 413
+
+
 def test_detect_objects_if_image_exists():
     # uses any local image if present (keeps tests flexible)
     images_dir = Path("images")
@@ -67,6 +139,49 @@ def test_detect_objects_if_image_exists():
     assert isinstance(data["detections"], list)
 
 
+def test_detect_tiled_if_image_exists():
+    images_dir = Path("images")
+    candidates = list(images_dir.glob("*.jpg")) + list(images_dir.glob("*.png"))
+    if not candidates:
+        return
+
+    img_path = candidates[0]
+    with open(img_path, "rb") as f:
+        response = client.post(
+            "/detect",
+            files={"file": (img_path.name, f, "image/jpeg")},
+            params={"confidence": 0.25, "tile_size": 320, "tile_overlap": 0.25},
+        )
+
+    assert response.status_code == 200
+    data = response.json()
+    for detection in data["detections"]:
+        x1, y1, x2, y2 = detection["bbox"]
+        assert 0 <= x1 <= x2 <= data["image_width"]
+        assert 0 <= y1 <= y2 <= data["image_height"]
+
+
+def test_detect_columnar_if_image_exists():
+    images_dir = Path("images")
+    candidates = list(images_dir.glob("*.jpg")) + list(images_dir.glob("*.png"))
+    if not candidates:
+        return
+
+    img_path = candidates[0]
+    with open(img_path, "rb") as f:
+        response = client.post(
+            "/detect",
+            files={"file": (img_path.name, f, "image/jpeg")},
+            params={"confidence": 0.25, "format": "columnar"},
+        )
+
+    assert response.status_code == 200
+    data = response.json()
+    columns = data["detections"]
+    assert set(columns) == {"class_id", "class_name", "confidence", "bbox"}
+    assert len(columns["class_id"]) == data["total_objects"]
+
+
 def test_detect_annotated_if_image_exists():
     images_dir = Path("images")
     candidates = list(images_dir.glob("*.jpg")) + list(images_dir.glob("*.png"))
@@ -82,4 +197,80 @@ def test_detect_annotated_if_image_exists():
         )
 
     assert response.status_code == 200
-    assert response.headers["content-type"].startswith("image/")
\ No newline at end of file
+    assert response.headers["content-type"].startswith("image/")
+
+
+def test_detect_combined_if_image_exists(monkeypatch):
+    monkeypatch.setattr(api_module, "SAVE_ANNOTATED_IMAGES", True)
+    images_dir = Path("images")
+    candidates = list(images_dir.glob("*.jpg")) + list(images_dir.glob("*.png"))
+    if not candidates:
+        return
+
+    img_path = candidates[0]
+    with open(img_path, "rb") as f:
+        response = client.post(
+            "/detect/combined",
+            files={"file": (img_path.name, f, "image/jpeg")},
+            params={"confidence": 0.25},
+        )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert isinstance(data["detections"], list)
+    assert data["annotated_image"]
+
+    image_response = client.get(data["annotated_image_url"])
+    assert image_response.status_code == 200
+    assert image_response.headers["content-type"].startswith("image/")
+
+
+def test_detect_batch_if_image_exists():
+    images_dir = Path("images")
+    candidates = list(images_dir.glob("*.jpg")) + list(images_dir.glob("*.png"))
+    if not candidates:
+        return
+
+    img_path = candidates[0]
+    data = img_path.read_bytes()
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr(f"frames/{img_path.name}", data)
+
+    response = client.post(
+        "/detect/batch",
+        files=[
+            ("files", (img_path.name, data, "image/jpeg")),
+            ("files", ("frames.zip", archive.getvalue(), "application/zip")),
+        ],
+        params={"confidence": 0.25},
+    )
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["index"] for line in lines[:-1]) == [0, 1]
+    assert all("result" in line for line in lines[:-1])
+    assert lines[-1]["summary"]["succeeded"] == 2
+
+
+def test_detect_stream_if_image_exists():
+    images_dir = Path("images")
+    candidates = list(images_dir.glob("*.jpg")) + list(images_dir.glob("*.png"))
+    if not candidates:
+        return
+
+    with client.websocket_connect("/ws/detect") as websocket:
+        websocket.send_bytes(candidates[0].read_bytes())
+        data = websocket.receive_json()
+
+    assert data["frame"] == 0
+    assert isinstance(data["detections"], list)
+
+
+def test_detect_stream_reports_a_receive_error():
+    with client.websocket_connect("/ws/detect") as websocket:
+        # frames must be binary, a text message cannot be received as one
+        websocket.send_text("not a frame")
+        data = websocket.receive_json()
+
+    assert data["error"].startswith("receive failed")
@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+
+from src.batching import BatchScheduler, SchedulerBusy
+
+
+class FakeDetector:
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.fail_on = fail_on
+        self.release = threading.Event()
+
+    def detect_batch(self, requests):
+        self.release.wait(5)
+        self.batches.append([r["filename"] for r in requests])
+        if any(r["filename"] == self.fail_on for r in requests):
+            raise ValueError("bad image")
+        return [({"filename": r["filename"], "conf": r["conf_threshold"]}, None) for r in requests]
+
+
+def test_concurrent_requests_share_a_batch():
+    detector = FakeDetector()
+    scheduler = BatchScheduler(detector, max_batch_size=4, max_wait_ms=200)
+    try:
+        futures = [scheduler.submit(None, f"img{i}.jpg", 0.25) for i in range(4)]
+        detector.release.set()
+        results = [f.result(timeout=5)[0]["filename"] for f in futures]
+    finally:
+        scheduler.stop()
+
+    assert results == [f"img{i}.jpg" for i in range(4)]
+    assert detector.batches == [results]
+    assert scheduler.stats()["batch_size_counts"] == {"4": 1}
+
+
+def test_failed_batch_only_fails_the_bad_request():
+    detector = FakeDetector(fail_on="bad.jpg")
+    scheduler = BatchScheduler(detector, max_batch_size=2, max_wait_ms=200)
+    try:
+        good = scheduler.submit(None, "good.jpg", 0.25)
+        bad = scheduler.submit(None, "bad.jpg", 0.25)
+        detector.release.set()
+
+        assert good.result(timeout=5)[0]["filename"] == "good.jpg"
+        assert isinstance(bad.exception(timeout=5), ValueError)
+    finally:
+        scheduler.stop()
+
+
+def test_full_queue_rejects_new_requests():
+    detector = FakeDetector()
+    scheduler = BatchScheduler(detector, max_batch_size=1, max_wait_ms=0, max_queue_size=1)
+    try:
+        running = scheduler.submit(None, "running.jpg", 0.25)
+        # wait until the worker has taken the first request off the queue
+        while scheduler.queue_depth():
+            pass
+        queued = scheduler.submit(None, "queued.jpg", 0.25)
+
+        with pytest.raises(SchedulerBusy):
+            scheduler.submit(None, "rejected.jpg", 0.25)
+
+        detector.release.set()
+        assert running.result(timeout=5)[0]["filename"] == "running.jpg"
+        assert queued.result(timeout=5)[0]["filename"] == "queued.jpg"
+    finally:
+        scheduler.stop()
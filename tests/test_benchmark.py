@@ -0,0 +1,41 @@
+from src.benchmark import compare, endpoint_payload, percentile, synthetic_image
+
+
+def test_percentile_interpolates():
+    assert percentile([10, 20, 30, 40], 50) == 25
+    assert percentile([5], 99) == 5
+    assert percentile([], 50) == 0.0
+
+
+def test_synthetic_image_is_deterministic():
+    first = synthetic_image(64, 48, 5, seed=1)
+    second = synthetic_image(64, 48, 5, seed=1)
+    assert first.shape == (48, 64, 3)
+    assert (first == second).all()
+
+
+def test_endpoint_payloads_differ_per_request():
+    payloads = [endpoint_payload(b"jpeg", i) for i in range(3)]
+
+    assert all(payload.startswith(b"jpeg") for payload in payloads)
+    assert len(set(payloads)) == 3
+    # the warm-up request uses the index just past the measured range
+    assert endpoint_payload(b"jpeg", 3) not in payloads
+
+
+def test_compare_flags_slower_latency_and_lower_throughput():
+    baseline = {
+        "stages": {"640x480/d5": {"inference": {"p50_ms": 10.0, "samples": 10}}},
+        "endpoints": {"640x480/c4": {"p95_ms": 50.0, "throughput_rps": 40.0}},
+    }
+    current = {
+        "stages": {"640x480/d5": {"inference": {"p50_ms": 13.0, "samples": 20}}},
+        "endpoints": {"640x480/c4": {"p95_ms": 52.0, "throughput_rps": 30.0}},
+    }
+
+    regressions = compare(current, baseline, tolerance=0.15)
+
+    assert regressions == [
+        "stages.640x480/d5.inference.p50_ms: 10.0 -> 13.0",
+        "endpoints.640x480/c4.throughput_rps: 40.0 -> 30.0",
+    ]
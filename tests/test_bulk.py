@@ -0,0 +1,83 @@
+import json
+
+import cv2
+import numpy as np
+
+from src.bulk import Manifest, list_images, run_bulk
+
+
+class FakeDetector:
+    """one box per image, failing on files named bad.*"""
+
+    def __init__(self):
+        self.seen = []
+
+    def detect_batch(self, requests):
+        if any(r["filename"].startswith("bad") for r in requests):
+            raise RuntimeError("model failed")
+        self.seen += [r["filename"] for r in requests]
+        return [
+            (
+                {
+                    "total_objects": 1,
+                    "detections": [{"class_id": 0, "class_name": "person", "confidence": 0.9, "bbox": [1, 2, 3, 4]}],
+                    "image_width": r["image"].shape[1],
+                    "image_height": r["image"].shape[0],
+                    "processing_time": 0.01,
+                },
+                None,
+            )
+            for r in requests
+        ]
+
+
+def write_images(directory, names):
+    directory.mkdir()
+    for name in names:
+        cv2.imwrite(str(directory / name), np.zeros((32, 48, 3), dtype=np.uint8))
+    (directory / "notes.txt").write_text("not an image")
+
+
+def test_images_are_listed_once_from_directories_and_file_lists(tmp_path):
+    write_images(tmp_path / "images", ["a.jpg", "b.png"])
+    file_list = tmp_path / "list.txt"
+    file_list.write_text(f"{tmp_path / 'images' / 'a.jpg'}\n\n")
+
+    images = list_images([str(tmp_path / "images")], str(file_list))
+
+    assert [p.name for p in images] == ["a.jpg", "b.png"]
+
+
+def test_rows_are_written_once_and_failures_recorded(tmp_path):
+    write_images(tmp_path / "images", ["a.jpg", "bad.jpg", "c.png"])
+    (tmp_path / "images" / "d.jpg").write_bytes(b"not really a jpeg")
+    output = tmp_path / "out.ndjson"
+
+    summary = run_bulk(FakeDetector(), list_images([str(tmp_path / "images")]), output, batch_size=2, log=lambda _: None)
+
+    rows = {row["filename"]: row for row in map(json.loads, output.read_text().splitlines())}
+    assert summary["processed"] == 4 and summary["failed"] == 2
+    assert rows["a.jpg"]["class_name"] == ["person"] and rows["a.jpg"]["image_width"] == 48
+    assert rows["bad.jpg"]["error"] == "model failed"
+    assert rows["d.jpg"]["error"]
+
+
+def test_interrupted_runs_resume_without_redoing_finished_images(tmp_path):
+    write_images(tmp_path / "images", ["a.jpg", "b.jpg", "c.jpg"])
+    images = list_images([str(tmp_path / "images")])
+    output = tmp_path / "out.ndjson"
+
+    run_bulk(FakeDetector(), images[:2], output, batch_size=1, log=lambda _: None)
+    # a batch that reached the output but not the manifest, and a torn manifest line
+    with open(output, "a") as handle:
+        handle.write('{"filename": "half written"}\n')
+    with open(tmp_path / "out.ndjson.manifest", "a") as handle:
+        handle.write('{"images": ["c.j')
+
+    detector = FakeDetector()
+    summary = run_bulk(detector, images, output, batch_size=1, log=lambda _: None)
+
+    assert detector.seen == ["c.jpg"]
+    assert summary["skipped"] == 2
+    assert [json.loads(line)["filename"] for line in output.read_text().splitlines()] == ["a.jpg", "b.jpg", "c.jpg"]
+    assert len(Manifest(tmp_path / "out.ndjson.manifest").done) == 3
@@ -0,0 +1,55 @@
+from src.cache import ResultCache, SQLiteCacheBackend, cache_key
+
+
+def make_entry(conf_threshold):
+    return {
+        "conf_threshold": conf_threshold,
+        "detections": [
+            {"class_id": 0, "class_name": "person", "confidence": 0.9, "bbox": [0, 0, 10, 10]},
+            {"class_id": 2, "class_name": "car", "confidence": 0.15, "bbox": [5, 5, 20, 20]},
+        ],
+        "image_width": 640,
+        "image_height": 480,
+    }
+
+
+def test_key_depends_on_content_and_model():
+    assert cache_key(b"abc", "yolov8n.pt") == cache_key(b"abc", "yolov8n.pt")
+    assert cache_key(b"abc", "yolov8n.pt") != cache_key(b"abd", "yolov8n.pt")
+    assert cache_key(b"abc", "yolov8n.pt") != cache_key(b"abc", "yolov8s.pt")
+
+
+def test_lookup_only_hits_at_or_above_stored_confidence():
+    cache = ResultCache(max_entries=4)
+    cache.store("k", make_entry(0.1))
+
+    assert cache.lookup("k", 0.5) is not None
+    assert cache.lookup("k", 0.05) is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(max_entries=2)
+    cache.store("a", make_entry(0.1))
+    cache.store("b", make_entry(0.1))
+    cache.lookup("a", 0.25)
+    cache.store("c", make_entry(0.1))
+
+    assert cache.lookup("b", 0.25) is None
+    assert cache.lookup("a", 0.25) is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_sqlite_backend_is_shared_between_caches(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    first = ResultCache(max_entries=4, backend=SQLiteCacheBackend(path))
+    second = ResultCache(max_entries=4, backend=SQLiteCacheBackend(path))
+
+    first.store("k", make_entry(0.1))
+    entry = second.lookup("k", 0.25)
+
+    assert entry is not None
+    assert len(entry["detections"]) == 2
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from src.evaluate import average_precision, drift, load_labels, mean_average_precision, regressions
+
+
+def test_yolo_labels_are_converted_to_pixel_corners(tmp_path):
+    path = tmp_path / "image.txt"
+    path.write_text("2 0.5 0.5 0.5 0.25\n\n0 0.1 0.2 0.2 0.2\n")
+
+    labels = load_labels(path, 200, 100)
+
+    assert labels.tolist() == pytest.approx([[2, 50, 37.5, 150, 62.5], [0, 0, 10, 40, 30]])
+    assert load_labels(tmp_path / "missing.txt", 200, 100).shape == (0, 5)
+
+
+def test_average_precision_uses_the_precision_envelope():
+    assert average_precision(np.array([0.5, 1.0]), np.array([1.0, 1.0])) == pytest.approx(1.0)
+    # a miss ranked first only costs precision until a later hit recovers it
+    assert average_precision(np.array([0.0, 0.5, 1.0]), np.array([0.0, 0.5, 2 / 3])) == pytest.approx(2 / 3)
+
+
+def test_perfect_predictions_score_one_and_wrong_classes_zero():
+    labels = [np.array([[0, 10, 10, 50, 50], [1, 60, 60, 90, 90]], dtype=np.float32)]
+    exact = [np.array([[10, 10, 50, 50, 0.9, 0], [60, 60, 90, 90, 0.8, 1]], dtype=np.float32)]
+    swapped = [np.array([[10, 10, 50, 50, 0.9, 1], [60, 60, 90, 90, 0.8, 0]], dtype=np.float32)]
+
+    assert mean_average_precision(exact, labels) == {"map50": 1.0, "map50_95": 1.0, "classes": 2}
+    assert mean_average_precision(swapped, labels)["map50"] == 0.0
+
+
+def test_loose_boxes_count_at_low_iou_only():
+    labels = [np.array([[0, 0, 0, 100, 100]], dtype=np.float32)]
+    # IoU 0.64, a hit at 0.5, 0.55 and 0.6 but not at the stricter thresholds
+    loose = [np.array([[0, 0, 80, 80, 0.9, 0]], dtype=np.float32)]
+
+    result = mean_average_precision(loose, labels)
+
+    assert result["map50"] == 1.0
+    assert result["map50_95"] == pytest.approx(0.3)
+
+
+def test_drift_is_measured_against_the_reference():
+    report = {
+        "accurate": {"accuracy": {"map50": 0.60, "map50_95": 0.40}},
+        "fast": {"accuracy": {"map50": 0.50, "map50_95": 0.38}},
+    }
+
+    drifts = drift(report, "accurate")
+
+    assert drifts["accurate"] == {"map50": 0.0, "map50_95": 0.0}
+    assert drifts["fast"] == {"map50": -0.1, "map50_95": -0.02}
+    assert regressions(drifts, 0.05) == ["fast.map50: -0.1000"]
+    assert regressions(drifts, 0.2) == []
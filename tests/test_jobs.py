@@ -0,0 +1,123 @@
+import time
+
+import pytest
+
+from src.database import DetectionLog
+from src.jobs import (
+    JobFilesMissing,
+    JobRunner,
+    cancel_job,
+    claim_job,
+    complete_job,
+    get_job,
+    heartbeat,
+    job_files,
+    original_filename,
+    requeue_expired,
+    submit_job,
+)
+
+
+def submit(session_factory, tmp_path, client_id="a", priority=0, images=(("a.jpg", b"x"),)):
+    return submit_job(list(images), client_id, "yolov8n", 0.25, priority, tmp_path, session_factory)["job_id"]
+
+
+def test_submitted_images_are_stored_in_upload_order(tmp_path, session_factory):
+    job_id = submit(session_factory, tmp_path, images=[("b.jpg", b"1"), ("../a b.jpg", b"2"), ("b.jpg", b"3")])
+
+    files = job_files(job_id, tmp_path)
+    assert [original_filename(p) for p in files] == ["b.jpg", "a_b.jpg", "b.jpg"]
+    assert files[2].read_bytes() == b"3"
+    assert get_job(job_id, session_factory)["status"] == "queued"
+
+
+def test_a_failing_or_empty_upload_queues_no_job(tmp_path, session_factory):
+
+    def unpack():
+        yield "a.jpg", b"1"
+        raise ValueError("archive is not a readable zip or tar file")
+
+    with pytest.raises(ValueError, match="readable"):
+        submit_job(unpack(), "a", "yolov8n", 0.25, jobs_dir=tmp_path, session_factory=session_factory)
+    with pytest.raises(ValueError, match="no images"):
+        submit_job(iter(()), "a", "yolov8n", 0.25, jobs_dir=tmp_path, session_factory=session_factory)
+
+    assert list(tmp_path.iterdir()) == []
+    assert claim_job(session_factory=session_factory) is None
+
+
+def test_jobs_are_claimed_by_priority_within_the_per_client_limit(tmp_path, session_factory):
+    low = submit(session_factory, tmp_path, client_id="a")
+    high = submit(session_factory, tmp_path, client_id="a", priority=5)
+    other = submit(session_factory, tmp_path, client_id="b")
+
+    assert claim_job(per_client=1, session_factory=session_factory)["job_id"] == high
+    # client a already has its one job running
+    assert claim_job(per_client=1, session_factory=session_factory)["job_id"] == other
+    assert claim_job(per_client=1, session_factory=session_factory) is None
+    assert get_job(low, session_factory)["status"] == "queued"
+
+
+def test_expired_leases_are_requeued_and_the_old_runner_loses_the_job(tmp_path, session_factory, make_result):
+    job_id = submit(session_factory, tmp_path)
+    first = claim_job(lease_seconds=-1, session_factory=session_factory)
+
+    assert requeue_expired(session_factory=session_factory) == 1
+    second = claim_job(session_factory=session_factory)
+
+    assert second["attempts"] == first["attempts"] + 1
+    assert not heartbeat(job_id, first["attempts"], 1, 0, session_factory=session_factory)
+    assert not complete_job(job_id, first["attempts"], [make_result("det_old")], {}, 0.25, session_factory)
+    assert complete_job(job_id, second["attempts"], [make_result("det_new")], {}, 0.25, session_factory)
+
+    db = session_factory()
+    assert [row.detection_id for row in db.query(DetectionLog)] == ["det_new"]
+    db.close()
+
+
+def test_runner_writes_results_and_retries_failed_jobs(tmp_path, session_factory, make_result):
+    job_id = submit(session_factory, tmp_path, images=[("a.jpg", b"1"), ("b.jpg", b"2")])
+    calls = []
+
+    def handler(job, progress):
+        calls.append(job["attempts"])
+        if len(calls) == 1:
+            raise RuntimeError("model went away")
+        progress(2, 1)
+        return [make_result("det_1")], {"00001_b.jpg": "could not decode image"}
+
+    runner = JobRunner(handler, workers=1, poll_interval_ms=10, jobs_dir=tmp_path, session_factory=session_factory)
+    deadline = time.monotonic() + 5
+    while get_job(job_id, session_factory)["status"] != "done" and time.monotonic() < deadline:
+        time.sleep(0.02)
+    runner.stop()
+
+    job = get_job(job_id, session_factory)
+    assert calls == [1, 2]
+    assert job["detection_ids"] == ["det_1"]
+    assert job["failed_images"] == 1
+    assert not (tmp_path / job_id).exists()
+
+
+def test_cancelled_jobs_are_not_run(tmp_path, session_factory):
+    job_id = submit(session_factory, tmp_path)
+
+    assert cancel_job(job_id, tmp_path, session_factory)["status"] == "cancelled"
+    assert claim_job(session_factory=session_factory) is None
+    assert cancel_job("job_missing", tmp_path, session_factory) is None
+
+
+def test_a_job_whose_images_are_gone_fails_instead_of_completing_empty(tmp_path, session_factory):
+    job_id = submit(session_factory, tmp_path, images=[("a.jpg", b"1"), ("b.jpg", b"2")])
+    job_files(job_id, tmp_path)[1].unlink()
+    with pytest.raises(JobFilesMissing, match="1 of 2"):
+        job_files(job_id, tmp_path, expected=2)
+
+    handled = []
+    runner = JobRunner(lambda job, progress: handled.append(job) or ([], {}), workers=0, jobs_dir=tmp_path, session_factory=session_factory)
+    runner.run_job(claim_job(session_factory=session_factory))
+
+    job = get_job(job_id, session_factory)
+    assert handled == []
+    assert job["status"] == "failed"
+    assert "missing" in job["error"]
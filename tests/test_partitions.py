@@ -0,0 +1,63 @@
+import os
+from datetime import datetime
+
+from src.database import DetectedObject, DetectionLog
+from src.partitions import (
+    apply_retention,
+    find_archived_detection,
+    next_period,
+    parse_partition_name,
+    period_start,
+    prune_files,
+)
+from src.writer import persist_detections
+
+
+def test_periods_and_partition_names():
+    assert period_start(datetime(2026, 12, 17, 9), "month") == datetime(2026, 12, 1)
+    assert next_period(datetime(2026, 12, 1), "month") == datetime(2027, 1, 1)
+    assert next_period(datetime(2026, 2, 28), "day") == datetime(2026, 3, 1)
+
+    assert parse_partition_name("detection_logs", "detection_logs_p202601") == (datetime(2026, 1, 1), datetime(2026, 2, 1))
+    assert parse_partition_name("detection_logs", "detection_logs_p20260105")[1] == datetime(2026, 1, 6)
+    assert parse_partition_name("detection_logs", "detection_logs_default") is None
+
+
+def test_expired_periods_are_archived_and_still_found(tmp_path, engine, db, make_result):
+    persist_detections(
+        db,
+        [
+            (make_result("det_jan", datetime(2026, 1, 10)), 0.25),
+            (make_result("det_feb", datetime(2026, 2, 10)), 0.25),
+            (make_result("det_may", datetime(2026, 5, 10)), 0.25),
+        ],
+    )
+    db.commit()
+
+    archived = apply_retention(engine, retention_days=30, archive_dir=tmp_path, interval="month", now=datetime(2026, 5, 20))
+
+    # january and february are wholly past the cutoff, march and april were empty
+    assert [entry["rows"] for entry in archived] == [1, 1]
+    assert [row.detection_id for row in db.query(DetectionLog)] == ["det_may"]
+    assert {row.detection_id for row in db.query(DetectedObject)} == {"det_may"}
+
+    found = find_archived_detection(db, "det_feb")
+    assert found["archived"] is True
+    assert found["detections"][0]["class_name"] == "person"
+    assert find_archived_detection(db, "det_missing") is None
+
+
+def test_retention_is_off_by_default(tmp_path, engine):
+    assert apply_retention(engine, retention_days=0, archive_dir=tmp_path) == []
+
+
+def test_stored_files_older_than_retention_are_pruned(tmp_path):
+    old, new = tmp_path / "det_old.jpg", tmp_path / "det_new.jpg"
+    old.write_bytes(b"1")
+    new.write_bytes(b"2")
+    os.utime(old, (datetime(2026, 1, 1).timestamp(),) * 2)
+    os.utime(new, (datetime(2026, 5, 1).timestamp(),) * 2)
+
+    assert prune_files(tmp_path, retention_days=0) == 0
+    assert prune_files(tmp_path, retention_days=30, now=datetime(2026, 5, 20)) == 1
+    assert [p.name for p in tmp_path.iterdir()] == ["det_new.jpg"]
@@ -0,0 +1,55 @@
+import struct
+
+import cv2
+import numpy as np
+import pytest
+
+from src.preprocess import (
+    ImageTooLarge,
+    check_image,
+    decode_reduced,
+    reduction_factor,
+    rescale_result,
+    sniff_format,
+)
+
+
+def encode(extension: str, width: int, height: int) -> bytes:
+    ok, buffer = cv2.imencode(extension, np.zeros((height, width, 3), dtype=np.uint8))
+    assert ok
+    return buffer.tobytes()
+
+
+def test_format_and_size_come_from_the_header():
+    assert check_image(encode(".jpg", 320, 200)) == ("jpeg", (320, 200))
+    assert check_image(encode(".png", 40, 30)) == ("png", (40, 30))
+    assert sniff_format(b"GIF89a...") is None
+
+    with pytest.raises(ValueError, match="only JPEG and PNG"):
+        check_image(b"not an image")
+    with pytest.raises(ValueError, match="dimensions"):
+        check_image(b"\xff\xd8\xff\xe0")
+
+
+def test_oversized_image_is_rejected_before_decoding():
+    # a PNG signature and IHDR declaring 20000x20000, with no pixel data at all
+    header = b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", 20000, 20000)
+    with pytest.raises(ImageTooLarge):
+        check_image(header, max_pixels=50_000_000)
+
+
+def test_large_jpegs_are_decoded_at_reduced_scale():
+    assert reduction_factor((4000, 3000), 640) == 4
+    assert reduction_factor((1000, 800), 640) == 1
+
+    image = decode_reduced(encode(".jpg", 2560, 1440), 4)
+    assert image.shape == (360, 640, 3)
+
+
+def test_boxes_are_rescaled_to_the_original_size():
+    result = {"detections": [{"class_id": 0, "bbox": [10, 20, 30, 40]}], "image_width": 640, "image_height": 360}
+
+    rescaled = rescale_result(result, (2560, 1440), (360, 640, 3))
+
+    assert rescaled["detections"][0]["bbox"] == [40, 80, 120, 160]
+    assert (rescaled["image_width"], rescaled["image_height"]) == (2560, 1440)
@@ -0,0 +1,42 @@
+import pytest
+
+from src.backends import MODEL_IMGSZ
+from src.profiles import DEFAULT_PROFILES, UnknownProfile, class_ids, get_profile, parse_profiles
+
+
+def test_defaults_are_available_without_configuration():
+    profiles = parse_profiles("")
+
+    assert set(profiles) == set(DEFAULT_PROFILES)
+    assert profiles["fast"].int8 and profiles["fast"].imgsz == 320
+    assert profiles["balanced"].imgsz == MODEL_IMGSZ and not profiles["balanced"].int8
+
+
+def test_configured_profiles_override_defaults_and_add_new_ones():
+    profiles = parse_profiles('{"fast": {"imgsz": 256}, "people": {"classes": ["person"], "max_det": 50}}')
+
+    assert profiles["fast"].imgsz == 256
+    # settings that were not overridden keep their defaults
+    assert profiles["fast"].int8 and profiles["fast"].max_det == 100
+    assert profiles["people"].classes == ("person",)
+    assert profiles["people"].imgsz == MODEL_IMGSZ
+    assert profiles["people"].summary()["classes"] == ["person"]
+
+
+def test_unknown_profile_names_are_rejected():
+    profiles = parse_profiles("")
+
+    assert get_profile(None, profiles) is None
+    assert get_profile("fast", profiles).name == "fast"
+    with pytest.raises(UnknownProfile, match="available: fast, balanced, accurate"):
+        get_profile("fastest", profiles)
+
+
+def test_class_subset_maps_to_model_class_ids():
+    names = {0: "person", 1: "bicycle", 2: "car"}
+    profiles = parse_profiles('{"road": {"classes": ["car", "bicycle"]}, "boats": {"classes": ["boat"]}}')
+
+    assert class_ids(profiles["balanced"], names) is None
+    assert class_ids(profiles["road"], names) == [1, 2]
+    with pytest.raises(ValueError, match="boat"):
+        class_ids(profiles["boats"], names)
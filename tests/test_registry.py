@@ -0,0 +1,70 @@
+import pytest
+
+from src.registry import ModelRegistry, UnknownModel, parse_model_specs
+
+MB = 2**20
+
+
+class FakeDetector:
+    def __init__(self, path):
+        self.path = path
+        self.model_id = path
+
+    def parameter_bytes(self):
+        return 100 * MB
+
+
+class FakeScheduler:
+    def __init__(self, detector):
+        self.detector = detector
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+
+def make_registry(budget_mb=250):
+    return ModelRegistry(
+        parse_model_specs("n=yolov8n.pt,s=yolov8s.pt,m=yolov8m.pt"),
+        "n",
+        detector_factory=FakeDetector,
+        scheduler_factory=FakeScheduler,
+        memory_budget_bytes=budget_mb * MB,
+    )
+
+
+def test_parse_model_specs():
+    assert parse_model_specs("a=x.pt, weights/custom.pt,") == {"a": "x.pt", "custom": "weights/custom.pt"}
+
+
+def test_models_load_lazily_and_once():
+    registry = make_registry()
+    assert registry.loaded() == {}
+    first = registry.get("S")
+    assert registry.get("s") is first
+    assert list(registry.loaded()) == ["s"]
+    assert registry.loads == 1
+
+    with pytest.raises(UnknownModel):
+        registry.get("x")
+
+
+def test_least_recently_used_model_is_evicted_but_not_the_default():
+    registry = make_registry()
+    registry.get("n")
+    small = registry.get("s")
+    registry.get("m")
+
+    assert list(registry.loaded()) == ["n", "m"]
+    assert small.scheduler.stopped
+    assert registry.evictions == 1
+
+
+def test_models_in_use_are_not_evicted():
+    registry = make_registry()
+    registry.get("n")
+    with registry.use("s") as small:
+        registry.get("m")
+        assert set(registry.loaded()) == {"n", "s", "m"}
+        assert not small.scheduler.stopped
+    assert small.active == 0
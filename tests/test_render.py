@@ -0,0 +1,38 @@
+import cv2
+import numpy as np
+
+from src.render import AnnotationRenderer, OutputEncoding, class_palette, fit_image
+
+
+def test_palette_has_a_distinct_colour_per_class():
+    palette = class_palette(80)
+
+    assert palette.shape == (80, 3)
+    assert len({tuple(colour) for colour in palette.tolist()}) == 80
+
+
+def test_boxes_are_drawn_in_place_on_the_decoded_image():
+    renderer = AnnotationRenderer({0: "person", 1: "car"})
+    image = np.zeros((200, 300, 3), dtype=np.uint8)
+    data = np.array([[20, 40, 120, 160, 0.9, 1]], dtype=np.float32)
+
+    encoded = renderer.render(image, data, OutputEncoding("png", 80, 0))
+
+    assert image[100, 19:22].any()
+    assert not image[100, 200].any()
+    assert cv2.imdecode(np.frombuffer(encoded, np.uint8), cv2.IMREAD_COLOR).shape == (200, 300, 3)
+
+
+def test_output_is_downscaled_and_encoded_as_requested():
+    renderer = AnnotationRenderer({0: "person"})
+    image = np.zeros((1000, 2000, 3), dtype=np.uint8)
+    data = np.array([[100, 100, 900, 900, 0.5, 0]], dtype=np.float32)
+
+    encoded = renderer.render(image, data, OutputEncoding("webp", 60, 500))
+
+    assert encoded[8:12] == b"WEBP"
+    assert cv2.imdecode(np.frombuffer(encoded, np.uint8), cv2.IMREAD_COLOR).shape == (250, 500, 3)
+
+    small = np.zeros((100, 100, 3), dtype=np.uint8)
+    resized, scale = fit_image(small, 500)
+    assert resized is small and scale == 1.0
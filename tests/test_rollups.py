@@ -0,0 +1,37 @@
+from datetime import datetime
+
+from src.database import DetectionRollup
+from src.rollups import histogram_percentile, rollup_summary, update_rollups
+
+
+def test_rollups_accumulate_across_writes(db, make_result):
+    update_rollups(
+        db, [make_result(timestamp=datetime(2026, 1, 1, 10, 5), processing_time=0.08, classes=["person", "car"])]
+    )
+    update_rollups(
+        db,
+        [
+            make_result(timestamp=datetime(2026, 1, 1, 10, 40), processing_time=0.12, classes=["person"]),
+            make_result(timestamp=datetime(2026, 1, 1, 11, 1), processing_time=0.3, classes=["person", "dog"]),
+        ],
+    )
+    db.commit()
+
+    total = db.query(DetectionRollup).filter_by(granularity="total").one()
+    summary = rollup_summary(total)
+    assert summary["total_detections"] == 3
+    assert summary["total_objects_detected"] == 5
+    assert summary["average_processing_time"] == round(0.5 / 3, 3)
+    assert summary["most_common_objects"][0] == {"class_name": "person", "count": 3}
+
+    hours = db.query(DetectionRollup).filter_by(granularity="hour").order_by(DetectionRollup.bucket_start).all()
+    assert [h.detection_count for h in hours] == [2, 1]
+
+
+def test_histogram_percentile():
+    counts = [0] * 17
+    counts[4] = 90  # <= 0.1s
+    counts[8] = 10  # <= 0.5s
+    assert histogram_percentile(counts, 50) == 0.1
+    assert histogram_percentile(counts, 95) == 0.5
+    assert histogram_percentile([0] * 17, 50) == 0.0
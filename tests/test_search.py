@@ -0,0 +1,42 @@
+from datetime import datetime
+
+import pytest
+
+from src.search import search_objects
+from src.writer import persist_detections
+
+
+@pytest.fixture
+def db(db, make_result):
+    persist_detections(
+        db,
+        [
+            (
+                make_result(
+                    "det_1",
+                    datetime(2026, 1, 1, 10, 0),
+                    [(0, "person", 0.9, [10, 10, 50, 100]), (2, "car", 0.4, [300, 200, 400, 260])],
+                ),
+                0.25,
+            ),
+            (make_result("det_2", datetime(2026, 1, 2, 10, 0), [(0, "person", 0.3, [500, 300, 600, 470])]), 0.25),
+        ],
+    )
+    db.commit()
+    return db
+
+
+def test_search_by_class_and_confidence(db):
+    assert [o.detection_id for o in search_objects(db, class_names=["person"])] == ["det_2", "det_1"]
+    assert [o.detection_id for o in search_objects(db, class_ids=[0], min_confidence=0.5)] == ["det_1"]
+    assert [o.class_name for o in search_objects(db, max_confidence=0.5)] == ["person", "car"]
+
+
+def test_search_by_time_and_region(db):
+    assert len(search_objects(db, since=datetime(2026, 1, 2))) == 1
+    assert sorted(o.class_name for o in search_objects(db, until=datetime(2026, 1, 2))) == ["car", "person"]
+
+    inside = search_objects(db, region=(0, 0, 320, 240), region_mode="within")
+    assert [o.class_name for o in inside] == ["person"]
+    overlapping = search_objects(db, region=(0, 0, 320, 240))
+    assert sorted(o.class_name for o in overlapping) == ["car", "person"]
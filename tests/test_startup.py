@@ -0,0 +1,34 @@
+import pytest
+
+from src.startup import StartupReport
+
+
+def test_phases_are_timed_and_ready_is_reported():
+    report = StartupReport()
+    assert report.summary()["state"] == "starting"
+
+    with report.phase("database"):
+        assert report.summary()["current_phase"] == "database"
+    report.record("model_load", 1.5)
+    report.mark_ready()
+
+    summary = report.summary()
+    assert summary["state"] == "ready"
+    assert set(summary["phases_ms"]) == {"database", "model_load"}
+    assert summary["phases_ms"]["model_load"] == 1500.0
+    assert summary["ready_after_ms"] > 0
+
+
+def test_failed_phase_is_still_recorded():
+    report = StartupReport()
+    with pytest.raises(RuntimeError):
+        with report.phase("model"):
+            raise RuntimeError("weights missing")
+    report.mark_failed("weights missing")
+
+    summary = report.summary()
+    assert not report.ready
+    assert summary["state"] == "failed"
+    assert summary["error"] == "weights missing"
+    assert summary["current_phase"] == "model"
+    assert "model" in summary["phases_ms"]
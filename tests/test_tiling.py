@@ -0,0 +1,43 @@
+import numpy as np
+
+from src.tiling import batched_nms, fit_tile_size, merge_tile_detections, tile_offsets, tile_views
+
+
+def test_tiles_cover_the_image_and_share_its_buffer():
+    image = np.zeros((1000, 1500, 3), dtype=np.uint8)
+    offsets = tile_offsets(1000, 1500, 640, 0.2)
+
+    assert offsets[:, 0].max() + 640 == 1500
+    assert offsets[:, 1].max() + 640 == 1000
+    assert len(offsets) == 6
+
+    tiles = tile_views(image, offsets, 640)
+    assert all(tile.shape == (640, 640, 3) for tile in tiles)
+    assert all(np.shares_memory(tile, image) for tile in tiles)
+
+
+def test_small_images_are_one_tile_and_tile_count_is_bounded():
+    assert len(tile_offsets(300, 400, 640, 0.2)) == 1
+
+    tile_size = fit_tile_size(4000, 6000, 256, 0.2, max_tiles=16)
+    assert len(tile_offsets(4000, 6000, tile_size, 0.2)) <= 16
+
+
+def test_nms_only_suppresses_within_a_class():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 10, 10], [0, 0, 10, 10], [50, 50, 60, 60]], dtype=np.float32)
+    scores = np.array([0.9, 0.8, 0.7, 0.6], dtype=np.float32)
+    class_ids = np.array([0, 0, 1, 0])
+
+    assert batched_nms(boxes, scores, class_ids, 0.5).tolist() == [0, 2, 3]
+
+
+def test_tile_boxes_are_mapped_to_image_coordinates_and_merged():
+    # the same object seen by the full-image pass and by the tile at (100, 50)
+    full = np.array([[110, 60, 150, 100, 0.8, 2]], dtype=np.float32)
+    tile = np.array([[10, 10, 50, 50, 0.9, 2], [0, 0, 5, 5, 0.4, 0]], dtype=np.float32)
+    offsets = np.array([[0, 0], [100, 50]], dtype=np.float32)
+
+    merged = merge_tile_detections([full, tile], offsets, iou_threshold=0.5)
+
+    np.testing.assert_allclose(merged, [[110, 60, 150, 100, 0.9, 2], [100, 50, 105, 55, 0.4, 0]])
+    assert len(merge_tile_detections([np.empty((0, 6))], offsets[:1])) == 0
@@ -0,0 +1,58 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from src.preprocess import ImageTooLarge
+from src.uploads import expand_uploads, extract_archive
+
+
+def make_zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members:
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def make_tar(members):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("make_archive", [make_zip, make_tar])
+def test_image_members_are_extracted_in_order(make_archive):
+    data = make_archive([("a/one.jpg", b"1"), ("notes.txt", b"x"), (".hidden.png", b"h"), ("two.PNG", b"22")])
+
+    assert extract_archive(data) == [("one.jpg", b"1"), ("two.PNG", b"22")]
+
+
+@pytest.mark.parametrize("make_archive", [make_zip, make_tar])
+def test_oversized_members_are_rejected_before_unpacking(make_archive):
+    # compresses to a few kilobytes but unpacks to a megabyte
+    data = make_archive([("bomb.jpg", bytes(1024 * 1024))])
+
+    with pytest.raises(ImageTooLarge, match="bomb.jpg"):
+        extract_archive(data, max_member_bytes=64 * 1024)
+
+
+@pytest.mark.parametrize("make_archive", [make_zip, make_tar])
+def test_total_unpacked_size_is_capped(make_archive):
+    data = make_archive([(f"{i}.jpg", bytes(1000)) for i in range(5)])
+
+    with pytest.raises(ImageTooLarge, match="archive unpacks"):
+        extract_archive(data, max_member_bytes=1000, max_total_bytes=4500)
+
+
+def test_image_count_is_capped_across_uploads():
+    uploads = [("frames.zip", "application/zip", make_zip([("a.jpg", b"1"), ("b.jpg", b"2")])), ("c.jpg", "image/jpeg", b"3")]
+
+    assert len(expand_uploads(uploads, max_images=3)) == 3
+    with pytest.raises(ValueError, match="at most 2"):
+        expand_uploads(uploads, max_images=2)
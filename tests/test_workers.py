@@ -0,0 +1,72 @@
+import multiprocessing as mp
+import os
+
+import numpy as np
+import pytest
+
+from src.workers import ProcessScheduler
+
+pytest.importorskip("torch")
+pytestmark = pytest.mark.skipif("fork" not in mp.get_all_start_methods(), reason="needs the fork start method")
+
+
+class PixelSumDetector:
+    """reports what arrived through shared memory, and the worker it ran in"""
+
+    def detect_batch(self, requests):
+        if any(r["filename"] == "crash.jpg" for r in requests):
+            os._exit(3)
+        if any(r["filename"] == "bad.jpg" for r in requests):
+            raise ValueError("bad image")
+        return [
+            ({"filename": r["filename"], "sum": int(r["image"].sum()), "shape": r["image"].shape, "pid": os.getpid()}, None)
+            for r in requests
+        ]
+
+
+def test_images_reach_workers_through_shared_memory():
+    scheduler = ProcessScheduler(PixelSumDetector(), start_method="fork", processes=2, threads_per_worker=1, max_wait_ms=50)
+    try:
+        images = [np.full((4, 5, 3), i, dtype=np.uint8) for i in range(6)]
+        futures = [scheduler.submit(image, f"img{i}.jpg", 0.25) for i, image in enumerate(images)]
+        results = [f.result(timeout=10)[0] for f in futures]
+    finally:
+        scheduler.stop()
+
+    assert [r["sum"] for r in results] == [int(image.sum()) for image in images]
+    assert all(r["shape"] == (4, 5, 3) for r in results)
+    assert all(r["pid"] != os.getpid() for r in results)
+    assert "queue_wait" in results[0]["timings"]
+
+
+def test_failed_request_does_not_fail_its_batch():
+    scheduler = ProcessScheduler(PixelSumDetector(), start_method="fork", processes=1, threads_per_worker=1, max_wait_ms=200)
+    try:
+        good = scheduler.submit(np.zeros((2, 2, 3), np.uint8), "good.jpg", 0.25)
+        bad = scheduler.submit(np.zeros((2, 2, 3), np.uint8), "bad.jpg", 0.25)
+        assert good.result(timeout=10)[0]["filename"] == "good.jpg"
+        assert "bad image" in str(bad.exception(timeout=10))
+    finally:
+        scheduler.stop()
+
+
+def test_crashed_worker_is_replaced():
+    scheduler = ProcessScheduler(PixelSumDetector(), start_method="fork", processes=1, threads_per_worker=1, max_wait_ms=1)
+    try:
+        crashed = scheduler.submit(np.zeros((2, 2, 3), np.uint8), "crash.jpg", 0.25)
+        assert isinstance(crashed.exception(timeout=10), RuntimeError)
+
+        after = scheduler.submit(np.ones((2, 2, 3), np.uint8), "after.jpg", 0.25)
+        assert after.result(timeout=10)[0]["sum"] == 12
+        assert scheduler.stats()["worker_restarts"] == 1
+    finally:
+        scheduler.stop()
+
+
+def test_ready_once_every_worker_has_started():
+    scheduler = ProcessScheduler(PixelSumDetector(), start_method="fork", processes=2, threads_per_worker=1)
+    try:
+        assert scheduler.wait_ready(timeout=10)
+        assert scheduler.stats()["workers_ready"] == 2
+    finally:
+        scheduler.stop()
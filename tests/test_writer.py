@@ -0,0 +1,39 @@
+import pytest
+
+from src.database import DetectionLog, DetectionRollup, ModelMetrics
+from src.writer import DetectionWriter
+
+
+@pytest.fixture
+def session_factory(session_factory):
+    db = session_factory()
+    db.add(ModelMetrics(model_name="YOLOv8n", model_version="8.0", total_classes=80, total_detections=0))
+    db.commit()
+    db.close()
+    return session_factory
+
+
+def test_writer_flushes_pending_rows_on_stop(session_factory, make_result):
+    writer = DetectionWriter(session_factory, flush_size=4, flush_interval_ms=10_000)
+    for i in range(10):
+        assert writer.enqueue(make_result(f"det_{i}"), 0.25)
+    writer.stop()
+
+    db = session_factory()
+    assert db.query(DetectionLog).count() == 10
+    assert db.query(ModelMetrics).one().total_detections == 10
+    assert db.query(DetectionRollup).filter_by(granularity="total").one().detection_count == 10
+    assert writer.stats()["rows_written"] == 10
+    assert not writer.enqueue(make_result("det_late"), 0.25)
+
+
+def test_writer_isolates_bad_rows(session_factory, make_result):
+    writer = DetectionWriter(session_factory, flush_size=8, flush_interval_ms=10_000)
+    for detection_id in ["det_a", "det_b", "det_a"]:
+        writer.enqueue(make_result(detection_id), 0.25)
+    writer.stop()
+
+    db = session_factory()
+    assert db.query(DetectionLog).count() == 2
+    assert writer.stats()["rows_failed"] == 1
+